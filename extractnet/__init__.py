@@ -1,13 +1,42 @@
-from extractnet.pipeline import Extractor
+import gc
 
 __version__ = '2.0.7'
 
 
 _LOADED_MODELS = {}
 
-def extract_news(html, encoding=None, as_blocks=False):
+def __getattr__(name):
+    # importing the pipeline pulls in sklearn, lxml and the feature modules,
+    # defer it until Extractor is actually used
+    if name == 'Extractor':
+        from extractnet.pipeline import Extractor
+        return Extractor
+    raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+
+def preload(warmup=True, freeze=True):
+    '''
+        Load (and warm) the default extractor used by extract_news in the current process
+
+        Call it in the parent of a pre-fork server (gunicorn --preload, multiprocessing
+        with fork) so workers share the loaded models copy-on-write instead of each
+        loading them after fork. onnxruntime sessions are rebuilt in forked children.
+
+        freeze: move everything loaded so far out of the garbage collector's reach
+            (gc.freeze) so collections in workers don't touch and copy the shared pages
+    '''
+    from extractnet.pipeline import Extractor
     if 'news_extraction' not in _LOADED_MODELS:
         _LOADED_MODELS['news_extraction'] = Extractor()
+    extractor = _LOADED_MODELS['news_extraction']
+    if warmup:
+        extractor.warmup()
+    if freeze and hasattr(gc, 'freeze'):
+        gc.collect()
+        gc.freeze()
+    return extractor
 
-    return _LOADED_MODELS['news_extraction'].extract(html)
+def extract_news(html, encoding=None, as_blocks=False):
+    if 'news_extraction' not in _LOADED_MODELS:
+        preload(warmup=False, freeze=False)
 
+    return _LOADED_MODELS['news_extraction'].extract(html)
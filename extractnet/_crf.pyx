@@ -0,0 +1,119 @@
+"""
+Linear chain crf kernels of model_bundle.ViterbiCRF
+
+State scores are summed in the order crfsuite does and ties of the viterbi
+recursion go to the lowest label index, so the paths are the ones crfsuite
+tags.
+"""
+import numpy as np
+
+cimport cython
+cimport numpy as np
+
+np.import_array()
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef inline int _add_row(double[:, ::1] out, Py_ssize_t t, double[:, ::1] state,
+        Py_ssize_t attribute, double value) nogil:
+    cdef Py_ssize_t j
+    for j in range(out.shape[1]):
+        out[t, j] += value * state[attribute, j]
+    return 0
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def state_scores(list xseq, dict attributes, dict values, values_of, attributes_of,
+        double[:, ::1] state):
+    """
+    (positions x labels) state scores of a sequence of feature dicts.
+
+    Args:
+        attributes: crfsuite attribute -> row of state
+        values: feature key -> {string value -> row of state}, filled by
+            values_of(key) for the keys it misses
+        attributes_of: (attribute, value) pairs of any other feature, as
+            pycrfsuite converts them
+    """
+    cdef Py_ssize_t n_positions = len(xseq)
+    scores = np.zeros((n_positions, state.shape[1]), dtype=np.float64)
+    cdef double[:, ::1] out = scores
+    cdef Py_ssize_t t
+    cdef object attribute
+    cdef dict key_values
+    for t in range(n_positions):
+        features = xseq[t]
+        if type(features) is not dict:
+            items = attributes_of(features)
+        else:
+            items = None
+        if items is not None:
+            for name, value in items:
+                attribute = attributes.get(name)
+                if attribute is not None:
+                    _add_row(out, t, state, attribute, value)
+            continue
+        for key, value in (<dict>features).items():
+            if type(value) is str:
+                key_values = values.get(key)
+                if key_values is None:
+                    key_values = values_of(key)
+                attribute = key_values.get(value)
+                if attribute is not None:
+                    _add_row(out, t, state, attribute, 1.0)
+            elif type(value) is float or type(value) is int or type(value) is bool:
+                attribute = attributes.get(key)
+                if attribute is not None:
+                    _add_row(out, t, state, attribute, value)
+            else:
+                for name, number in attributes_of({key: value}):
+                    attribute = attributes.get(name)
+                    if attribute is not None:
+                        _add_row(out, t, state, attribute, number)
+    return scores
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def viterbi(double[:, ::1] scores, double[:, ::1] transitions):
+    """
+    Best label index path of the state scores (positions x labels) of one
+    sequence.
+    """
+    cdef Py_ssize_t n_positions = scores.shape[0]
+    cdef Py_ssize_t n_labels = scores.shape[1]
+    path = np.zeros(n_positions, dtype=np.intp)
+    if n_positions == 0:
+        return path
+    cdef Py_ssize_t[::1] best_path = path
+    backpointers = np.zeros((n_positions, n_labels), dtype=np.intp)
+    cdef Py_ssize_t[:, ::1] pointers = backpointers
+    buffers = np.empty((2, n_labels), dtype=np.float64)
+    cdef double[:, ::1] best = buffers
+    cdef Py_ssize_t t, i, j, previous, current = 0
+    cdef double score, max_score
+    with nogil:
+        for j in range(n_labels):
+            best[0, j] = scores[0, j]
+        for t in range(1, n_positions):
+            for j in range(n_labels):
+                previous = 0
+                max_score = best[current, 0] + transitions[0, j]
+                for i in range(1, n_labels):
+                    score = best[current, i] + transitions[i, j]
+                    if score > max_score:
+                        previous = i
+                        max_score = score
+                pointers[t, j] = previous
+                best[1 - current, j] = max_score + scores[t, j]
+            current = 1 - current
+        previous = 0
+        for j in range(1, n_labels):
+            if best[current, j] > best[current, previous]:
+                previous = j
+        best_path[n_positions - 1] = previous
+        for t in range(n_positions - 1, 0, -1):
+            best_path[t - 1] = pointers[t, best_path[t]]
+    return path
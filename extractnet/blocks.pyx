@@ -16,7 +16,8 @@ from libcpp.pair cimport pair
 from libcpp cimport bool
 from cython.operator cimport preincrement as inc
 from cython.operator cimport dereference as deref
-from libc.stdint cimport uint32_t
+from libc.stdint cimport uint8_t, uint32_t, int32_t
+from libc.string cimport memcpy
 
 # boilerplate from http://lxml.de/capi.html
 cimport lxml.includes.etreepublic as cetree
@@ -93,6 +94,7 @@ re_readability_negative = re.compile('combx|comment|com-|contact|foot|footer|foo
 re_readability_positive = re.compile('article|body|content|entry|hentry|main|page|pagination|author|publishedAt|published|publish-|date-|post|text|blog|story', re.I)
 
 cdef string DIV = <string>'div'
+cdef string P = <string>'p'
 
 cdef cpp_set[string] READABILITY_PLUS3
 READABILITY_PLUS3 = {b'pre', b'td', b'blockquote'}
@@ -146,6 +148,71 @@ class Block(object):
         self.features = kwargs
 
 
+class BlockTable(object):
+    """Per block columns of a document, as flat arrays.
+
+    ``text_len`` is the length of the utf-8 text of each block and
+    ``tag_count`` its ``tagcount`` feature, None unless the blocks were made
+    by ``TagCountPB``. Each block refers to the table of its document through
+    its ``block_table`` and ``block_index`` features.
+    """
+    def __init__(self):
+        self.nblocks = 0
+        self.text_len = None
+        self.tag_count = None
+
+
+class ReadabilityTable(object):
+    """Readability inputs of every block of a document, as flat arrays.
+
+    Block k's ancestors are ``ancestors[ancestor_offsets[k]:ancestor_offsets[k + 1]]``
+    and the class weights it wrote are the same slice of ``weight_ids`` and
+    ``weights`` using ``weight_offsets``. Tag ids are dense, below ``ntags``.
+    Each block refers to the table of its document through its
+    ``readability_table`` and ``readability_index`` features.
+    """
+    def __init__(self):
+        self.nblocks = 0
+        self.ntags = 0
+        self.text_len = None
+        self.link_density = None
+        self.div_or_p = None
+        self.ancestor_offsets = None
+        self.ancestors = None
+        self.weight_offsets = None
+        self.weight_ids = None
+        self.weights = None
+
+
+cdef _uint32_array(vector[uint32_t]& values):
+    ret = np.empty(values.size(), dtype=np.uint32)
+    cdef uint32_t[::1] view = ret
+    if values.size() > 0:
+        memcpy(&view[0], values.data(), values.size() * sizeof(uint32_t))
+    return ret
+
+cdef _int32_array(vector[int32_t]& values):
+    ret = np.empty(values.size(), dtype=np.int32)
+    cdef int32_t[::1] view = ret
+    if values.size() > 0:
+        memcpy(&view[0], values.data(), values.size() * sizeof(int32_t))
+    return ret
+
+cdef _uint8_array(vector[uint8_t]& values):
+    ret = np.empty(values.size(), dtype=np.uint8)
+    cdef uint8_t[::1] view = ret
+    if values.size() > 0:
+        memcpy(&view[0], values.data(), values.size() * sizeof(uint8_t))
+    return ret
+
+cdef _double_array(vector[double]& values):
+    ret = np.empty(values.size(), dtype=np.float64)
+    cdef double[::1] view = ret
+    if values.size() > 0:
+        memcpy(&view[0], values.data(), values.size() * sizeof(double))
+    return ret
+
+
 class BlockifyError(Exception):
     """Raised when there is a fatal problem in blockify
     (if lxml fails to parse the document)
@@ -323,6 +390,23 @@ cdef class PartialBlock:
     # we'll keep a list here of all the values ids to write out
     # the first time we see them
     cdef vector[pair[uint32_t, int] ] class_weights
+    # readability inputs of the blocks appended so far, written out
+    # to a ReadabilityTable shared by all blocks once the tree is done
+    cdef object readability_table
+    cdef vector[uint32_t] rd_text_len
+    cdef vector[double] rd_link_density
+    cdef vector[uint8_t] rd_div_or_p
+    cdef vector[uint32_t] rd_ancestor_offsets
+    cdef vector[uint32_t] rd_ancestors
+    cdef vector[uint32_t] rd_weight_offsets
+    cdef vector[uint32_t] rd_weight_ids
+    cdef vector[int32_t] rd_weights
+    # columns of the blocks appended so far, written out to a BlockTable
+    # shared by all blocks once the tree is done
+    cdef object block_table
+    cdef vector[uint32_t] bt_text_len
+    cdef bool count_tags
+    cdef vector[int32_t] bt_tag_count
 
     def __cinit__(self, *args, **kwargs):
         self.css_attrib.clear()
@@ -348,6 +432,21 @@ cdef class PartialBlock:
         self.next_tag_id = 1
         self.class_weights_written.clear()
         self.class_weights.clear()
+        self.readability_table = ReadabilityTable() if do_readability else None
+        self.rd_text_len.clear()
+        self.rd_link_density.clear()
+        self.rd_div_or_p.clear()
+        self.rd_ancestor_offsets.clear()
+        self.rd_ancestor_offsets.push_back(0)
+        self.rd_ancestors.clear()
+        self.rd_weight_offsets.clear()
+        self.rd_weight_offsets.push_back(0)
+        self.rd_weight_ids.clear()
+        self.rd_weights.clear()
+        self.block_table = BlockTable()
+        self.bt_text_len.clear()
+        self.count_tags = False
+        self.bt_tag_count.clear()
         if do_readability:
             self._subtree_func.push_back(
                 <subtree_t>PartialBlock.subtree_readability)
@@ -409,17 +508,52 @@ cdef class PartialBlock:
                 inc(it)
         return ret
 
-    cdef object _add_readability(self):
+    cdef object _add_readability(self, size_t text_len, double link_density):
+        cdef size_t k
         if self.do_readability:
             ret = {
                 'ancestors': self.ancestors_write,
-                'readability_class_weights': self.class_weights
+                'readability_class_weights': self.class_weights,
+                'readability_table': self.readability_table,
+                'readability_index': self.rd_text_len.size(),
             }
+            self.rd_text_len.push_back(text_len)
+            self.rd_link_density.push_back(link_density)
+            self.rd_div_or_p.push_back(
+                self.block_start_tag == DIV or self.block_start_tag == P)
+            for k in range(self.ancestors_write.size()):
+                self.rd_ancestors.push_back(self.ancestors_write[k])
+            self.rd_ancestor_offsets.push_back(self.rd_ancestors.size())
+            for k in range(self.class_weights.size()):
+                self.rd_weight_ids.push_back(self.class_weights[k].first)
+                self.rd_weights.push_back(self.class_weights[k].second)
+            self.rd_weight_offsets.push_back(self.rd_weight_ids.size())
             self.class_weights.clear()
             return ret
         else:
             return {}
 
+    cdef void write_readability_table(self):
+        if not self.do_readability:
+            return
+        table = self.readability_table
+        table.nblocks = self.rd_text_len.size()
+        table.ntags = self.next_tag_id
+        table.text_len = _uint32_array(self.rd_text_len)
+        table.link_density = _double_array(self.rd_link_density)
+        table.div_or_p = _uint8_array(self.rd_div_or_p)
+        table.ancestor_offsets = _uint32_array(self.rd_ancestor_offsets)
+        table.ancestors = _uint32_array(self.rd_ancestors)
+        table.weight_offsets = _uint32_array(self.rd_weight_offsets)
+        table.weight_ids = _uint32_array(self.rd_weight_ids)
+        table.weights = _int32_array(self.rd_weights)
+
+    cdef void write_block_table(self):
+        table = self.block_table
+        table.nblocks = self.bt_text_len.size()
+        table.text_len = _uint32_array(self.bt_text_len)
+        table.tag_count = _int32_array(self.bt_tag_count) if self.count_tags else None
+
     cdef void add_block_to_results(self, list results):
         """Create a block from the current partial block
         and append it to results.  Reset the partial block"""
@@ -455,8 +589,11 @@ cdef class PartialBlock:
                     css[cssa] = b' '.join(
                         _tokens_from_text(self.css[cssa])).lower()
 
-            kwargs = self._add_readability()
+            kwargs = self._add_readability(len(block_text), link_d)
             kwargs.update(self._extract_features(True))
+            kwargs['block_table'] = self.block_table
+            kwargs['block_index'] = self.bt_text_len.size()
+            self.bt_text_len.push_back(len(block_text))
             kwargs['block_start_tag'] = self.block_start_tag
             kwargs['block_start_element'] = self.block_start_element
             results.append(Block(block_text, link_d, text_d, self.anchors,
@@ -723,6 +860,7 @@ cdef class TagCountPB(PartialBlock):
         self._subtree_func.push_back(<subtree_t>TagCountPB.subtree_tagcount)
         self._name_func.push_back(<name_t>TagCountPB.tagcount)
         self._tag_func.push_back(<callback_t>TagCountPB.tag_tagcount)
+        self.count_tags = True
 
         # will keep track of tag count and tag count since last block
         self._tc = 1  # for the top level HTML tag
@@ -754,6 +892,7 @@ cdef class TagCountPB(PartialBlock):
             ret[TAGCOUNT] = self._tc - 1
             ret[ANCHOR_COUNT] = self._ac
             ret[MIN_DEPTH_SINCE_LAST_BLOCK] = self._min_depth_last_block
+            self.bt_tag_count.push_back(self._tc - 1)
             self._tc_lb = 0
             self._tc = 1
             self._ac = 0
@@ -815,13 +954,15 @@ class Blockifier(object):
 
         # make the final block
         partial_block.add_block_to_results(results)
+        partial_block.write_block_table()
+        partial_block.write_readability_table()
 
         return results
 
     @staticmethod
     def blockify(s, encoding=None,
                  pb=PartialBlock, do_css=True, do_readability=False,
-                 parse_callback=None):
+                 parse_callback=None, decode=True):
         """
         Given HTML string ``s`` return a sequence of blocks with text content.
 
@@ -835,6 +976,9 @@ class Blockifier(object):
                 to blocks
             parse_callback (Callable): if not None, will be called on the
                 result of parsing in order to modify state for [reasons]
+            decode (bool): if True, cast the text, link tokens, css and
+                features of the blocks to str, else their text, link tokens
+                and css are left as bytes
 
         Returns:
             List[Block]: ordered sequence of blocks with text content
@@ -857,34 +1001,36 @@ class Blockifier(object):
         if parse_callback is not None:
             parse_callback(html)
 
+        if not decode:
+            return blocks
         # only return blocks with some text content
         return [ele for ele in str_block_list_cast(blocks, include_link_tokens=True, include_features=True) ]
 
 
 class TagCountBlockifier(Blockifier):
     @staticmethod
-    def blockify(s, encoding=None, parse_callback=None):
+    def blockify(s, encoding=None, parse_callback=None, decode=True):
         return Blockifier.blockify(s, encoding=encoding, pb=TagCountPB,
                                    do_css=True, do_readability=False,
-                                   parse_callback=parse_callback)
+                                   parse_callback=parse_callback, decode=decode)
 
 class TagCountNoCSSBlockifier(Blockifier):
     @staticmethod
-    def blockify(s, encoding=None, parse_callback=None):
+    def blockify(s, encoding=None, parse_callback=None, decode=True):
         return Blockifier.blockify(s, encoding=encoding, pb=TagCountPB,
                                    do_css=False, do_readability=False,
-                                   parse_callback=parse_callback)
+                                   parse_callback=parse_callback, decode=decode)
 
 class TagCountReadabilityBlockifier(Blockifier):
     @staticmethod
-    def blockify(s, encoding=None, parse_callback=None):
+    def blockify(s, encoding=None, parse_callback=None, decode=True):
         return Blockifier.blockify(s, encoding=encoding, pb=TagCountPB,
                                    do_css=True, do_readability=True,
-                                   parse_callback=parse_callback)
+                                   parse_callback=parse_callback, decode=decode)
 
 class TagCountNoCSSReadabilityBlockifier(Blockifier):
     @staticmethod
-    def blockify(s, encoding=None, parse_callback=None):
+    def blockify(s, encoding=None, parse_callback=None, decode=True):
         return Blockifier.blockify(s, encoding=encoding, pb=TagCountPB,
                                    do_css=False, do_readability=True,
-                                   parse_callback=parse_callback)
+                                   parse_callback=parse_callback, decode=decode)
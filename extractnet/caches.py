@@ -0,0 +1,195 @@
+'''
+    Cache registry
+
+    Every cache of the process is a SizedCache registered here by name : a
+    thread safe LRU bounded by its estimated size in bytes and optionally
+    by its number of entries, counting hits and misses. Long lived workers
+    can inspect, resize or clear them all from one place.
+
+    usage:
+        from extractnet import caches
+        caches.configure('metadata.trim', max_bytes=4 << 20)
+        caches.report()     # pid and stats of every cache of the process
+        caches.clear()
+'''
+import os
+import sys
+import threading
+import weakref
+from collections import OrderedDict
+from functools import wraps
+
+_REGISTRY = weakref.WeakValueDictionary()
+_REGISTRY_LOCK = threading.Lock()
+
+_MISSING = object()
+
+
+def entry_size(key, value):
+    '''Estimated size in bytes of a cache entry'''
+    size = sys.getsizeof(key) + sys.getsizeof(value)
+    # memoize keys are argument tuples
+    if isinstance(key, tuple):
+        size += sum(sys.getsizeof(item) for item in key)
+    return size
+
+
+class SizedCache():
+    '''
+        name: registry name, a suffix is added when a live cache already has it
+        max_bytes: least recently used entries are dropped past this estimated
+            size, None for no bound
+        max_entries: same for the number of entries
+        sizeof: estimated size in bytes of a (key, value) entry
+    '''
+
+    def __init__(self, name, max_bytes=1 << 20, max_entries=None, sizeof=entry_size):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.sizeof = sizeof
+        self.entries = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.name = register(self, name)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def get(self, key, default=None):
+        with self.lock:
+            entry = self.entries.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, value):
+        size = self.sizeof(key, value)
+        with self.lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.nbytes -= previous[1]
+            # an entry larger than the whole cache would evict everything
+            if self.max_bytes is not None and size > self.max_bytes:
+                return
+            self.entries[key] = (value, size)
+            self.nbytes += size
+            self._evict()
+
+    def resize(self, max_bytes=_MISSING, max_entries=_MISSING):
+        with self.lock:
+            if max_bytes is not _MISSING:
+                self.max_bytes = max_bytes
+            if max_entries is not _MISSING:
+                self.max_entries = max_entries
+            self._evict()
+
+    def _evict(self):
+        while len(self.entries) > 0 and (
+                (self.max_bytes is not None and self.nbytes > self.max_bytes) or
+                (self.max_entries is not None and len(self.entries) > self.max_entries)):
+            _, (_, size) = self.entries.popitem(last=False)
+            self.nbytes -= size
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.nbytes = 0
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'bytes': self.nbytes,
+                'max_bytes': self.max_bytes,
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+
+def register(cache, name):
+    '''
+        Add a cache to the registry, returns the name it was registered under
+    '''
+    with _REGISTRY_LOCK:
+        registered, idx = name, 1
+        while registered in _REGISTRY:
+            idx += 1
+            registered = '{}-{}'.format(name, idx)
+        _REGISTRY[registered] = cache
+        return registered
+
+
+def get(name):
+    return _REGISTRY.get(name)
+
+
+def names():
+    return sorted(_REGISTRY.keys())
+
+
+def configure(name, **limits):
+    '''
+        Change max_bytes and / or max_entries of a registered cache
+    '''
+    cache = _REGISTRY.get(name)
+    if cache is None:
+        raise KeyError('no cache named {!r}, registered : {}'.format(name, ', '.join(names())))
+    cache.resize(**limits)
+    return cache
+
+
+def clear(name=None):
+    '''
+        Empty a registered cache, all of them when name is None
+    '''
+    for cache_name in ([name] if name is not None else names()):
+        cache = _REGISTRY.get(cache_name)
+        if cache is not None:
+            cache.clear()
+
+
+def stats():
+    return { name: cache.stats() for name, cache in list(_REGISTRY.items()) }
+
+
+def report():
+    '''
+        Stats of every cache of this process
+    '''
+    cache_stats = stats()
+    return {
+        'pid': os.getpid(),
+        'bytes': sum(value['bytes'] for value in cache_stats.values()),
+        'caches': cache_stats,
+    }
+
+
+def memoize(name, max_bytes=1 << 20, max_entries=None):
+    '''
+        Decorator caching a function of hashable positional arguments in a
+        registered SizedCache, available as the function's cache attribute
+    '''
+    def decorator(function):
+        cache = SizedCache(name, max_bytes=max_bytes, max_entries=max_entries)
+
+        @wraps(function)
+        def wrapper(*args):
+            result = cache.get(args, _MISSING)
+            if result is _MISSING:
+                result = function(*args)
+                cache.put(args, result)
+            return result
+        wrapper.cache = cache
+        return wrapper
+    return decorator
@@ -0,0 +1,244 @@
+'''
+    Extraction callbacks
+
+    meta_postprocess callbacks are called with the raw html and postprocess
+    callbacks with the raw html and the results. Declared with callback they
+    can instead receive the Document of the page, whose lxml tree and blocks
+    are parsed once and shared with the extractor, and run on a thread pool :
+
+        concurrent  consecutive concurrent callbacks run at the same time, each
+                    sees the results of the callbacks before the group but not
+                    the ones of the group
+        timeout     seconds the extractor waits for the callback, a late
+                    callback's result is dropped
+
+    Results are merged in list order, earlier callbacks win, as when they run
+    one after the other. A callback run on the pool which raises is logged
+    and its result dropped, the results of the rest of its group are kept.
+    The time spent in every callback is recorded in CallbackStats.
+
+    A thread can't be interrupted: a callback which times out keeps its
+    worker until it returns, CallbackStats counts these as abandoned. Once
+    abandoned callbacks hold every worker, the following ones wait for a
+    free worker and time out too, give callbacks with a timeout a bounded
+    run time or more callback_workers than they can hold.
+
+    usage:
+        @callback(document=True, concurrent=True, timeout=0.5)
+        def language(document, results):
+            return {'language': document.tree.get('lang')}
+
+        extractor = Extractor(postprocess=[language, paywall])
+        extractor.callbacks.stats.snapshot()
+'''
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from .metadata_extraction.utils import load_html
+from .util import priority_merge
+
+LOGGER = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class CallbackSpec():
+
+    __slots__ = ('name', 'document', 'concurrent', 'timeout')
+
+    def __init__(self, name, document=False, concurrent=False, timeout=None):
+        self.name = name
+        self.document = document
+        self.concurrent = concurrent
+        self.timeout = timeout
+
+
+def callback(document=False, concurrent=False, timeout=None, name=None):
+    '''
+        Declare how the extractor runs a callback
+
+        document: called with the Document of the page instead of the raw html
+        concurrent: independent of the other concurrent callbacks next to it
+            in the list, they run at the same time on the thread pool
+        timeout: seconds to wait for it, None to wait until it returns
+        name: name in CallbackStats, the function name by default
+    '''
+    def decorator(function):
+        function.callback_spec = CallbackSpec(name or function.__name__,
+            document=document, concurrent=concurrent, timeout=timeout)
+        return function
+    return decorator
+
+
+def spec_of(function):
+    spec = getattr(function, 'callback_spec', None)
+    if spec is None:
+        spec = CallbackSpec(getattr(function, '__name__', type(function).__name__))
+    return spec
+
+
+class Document():
+    '''
+        A page as seen by the callbacks, treat it as read only since it is
+        shared by callbacks running at the same time
+
+        html: the page as given to the extractor, after the payload filter
+        url: its url when known
+        tree: lxml tree of the page, also used by metadata mining, None when
+            the page can't be parsed
+        blocks: blocks of the content model, their text and css are bytes
+    '''
+
+    def __init__(self, html, url=None, blocks=None, blockify=None):
+        self.html = html
+        self.url = url
+        self._tree = _MISSING
+        self._blocks = blocks
+        self._blockify = blockify
+        self._lock = threading.Lock()
+
+    @property
+    def tree(self):
+        with self._lock:
+            if self._tree is _MISSING:
+                self._tree = load_html(self.html)
+            return self._tree
+
+    @property
+    def blocks(self):
+        with self._lock:
+            # pages extracted without keeping their blocks, by the server
+            if self._blocks is None and self._blockify is not None:
+                self._blocks = self._blockify(self.html)
+            return self._blocks
+
+
+class CallbackStats():
+    '''
+        Number of calls, errors, timeouts and time spent of every callback,
+        abandoned is the number of its timed out calls still running
+    '''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def _entry(self, name):
+        return self._stats.setdefault(name, {'calls': 0, 'errors': 0, 'timeouts': 0,
+            'abandoned': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+
+    def observe(self, name, elapsed, error=False):
+        elapsed_ms = elapsed * 1000
+        with self._lock:
+            entry = self._entry(name)
+            entry['calls'] += 1
+            entry['errors'] += int(error)
+            entry['total_ms'] += elapsed_ms
+            entry['max_ms'] = max(entry['max_ms'], elapsed_ms)
+
+    def observe_timeout(self, name, future=None):
+        '''
+            future: the timed out call, counted as abandoned until it returns
+        '''
+        with self._lock:
+            entry = self._entry(name)
+            entry['timeouts'] += 1
+            if future is not None:
+                entry['abandoned'] += 1
+        if future is not None:
+            future.add_done_callback(lambda _: self._release(name))
+
+    def _release(self, name):
+        with self._lock:
+            self._entry(name)['abandoned'] -= 1
+
+    def snapshot(self):
+        with self._lock:
+            return { name: dict(entry, mean_ms=entry['total_ms'] / entry['calls'] if entry['calls'] else None)
+                for name, entry in self._stats.items() }
+
+
+class CallbackRunner():
+    '''
+        workers: threads running the concurrent callbacks and the ones with a
+            timeout, the pool is started on first use
+    '''
+
+    def __init__(self, workers=4):
+        self.workers = workers
+        self.stats = CallbackStats()
+        self._pool = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def pool(self):
+        with self._lock:
+            # threads of the pool don't survive a fork
+            if self._pool is None or self._pid != os.getpid():
+                self._pool = ThreadPoolExecutor(max_workers=self.workers,
+                    thread_name_prefix='extractnet-callback')
+                self._pid = os.getpid()
+            return self._pool
+
+    def _call(self, function, name, args):
+        started = time.perf_counter()
+        error = True
+        try:
+            output = function(*args)
+            error = False
+            return output
+        finally:
+            self.stats.observe(name, time.perf_counter() - started, error=error)
+
+    def _args(self, spec, html, document, results):
+        source = document if spec.document else html
+        return (source,) if results is None else (source, results)
+
+    def run(self, callbacks, html, document, results, with_results=True):
+        '''
+            results merged with the outputs of callbacks, which are called
+            with the html or document, and the results when with_results
+        '''
+        idx = 0
+        while idx < len(callbacks):
+            group = [ callbacks[idx] ]
+            idx += 1
+            if spec_of(group[0]).concurrent:
+                while idx < len(callbacks) and spec_of(callbacks[idx]).concurrent:
+                    group.append(callbacks[idx])
+                    idx += 1
+            for output in self._run_group(group, html, document, results if with_results else None):
+                if output is not None:
+                    results = priority_merge(output, results)
+        return results
+
+    def _run_group(self, group, html, document, results):
+        specs = [ spec_of(function) for function in group ]
+        if len(group) == 1 and specs[0].timeout is None:
+            return [ self._call(group[0], specs[0].name, self._args(specs[0], html, document, results)) ]
+
+        pool = self.pool()
+        futures = []
+        for function, spec in zip(group, specs):
+            # callbacks of a group can't see the changes of each other
+            args = self._args(spec, html, document, None if results is None else dict(results))
+            futures.append((time.perf_counter(), pool.submit(self._call, function, spec.name, args)))
+
+        outputs = []
+        for spec, (submitted, future) in zip(specs, futures):
+            timeout = None if spec.timeout is None else max(0.0, submitted + spec.timeout - time.perf_counter())
+            try:
+                outputs.append(future.result(timeout=timeout))
+            except FutureTimeout:
+                self.stats.observe_timeout(spec.name, future)
+                LOGGER.warning('callback %s timed out after %.3fs, its result is dropped',
+                    spec.name, spec.timeout)
+                outputs.append(None)
+            except Exception:
+                # counted in the stats by _call
+                LOGGER.exception('callback %s failed, its result is dropped', spec.name)
+                outputs.append(None)
+        return outputs
@@ -0,0 +1,275 @@
+'''
+    Command line interface
+
+    usage:
+
+        extractnet extract page.html archive/ 'crawl/**/*.html' -o results.jsonl
+        cat page.html | extractnet extract -
+
+    Long runs can be resumed with --checkpoint: every processed input is
+    recorded there and skipped on the next run, results are appended to
+    the output file.
+'''
+import argparse
+import glob
+import io
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+
+LOGGER = logging.getLogger(__name__)
+
+STDIN = '-'
+DEFAULT_PATTERNS = ('*.html', '*.htm')
+
+_EXTRACTOR = None
+_METADATA_MINING = True
+
+
+def iter_inputs(paths, patterns=DEFAULT_PATTERNS):
+    '''
+        Expand files, directories (recursively, matching `patterns`) and glob
+        expressions into a sorted stream of file paths. '-' stands for stdin
+    '''
+    seen = set()
+    for path in paths:
+        if path == STDIN:
+            candidates = [STDIN]
+        elif os.path.isdir(path):
+            candidates = []
+            for root, _, filenames in os.walk(path):
+                for pattern in patterns:
+                    candidates.extend(glob.glob(os.path.join(glob.escape(root), pattern)))
+            candidates = sorted(set(candidates))
+        elif os.path.isfile(path):
+            candidates = [path]
+        else:
+            candidates = sorted(glob.glob(path, recursive=True))
+            if len(candidates) == 0:
+                LOGGER.warning('no input matches %s', path)
+        for candidate in candidates:
+            if candidate not in seen:
+                seen.add(candidate)
+                yield candidate
+
+
+def read_html(path):
+    if path == STDIN:
+        raw = sys.stdin.buffer.read()
+    else:
+        with io.open(path, 'rb') as f:
+            raw = f.read()
+    try:
+        return raw.decode('utf-8')
+    except UnicodeDecodeError:
+        from .metadata_extraction.utils import detect_encoding
+        for encoding in detect_encoding(raw):
+            try:
+                return raw.decode(encoding)
+            except (UnicodeDecodeError, LookupError):
+                continue
+    return raw.decode('utf-8', errors='replace')
+
+
+def load_checkpoint(path):
+    if path is None or not os.path.exists(path):
+        return set()
+    with io.open(path, 'r', encoding='utf-8') as f:
+        return set(line.rstrip('\n') for line in f if line.strip())
+
+
+def _init_worker(model_dir, metadata_mining, warmup=False, model_variant='float32',
+        window_size=None):
+    global _EXTRACTOR, _METADATA_MINING
+    _METADATA_MINING = metadata_mining
+    if _EXTRACTOR is not None:
+        # inherited from the parent process through fork
+        return
+    from .pipeline import Extractor
+    _EXTRACTOR = Extractor.from_pretrained(model_dir, model_variant=model_variant,
+        window_size=window_size)
+    if warmup:
+        _EXTRACTOR.warmup()
+
+
+def _to_record(path, result=None, error=None):
+    from .util import json_default
+    record = {'source': path}
+    if error is not None:
+        record['error'] = error
+    else:
+        record.update(result)
+    return json.dumps(record, default=json_default, ensure_ascii=False)
+
+
+def _extract_batch(paths):
+    '''
+        Runs inside worker : extract a batch of files,
+        returns a list of (path, jsonl line, failed)
+    '''
+    metadata_mining = _METADATA_MINING
+    documents, ready, lines, failed = [], [], {}, set()
+    for path in paths:
+        try:
+            documents.append(read_html(path))
+            ready.append(path)
+        except (IOError, OSError) as err:
+            lines[path] = _to_record(path, error=str(err))
+            failed.add(path)
+
+    if len(documents) > 0:
+        try:
+            results = _EXTRACTOR.extract(documents, metadata_mining=metadata_mining)
+            for path, result in zip(ready, results):
+                lines[path] = _to_record(path, result)
+        except Exception:
+            # one bad page should not fail the whole batch
+            for path, document in zip(ready, documents):
+                try:
+                    lines[path] = _to_record(path, _EXTRACTOR.extract(document, metadata_mining=metadata_mining))
+                except Exception as err:
+                    lines[path] = _to_record(path, error='{}: {}'.format(type(err).__name__, err))
+                    failed.add(path)
+
+    return [ (path, lines[path], path in failed) for path in paths ]
+
+
+def _batches(iterable, batch_size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class Throughput():
+
+    def __init__(self, stream=sys.stderr, every=0):
+        self.stream = stream
+        self.every = every
+        self.started = time.time()
+        self.documents = 0
+        self.errors = 0
+        self._last_report = 0
+
+    def update(self, count, errors=0):
+        self.documents += count
+        self.errors += errors
+        if self.every > 0 and self.documents - self._last_report >= self.every:
+            self._last_report = self.documents
+            self.report()
+
+    def report(self, final=False):
+        elapsed = max(time.time() - self.started, 1e-9)
+        self.stream.write('{}{} documents, {} errors in {:.1f}s ({:.2f} docs/s)\n'.format(
+            'done: ' if final else '', self.documents, self.errors, elapsed, self.documents / elapsed))
+        self.stream.flush()
+
+
+def extract_command(args):
+    checkpoint = load_checkpoint(args.checkpoint)
+    if len(checkpoint) > 0:
+        LOGGER.info('resuming, %d inputs already processed', len(checkpoint))
+    inputs = (path for path in iter_inputs(args.inputs, patterns=args.pattern or DEFAULT_PATTERNS)
+        if path == STDIN or path not in checkpoint)
+
+    if args.output in (None, STDIN):
+        output = sys.stdout
+    else:
+        output = io.open(args.output, 'a' if len(checkpoint) > 0 else 'w', encoding='utf-8')
+    checkpoint_file = io.open(args.checkpoint, 'a', encoding='utf-8') if args.checkpoint else None
+    stats = Throughput(every=0 if args.quiet else args.progress_every)
+
+    batches = _batches(inputs, args.batch_size)
+    pool = None
+    if args.workers > 1:
+        if multiprocessing.get_start_method() == 'fork':
+            # load once, workers share the models copy-on-write
+            _init_worker(args.model_dir, not args.no_metadata, True, args.model_variant,
+                args.window_size)
+        pool = multiprocessing.Pool(args.workers, initializer=_init_worker,
+            initargs=(args.model_dir, not args.no_metadata, False, args.model_variant,
+                args.window_size))
+        results = pool.imap(_extract_batch, batches)
+    else:
+        _init_worker(args.model_dir, not args.no_metadata, model_variant=args.model_variant,
+            window_size=args.window_size)
+        results = (_extract_batch(batch) for batch in batches)
+
+    try:
+        for batch_result in results:
+            errors = 0
+            for path, line, failed in batch_result:
+                output.write(line + '\n')
+                errors += int(failed)
+            output.flush()
+            if checkpoint_file is not None:
+                for path, _, _ in batch_result:
+                    if path != STDIN:
+                        checkpoint_file.write(path + '\n')
+                checkpoint_file.flush()
+            stats.update(len(batch_result), errors)
+    finally:
+        if pool is not None:
+            pool.terminate()
+        if output is not sys.stdout:
+            output.close()
+        if checkpoint_file is not None:
+            checkpoint_file.close()
+
+    if not args.quiet:
+        stats.report(final=True)
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='extractnet',
+        description='Extract content and metadata from web pages')
+    subparsers = parser.add_subparsers(dest='command')
+
+    extract = subparsers.add_parser('extract', help='extract HTML files into JSON lines')
+    extract.add_argument('inputs', nargs='+',
+        help='HTML files, directories, glob patterns or - for stdin')
+    extract.add_argument('-o', '--output', type=str, default=None,
+        help='JSONL output file (default: stdout)')
+    extract.add_argument('-j', '--workers', type=int, default=1,
+        help='number of worker processes')
+    extract.add_argument('-b', '--batch-size', type=int, default=16,
+        help='number of documents sent to the extractor at once')
+    extract.add_argument('--pattern', type=str, action='append', default=None,
+        help='file pattern used when scanning directories (default: *.html, *.htm)')
+    extract.add_argument('--checkpoint', type=str, default=None,
+        help='record processed inputs here and skip them when resuming')
+    extract.add_argument('--model-dir', type=str, default=None,
+        help='load models from this directory instead of the packaged ones')
+    extract.add_argument('--model-variant', type=str, default='float32',
+        choices=['float32', 'int8', 'optimized'], help='NewsNet model variant')
+    extract.add_argument('--window-size', type=int, default=None,
+        help='split pages with more blocks into overlapping windows of this size')
+    extract.add_argument('--no-metadata', action='store_true',
+        help='skip metadata mining')
+    extract.add_argument('--progress-every', type=int, default=1000,
+        help='print throughput every N documents, 0 to disable')
+    extract.add_argument('-q', '--quiet', action='store_true')
+    extract.set_defaults(func=extract_command)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command is None:
+        parser.print_help()
+        return 1
+    logging.basicConfig(level=logging.WARNING)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
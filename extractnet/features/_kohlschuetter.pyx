@@ -7,33 +7,28 @@ import numpy as np
 @cython.boundscheck(False)
 @cython.wraparound(False)
 def make_kohlschuetter_features(blocks):
-    cdef int nblocks = len(blocks)
-    if nblocks < 3:
-        raise ValueError(
-            'at least 3 blocks are needed to make Kohlschuetter features')
+    """
+    Link and text densities of every block and its previous and next blocks,
+    as (prev link, prev text, link, text, next link, next text) rows. Neighbours
+    past either end of the sequence are zero.
+    """
+    cdef Py_ssize_t nblocks = len(blocks)
+    cdef np.ndarray[np.float64_t, ndim=1, mode='c'] link_density = \
+        np.empty(nblocks, dtype=np.float64)
+    cdef np.ndarray[np.float64_t, ndim=1, mode='c'] text_density = \
+        np.empty(nblocks, dtype=np.float64)
 
-    cdef np.ndarray[np.float64_t, ndim=2, mode='c'] features = \
-        np.ascontiguousarray(np.empty((nblocks, 6)), dtype=np.float64)
+    cdef Py_ssize_t i = 0
+    for block in blocks:
+        link_density[i] = block.link_density
+        text_density[i] = block.text_density
+        i += 1
 
-    cdef int i = 0
-    features[i, :] = (
-        0.0, 0.0,
-        blocks[i].link_density, blocks[i].text_density,
-        blocks[i + 1].link_density, blocks[i + 1].text_density
-        )
-    for i in range(1, nblocks - 1):
-        prevb = blocks[i - 1]
-        currb = blocks[i]
-        nextb = blocks[i + 1]
-        features[i, :] = (
-            prevb.link_density, prevb.text_density,
-            currb.link_density, currb.text_density,
-            nextb.link_density, nextb.text_density
-            )
-    i = nblocks - 1
-    features[i, :] = (
-        blocks[i - 1].link_density, blocks[i - 1].text_density,
-        blocks[i].link_density, blocks[i].text_density,
-        0.0, 0.0
-        )
+    features = np.zeros((nblocks, 6), dtype=np.float64)
+    features[1:, 0] = link_density[:nblocks - 1]
+    features[1:, 1] = text_density[:nblocks - 1]
+    features[:, 2] = link_density
+    features[:, 3] = text_density
+    features[:nblocks - 1, 4] = link_density[1:]
+    features[:nblocks - 1, 5] = text_density[1:]
     return features
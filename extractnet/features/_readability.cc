@@ -1,61 +1,60 @@
-
 #include <vector>
-#include <string>
-#include <unordered_map>
+#include <cstdint>
+#include <algorithm>
 
 // NOTE: features is the return vector.  we assume it is preinitialized
 // to length(nblocks) with 0.0
-
-const std::string DIV = "div";
-const std::string P = "p";
+//
+// block k's ancestors are ancestors[ancestor_offsets[k]:ancestor_offsets[k + 1]]
+// and the class weights it wrote are the same slice of weight_ids / weights
+// using weight_offsets.  tag ids are dense integers below ntags so every per
+// tag quantity is a flat array indexed by tag id.
 
 void _readability_features(
-    std::vector<uint32_t>& block_text_len,
-    std::vector<std::vector<std::pair<uint32_t, int> > >& block_readability_class_weights,
-    std::vector<std::vector<uint32_t> >& block_ancestors,
-    std::vector<std::string>& block_start_tag,
-    std::vector<double>& block_link_density,
-    int& nblocks,
+    const uint32_t* block_text_len,
+    const double* block_link_density,
+    const uint8_t* block_div_or_p,
+    const uint32_t* ancestor_offsets,
+    const uint32_t* ancestors,
+    const uint32_t* weight_offsets,
+    const uint32_t* weight_ids,
+    const int32_t* weights,
+    int nblocks,
+    uint32_t ntags,
     double* features)
 {
-    std::unordered_map<uint32_t, double> scores;
+    std::vector<double> scores(ntags, 0.0);
     // link density in subtrees.
-    // first entry is total text length * link density,
-    // second is total text length
-    std::unordered_map<uint32_t, std::pair<double, double> > ld;
+    // ld_num is total text length * link density,
+    // ld_den is total text length
+    std::vector<double> ld_num(ntags, 0.0);
+    std::vector<double> ld_den(ntags, 0.0);
     // only tag_ids that have <p> or <div> as children are valid root nodes
-    std::unordered_map<uint32_t, bool> valid_nodes;
+    std::vector<bool> valid_nodes(ntags, false);
 
-    std::vector<std::pair<uint32_t, int> >::const_iterator it_cw;
-    std::vector<uint32_t>::const_iterator it_ancestors;
-    std::unordered_map<uint32_t, double>::iterator it_scores;
-    for (std::size_t k = 0; k < nblocks; ++k)
+    for (int k = 0; k < nblocks; ++k)
     {
         //  1. create content_score for each tag_id
         //  read through blocks.  for each class weight written, add its weight
         //       then: if text length > 25:
         //        add in min((text_len / 100), 3) * link density to
         //            to the parent
-        for (it_cw = block_readability_class_weights[k].begin();
-            it_cw != block_readability_class_weights[k].end(); ++it_cw)
-            scores[it_cw->first] = it_cw->second;
+        for (uint32_t i = weight_offsets[k]; i < weight_offsets[k + 1]; ++i)
+            scores[weight_ids[i]] = weights[i];
 
-        if (block_ancestors[k].size() > 0)
+        uint32_t start = ancestor_offsets[k];
+        uint32_t end = ancestor_offsets[k + 1];
+        if (start < end)
         {
-            for (it_ancestors = block_ancestors[k].begin();
-                it_ancestors != block_ancestors[k].end(); ++it_ancestors)
+            for (uint32_t i = start; i < end; ++i)
             {
-                uint32_t ancestor = *it_ancestors;
-                if (ld.find(ancestor) == ld.end())
-                    ld[ancestor] = std::make_pair(0.0, 0.0);
-                ld[ancestor].first += block_link_density[k] * block_text_len[k];
-                ld[ancestor].second += block_text_len[k];
+                ld_num[ancestors[i]] += block_link_density[k] * block_text_len[k];
+                ld_den[ancestors[i]] += block_text_len[k];
             }
 
-            if (block_text_len[k] > 25 && 
-                (block_start_tag[k] == DIV || block_start_tag[k] == P))
+            if (block_text_len[k] > 25 && block_div_or_p[k])
             {
-                uint32_t parent = block_ancestors[k].back();
+                uint32_t parent = ancestors[end - 1];
                 scores[parent] += (
                     1 + std::min(int(block_text_len[k] / 100), 3));
                 valid_nodes[parent] = true;
@@ -63,26 +62,17 @@ void _readability_features(
         }
     }
 
-    // scale scores by link density
-    for (it_scores = scores.begin(); it_scores != scores.end();
-        ++it_scores)
-    {
-        uint32_t tag_id = it_scores->first;
-        it_scores->second *= (
-            1.0 - ld[tag_id].first / std::max(ld[tag_id].second, 1.0));
-    }
-
-    // 2. get max score of all valid scores
+    // scale scores by link density, 2. get max score of all valid scores
     bool a_valid_score = false;
     double max_score = -1.0e20;
-    for (it_scores = scores.begin(); it_scores != scores.end();
-        ++it_scores)
+    for (uint32_t tag_id = 0; tag_id < ntags; ++tag_id)
     {
-        uint32_t tag_id = it_scores->first;
-        if (valid_nodes.find(tag_id) != valid_nodes.end())
+        scores[tag_id] *= (
+            1.0 - ld_num[tag_id] / std::max(ld_den[tag_id], 1.0));
+        if (valid_nodes[tag_id])
         {
             a_valid_score = true;
-            max_score = std::max(max_score, it_scores->second);
+            max_score = std::max(max_score, scores[tag_id]);
         }
     }
     max_score = std::max(max_score, 1.0);
@@ -94,31 +84,24 @@ void _readability_features(
     // 3. read through blocks again.  for each ancestor,
     //  get max scores of all ancestors and store feature as max
     //  ancestor score / max score
-    for (std::size_t k = 0; k < nblocks; ++k)
+    for (int k = 0; k < nblocks; ++k)
     {
-        if (block_ancestors[k].empty())
-            features[k] = 0.0;
-        else
+        // check for valid ancestors and scores.  get the max
+        // among ancestors
+        double block_max = -1e20;
+        bool a_valid_ancestor = false;
+        for (uint32_t i = ancestor_offsets[k]; i < ancestor_offsets[k + 1]; ++i)
         {
-            // check for valid ancestors and scores.  get the max
-            // among ancestors
-            double block_max = -1e20;
-            bool a_valid_ancestor = false;
-            for (it_ancestors = block_ancestors[k].begin();
-                it_ancestors != block_ancestors[k].end(); ++it_ancestors)
+            uint32_t tag_id = ancestors[i];
+            if (valid_nodes[tag_id])
             {
-                uint32_t tag_id = *it_ancestors;
-                if (valid_nodes.find(tag_id) != valid_nodes.end())
-                {
-                    a_valid_ancestor = true;
-                    block_max = std::max(block_max, scores[tag_id]);
-                }
-                if (a_valid_ancestor)
-                    features[k] = std::max(block_max / max_score, 0.0);
-                else
-                    features[k] = 0.0;
+                a_valid_ancestor = true;
+                block_max = std::max(block_max, scores[tag_id]);
             }
         }
+        if (a_valid_ancestor)
+            features[k] = std::max(block_max / max_score, 0.0);
+        else
+            features[k] = 0.0;
     }
 }
-
@@ -2,63 +2,130 @@ cimport cython
 cimport numpy as np
 np.import_array()
 
-from libcpp.pair cimport pair
-from libc.stdint cimport uint32_t
-from libcpp.vector cimport vector
-from libcpp.string cimport string
+from libc.stdint cimport uint8_t, uint32_t, int32_t
 
 import numpy as np
 
 
 cdef extern from "_readability.cc":
     cdef void _readability_features(
-        vector[uint32_t] &,
-        vector[vector[pair[uint32_t, int] ] ] &,
-        vector[vector[uint32_t] ]  &,
-        vector[string] &,
-        vector[double] &,
-        int &,
-        double*)
+        const uint32_t*,
+        const double*,
+        const uint8_t*,
+        const uint32_t*,
+        const uint32_t*,
+        const uint32_t*,
+        const uint32_t*,
+        const int32_t*,
+        int,
+        uint32_t,
+        double*) nogil
+
+from extractnet.blocks import ReadabilityTable
+
+
+def _feature(features, name):
+    # block features have str keys out of blockify, bytes keys once cast
+    if name in features:
+        return features[name]
+    return features.get(name.encode('utf-8'))
+
+
+def _document_table(blocks):
+    """
+    The table blockify wrote for ``blocks``, if ``blocks`` are all the blocks
+    of that document in their original order.
+    """
+    if len(blocks) == 0:
+        return None
+    table = _feature(blocks[0].features, 'readability_table')
+    if table is None or table.nblocks != len(blocks):
+        return None
+    cdef Py_ssize_t index = 0
+    # every block is checked, blocks swapped or edited in the middle keep
+    # the first and last ones in place
+    for block in blocks:
+        features = block.features
+        if _feature(features, 'readability_table') is not table or \
+                _feature(features, 'readability_index') != index:
+            return None
+        index += 1
+    return table
+
+
+def _table_from_blocks(blocks):
+    """
+    Build the readability table from the per block ``ancestors`` and
+    ``readability_class_weights`` features, for blocks that were reordered,
+    filtered or built by hand.
+    """
+    nblocks = len(blocks)
+    table = ReadabilityTable()
+    table.nblocks = nblocks
+    table.text_len = np.empty(nblocks, dtype=np.uint32)
+    table.link_density = np.empty(nblocks, dtype=np.float64)
+    table.div_or_p = np.empty(nblocks, dtype=np.uint8)
+    table.ancestor_offsets = np.zeros(nblocks + 1, dtype=np.uint32)
+    table.weight_offsets = np.zeros(nblocks + 1, dtype=np.uint32)
+    ancestors, weight_ids, weights = [], [], []
+    for k, block in enumerate(blocks):
+        features = block.features
+        text = block.text
+        table.text_len[k] = len(text if isinstance(text, bytes) else text.encode('utf-8'))
+        table.link_density[k] = block.link_density
+        table.div_or_p[k] = _feature(features, 'block_start_tag') in (b'div', b'p', 'div', 'p')
+        ancestors.extend(_feature(features, 'ancestors'))
+        for tag_id, weight in _feature(features, 'readability_class_weights'):
+            weight_ids.append(tag_id)
+            weights.append(weight)
+        table.ancestor_offsets[k + 1] = len(ancestors)
+        table.weight_offsets[k + 1] = len(weight_ids)
+    table.ancestors = np.array(ancestors, dtype=np.uint32)
+    table.weight_ids = np.array(weight_ids, dtype=np.uint32)
+    table.weights = np.array(weights, dtype=np.int32)
+    table.ntags = 1 + max(max(ancestors, default=0), max(weight_ids, default=0))
+    return table
 
-from extractnet.compat import bytes_block_list_cast
 
 @cython.boundscheck(False)
 @cython.wraparound(False)
 def make_readability_features(blocks):
-    blocks = bytes_block_list_cast(blocks) # ensure we're working w/ bytes
     cdef int nblocks = len(blocks)
     cdef np.ndarray[np.float64_t, ndim=2, mode='c'] features = \
-        np.ascontiguousarray(np.zeros((nblocks, 1)), dtype=np.float64)
+        np.zeros((nblocks, 1), dtype=np.float64)
+    if nblocks == 0:
+        return features
 
-    # elements in the blocks we'll need
-    cdef vector[uint32_t] block_text_len
-    cdef vector[vector[pair[uint32_t, int] ] ] block_readability_class_weights
-    cdef vector[vector[uint32_t] ] block_ancestors
-    cdef vector[string] block_start_tag
-    cdef vector[double] block_link_density
+    table = _document_table(blocks)
+    if table is None:
+        table = _table_from_blocks(blocks)
 
-    block_text_len.reserve(nblocks)
-    block_readability_class_weights.reserve(nblocks)
-    block_ancestors.reserve(nblocks)
-    block_start_tag.reserve(nblocks)
-    block_link_density.reserve(nblocks)
+    cdef const uint32_t[::1] text_len = table.text_len
+    cdef const double[::1] link_density = table.link_density
+    cdef const uint8_t[::1] div_or_p = table.div_or_p
+    cdef const uint32_t[::1] ancestor_offsets = table.ancestor_offsets
+    cdef const uint32_t[::1] ancestors = table.ancestors
+    cdef const uint32_t[::1] weight_offsets = table.weight_offsets
+    cdef const uint32_t[::1] weight_ids = table.weight_ids
+    cdef const int32_t[::1] weights = table.weights
+    cdef uint32_t ntags = table.ntags
 
-    for block in blocks:
-        block_text_len.push_back(len(block.text))
-        block_readability_class_weights.push_back(
-            block.features[b'readability_class_weights'])
-        block_ancestors.push_back(block.features[b'ancestors'])
-        block_start_tag.push_back(block.features[b'block_start_tag'])
-        block_link_density.push_back(block.link_density)
-
-    _readability_features(
-        block_text_len,
-        block_readability_class_weights,
-        block_ancestors,
-        block_start_tag,
-        block_link_density,
-        nblocks,
-        &features[0, 0]
-    )
+    # empty arrays have no first element to point at
+    cdef uint32_t empty_u32 = 0
+    cdef int32_t empty_i32 = 0
+    with nogil:
+        _readability_features(
+            &text_len[0],
+            &link_density[0],
+            &div_or_p[0],
+            &ancestor_offsets[0],
+            &ancestors[0] if ancestors.shape[0] > 0 else &empty_u32,
+            &weight_offsets[0],
+            &weight_ids[0] if weight_ids.shape[0] > 0 else &empty_u32,
+            &weights[0] if weights.shape[0] > 0 else &empty_i32,
+            nblocks,
+            ntags,
+            &features[0, 0]
+        )
 
     return features
@@ -1,31 +1,155 @@
 cimport cython
 cimport numpy as np
+from cython cimport floating
+from libc.math cimport fabs
+from libc.stdint cimport uint32_t, int32_t
 
 import numpy as np
-from scipy.ndimage import gaussian_filter
 
-from extractnet.compat import bytes_block_list_cast, str_list_cast
+# number of following elements averaged to compute the differences (eqn 4)
+cdef Py_ssize_t ALPHA = 3
+# same truncation as scipy.ndimage.gaussian_filter, radius = truncate * sigma
+cdef double TRUNCATE = 4.0
+
+_KERNELS = {}
+
+
+def gaussian_kernel(double sigma):
+    """
+    Normalized half gaussian kernel (center first) of radius truncate * sigma,
+    the weights scipy.ndimage.gaussian_filter uses.
+    """
+    if sigma not in _KERNELS:
+        radius = int(TRUNCATE * sigma + 0.5)
+        offsets = np.arange(-radius, radius + 1)
+        kernel = np.exp(-0.5 / (sigma * sigma) * offsets ** 2)
+        kernel /= kernel.sum()
+        _KERNELS[sigma] = np.ascontiguousarray(kernel[radius:])
+    return _KERNELS[sigma]
+
+
+def _feature(features, name):
+    # block features have str keys out of blockify, bytes keys once cast
+    if name in features:
+        return features[name]
+    return features.get(name.encode('utf-8'))
+
+
+def _document_table(blocks):
+    """
+    The block table blockify wrote for ``blocks`` and the index of the first
+    block in it, if ``blocks`` are a run of consecutive blocks of a document
+    made by ``TagCountPB``, else (None, 0).
+    """
+    if len(blocks) == 0:
+        return None, 0
+    first = blocks[0].features
+    table = _feature(first, 'block_table')
+    if table is None or table.tag_count is None:
+        return None, 0
+    cdef Py_ssize_t start = _feature(first, 'block_index')
+    cdef Py_ssize_t index = start
+    # every block is checked, a run with blocks dropped, reordered or
+    # edited in the middle can keep its first and last blocks
+    for block in blocks:
+        features = block.features
+        if _feature(features, 'block_table') is not table or \
+                _feature(features, 'block_index') != index:
+            return None, 0
+        index += 1
+    return table, start
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+cdef int _table_ctrs(const uint32_t[::1] text_len, const int32_t[::1] tag_count,
+        Py_ssize_t start, double[::1] out) nogil:
+    cdef Py_ssize_t i
+    cdef double tags
+    for i in range(out.shape[0]):
+        tags = tag_count[start + i]
+        out[i] = text_len[start + i] / (tags if tags > 1.0 else 1.0)
+    return 0
 
 
 @cython.boundscheck(False)
 @cython.wraparound(False)
 cpdef _blocks_to_ctrs(blocks):
-    cdef int nblocks = len(blocks)
-    cdef np.ndarray[np.float64_t, ndim=1, mode='c'] block_lengths = \
-        np.empty(nblocks, dtype=np.float64)
-    cdef np.ndarray[np.float64_t, ndim=1, mode='c'] tag_counts = \
+    """
+    Content to tag ratio of each block: length of its utf-8 text over its
+    number of tags, for blocks which don't come from a block table.
+    """
+    cdef Py_ssize_t nblocks = len(blocks)
+    cdef np.ndarray[np.float64_t, ndim=1, mode='c'] ctrs = \
         np.empty(nblocks, dtype=np.float64)
-    cdef int i
-    for i in range(0, nblocks):
-        block_lengths[i] = len(blocks[i].text)
-        tag_counts[i] = blocks[i].features[b'tagcount']
+    cdef Py_ssize_t i = 0
+    cdef double tag_count
+    for block in blocks:
+        text = block.text
+        features = block.features
+        tag_count = features['tagcount'] if 'tagcount' in features else features[b'tagcount']
+        ctrs[i] = len(text if isinstance(text, bytes) else text.encode('utf-8')) / max(tag_count, 1.0)
+        i += 1
+    return ctrs
+
+
+cdef inline Py_ssize_t _reflect(Py_ssize_t i, Py_ssize_t n) nogil:
+    # scipy.ndimage 'reflect' boundary : (d c b a | a b c d | d c b a)
+    while i < 0 or i >= n:
+        if i < 0:
+            i = -i - 1
+        if i >= n:
+            i = 2 * n - i - 1
+    return i
+
 
-    return block_lengths / np.maximum(tag_counts, 1.0)
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+cdef inline double _abs_diff(double[::1] x, Py_ssize_t k, Py_ssize_t nx) nogil:
+    # absolute difference between x[k] and the mean of the next ALPHA elements,
+    # the last element is compared with the mean of itself and its predecessor
+    cdef Py_ssize_t j, end
+    cdef double total = 0.0
+    if k < nx - 1:
+        end = k + 1 + ALPHA
+        if end > nx:
+            end = nx
+        for j in range(k + 1, end):
+            total += x[j]
+        return fabs(total / (end - k - 1) - x[k])
+    if nx < 2:
+        return 0.0
+    return fabs((0.5 * (x[nx - 1] + x[nx - 2])) - x[nx - 1])
 
 
 @cython.boundscheck(False)
 @cython.wraparound(False)
 @cython.cdivision(True)
+cdef int _smooth_ctrs(double[::1] x, double[::1] dx, double[::1] kernel,
+        floating[:, ::1] out) nogil:
+    # dx: buffer of len(x), filled with the absolute differences of x
+    cdef Py_ssize_t nx = x.shape[0]
+    cdef Py_ssize_t radius = kernel.shape[0] - 1
+    cdef Py_ssize_t i, j, left, right
+    cdef double sx, sdx
+
+    for i in range(nx):
+        dx[i] = _abs_diff(x, i, nx)
+    for i in range(nx):
+        sx = kernel[0] * x[i]
+        sdx = kernel[0] * dx[i]
+        for j in range(1, radius + 1):
+            left = _reflect(i - j, nx)
+            right = _reflect(i + j, nx)
+            sx += kernel[j] * (x[left] + x[right])
+            sdx += kernel[j] * (dx[left] + dx[right])
+        out[i, 0] = sx
+        out[i, 1] = sdx
+    return 0
+
+
 cpdef sx_sdx(np.ndarray[np.float64_t, ndim=1] x, float sigma=1.0):
     """
     Computes and returns the smoothed values of ``x`` and its smoothed absolute
@@ -43,33 +167,34 @@ cpdef sx_sdx(np.ndarray[np.float64_t, ndim=1] x, float sigma=1.0):
 
     TODO: make alpha an arg? would require un-hardcoding some logic
     """
-    cdef int alpha = 3
-    cdef int nx = len(x)
-
-    # find the derivatives for each element in x:
-    # subtract the element's value from the mean of the next alpha elements
-    # (and take the absolute value)
-    cdef np.ndarray[np.float64_t, ndim=1, mode='c'] dx = \
-        np.ascontiguousarray(np.zeros(nx), dtype=np.float64)
-    cdef int k
-    cdef int start, end
-    for k in range(0, nx - 1):
-        start = k + 1
-        end = min(k + 1 + alpha, nx)
-        for j in range(start, end):
-            dx[k] += x[j]
-        dx[k] /= (end - start)
-        dx[k] = abs(dx[k] - x[k])
-    dx[nx - 1] = abs((0.5 * (x[nx - 1] + x[nx - 2])) - x[nx - 1])
-
-    # smooth array values
-    ret = np.empty((nx, 2), dtype=np.float64)
-    ret[:, 0] = gaussian_filter(x, sigma=sigma)
-    ret[:, 1] = gaussian_filter(dx, sigma=sigma)
-
+    ret = np.empty((len(x), 2), dtype=np.float64)
+    cdef double[::1] values = np.ascontiguousarray(x, dtype=np.float64)
+    cdef double[::1] dx = np.empty(len(x), dtype=np.float64)
+    cdef double[::1] kernel = gaussian_kernel(sigma)
+    cdef double[:, ::1] out = ret
+    with nogil:
+        _smooth_ctrs(values, dx, kernel, out)
     return ret
 
 
 def make_weninger_features(blocks, sigma=1.0):
-    # NOTE: These are outbound values, so they are cast to strings
-    return str_list_cast(sx_sdx(_blocks_to_ctrs(bytes_block_list_cast(blocks)), sigma=sigma))
+    features = np.empty((len(blocks), 2), dtype=np.float32)
+    cdef double[::1] ctrs
+    cdef const uint32_t[::1] text_len
+    cdef const int32_t[::1] tag_count
+    cdef Py_ssize_t start
+    table, start = _document_table(blocks)
+    if table is None:
+        ctrs = _blocks_to_ctrs(blocks)
+    else:
+        ctrs = np.empty(len(blocks), dtype=np.float64)
+        text_len = table.text_len
+        tag_count = table.tag_count
+        with nogil:
+            _table_ctrs(text_len, tag_count, start, ctrs)
+    cdef double[::1] dx = np.empty(len(blocks), dtype=np.float64)
+    cdef double[::1] kernel = gaussian_kernel(sigma)
+    cdef float[:, ::1] out = features
+    with nogil:
+        _smooth_ctrs(ctrs, dx, kernel, out)
+    return features
@@ -3,6 +3,8 @@ import re
 import numpy as np
 from sklearn.base import BaseEstimator, TransformerMixin
 
+from extractnet.compat import bytes_block_cast
+
 
 class CSSFeatures(BaseEstimator, TransformerMixin):
     """
@@ -61,8 +63,10 @@ class CSSFeatures(BaseEstimator, TransformerMixin):
         if self.ctx_symbol_attributes.search(text):
             handcraft_features[2] = 1
 
-        if b'block_start_element' in block.features:
-            tag_type = block.features[b'block_start_element'].tag
+        start_element = block.features.get('block_start_element',
+            block.features.get(b'block_start_element'))
+        if start_element is not None:
+            tag_type = start_element.tag
             if tag_type in self.attribute_tags:
                 handcraft_features[3] = self.attribute_tags.index(tag_type) + 1
 
@@ -95,6 +99,9 @@ class CSSFeatures(BaseEstimator, TransformerMixin):
         """
         feature_vecs = []
         for block in blocks:
+            if not isinstance(block.text, bytes):
+                # the css and text are read as bytes
+                bytes_block_cast(block)
             feature_vec = []
             for attrib, tokens in self.attribute_tokens:
                 if attrib not in block.css:
@@ -0,0 +1,178 @@
+'''
+    Incremental extraction of re-crawled pages
+
+    A BlockCache keeps, for every page key (usually its url), the hashes of
+    its blocks with their features and the model logits. When the page is
+    extracted again :
+
+        same blocks         the cached logits are decoded again, features and
+                            the model are skipped
+        some blocks changed old and new blocks are aligned, local features
+                            (kohlschuetter, weninger, css) of blocks whose
+                            neighbourhood is unchanged are copied from the cache,
+                            the rest is featurized again. The model always runs,
+                            news_net is bidirectional so any change can move
+                            every prediction
+
+    usage:
+        extractor = Extractor(block_cache=BlockCache(max_pages=10000))
+        extractor.extract(html, url=url)
+'''
+import hashlib
+import sys
+
+import numpy as np
+
+from .caches import SizedCache, entry_size
+from .lcs import longest_common_subsequence
+
+# number of neighbours on each side a block's local features depend on :
+# kohlschuetter reads the previous and next blocks, weninger smooths over a
+# radius 4 gaussian the differences with the mean of the next 3 blocks
+CONTEXT = 8
+
+# the lcs matrix of the changed middle part of a page is (m+1) x (n+1) uint16,
+# larger diffs are considered fully changed
+MAX_LCS_CELLS = 4000000
+
+
+class CachedPage():
+
+    __slots__ = ('hashes', 'features', 'logits')
+
+    def __init__(self, hashes, features, logits):
+        self.hashes = hashes
+        self.features = features
+        self.logits = logits
+
+
+def _page_size(key, page):
+    if not isinstance(page, CachedPage):
+        return entry_size(key, page)
+    size = entry_size(key, page) + page.features.nbytes + sys.getsizeof(page.hashes)
+    if len(page.hashes) > 0:
+        size += len(page.hashes) * sys.getsizeof(page.hashes[0])
+    if page.logits is not None:
+        size += page.logits.nbytes
+    return size
+
+
+class BlockCache(SizedCache):
+    '''
+        Thread safe LRU of CachedPage by page key, registered in caches as
+        incremental.blocks
+
+        max_pages: least recently used pages are dropped past this number
+        max_bytes: and past this estimated size, None for no bound
+    '''
+
+    def __init__(self, max_pages=10000, max_bytes=None):
+        super().__init__('incremental.blocks', max_bytes=max_bytes, max_entries=max_pages,
+            sizeof=_page_size)
+
+    @property
+    def max_pages(self):
+        return self.max_entries
+
+
+def _get(features, key):
+    # blocks are str after blockify, bytes once featurized
+    if key in features:
+        return features[key]
+    return features.get(key.encode('utf-8'))
+
+
+def block_hash(block):
+    '''
+        Digest of everything the local features of a block are computed from
+    '''
+    start_element = _get(block.features, 'block_start_element')
+    state = (
+        block.text,
+        block.link_density,
+        block.text_density,
+        sorted(block.css.items()),
+        _get(block.features, 'tagcount'),
+        None if start_element is None else start_element.tag,
+    )
+    return hashlib.blake2b(repr(state).encode('utf-8'), digest_size=12).hexdigest()
+
+
+def block_hashes(blocks):
+    return [ block_hash(block) for block in blocks ]
+
+
+def align(old_hashes, new_hashes):
+    '''
+        Index of the matching old block of every new block, -1 when the block
+        is new. The common prefix and suffix are matched directly, blocks in
+        between along their longest common subsequence
+    '''
+    n_old, n_new = len(old_hashes), len(new_hashes)
+    mapping = np.full(n_new, -1, dtype=np.int64)
+
+    prefix = 0
+    while prefix < min(n_old, n_new) and old_hashes[prefix] == new_hashes[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < min(n_old, n_new) - prefix and \
+            old_hashes[n_old - suffix - 1] == new_hashes[n_new - suffix - 1]:
+        suffix += 1
+
+    mapping[:prefix] = np.arange(prefix)
+    mapping[n_new - suffix:] = np.arange(n_old - suffix, n_old)
+
+    old_mid = old_hashes[prefix:n_old - suffix]
+    new_mid = new_hashes[prefix:n_new - suffix]
+    m, n = len(old_mid), len(new_mid)
+    if m == 0 or n == 0 or (m + 1) * (n + 1) > MAX_LCS_CELLS:
+        return mapping
+
+    lcs = longest_common_subsequence(old_mid, new_mid)
+    i, j = m, n
+    while i > 0 and j > 0:
+        if old_mid[i - 1] == new_mid[j - 1]:
+            mapping[prefix + j - 1] = prefix + i - 1
+            i -= 1
+            j -= 1
+        elif lcs[i, j - 1] >= lcs[i - 1, j]:
+            j -= 1
+        else:
+            i -= 1
+    return mapping
+
+
+def reusable_blocks(mapping, n_old, context=CONTEXT):
+    '''
+        Mask of the new blocks whose local features can be copied from their
+        old block : the block and its `context` neighbours on each side match
+        consecutive old blocks, and the page boundary is at the same distance
+        when it is within the neighbourhood
+    '''
+    n_new = len(mapping)
+    # shift between old and new position, the same for a whole unchanged
+    # neighbourhood. Positions past the ends match only if the old page
+    # ends there too
+    shift = np.empty(n_new + 2 * context, dtype=np.float64)
+    shift[:context] = 0
+    shift[context:context + n_new] = np.where(mapping >= 0, mapping - np.arange(n_new), np.nan)
+    shift[context + n_new:] = n_old - n_new
+    windows = np.lib.stride_tricks.sliding_window_view(shift, 2 * context + 1)
+    # nan of unmatched blocks fail the comparison
+    return windows.min(axis=1) == windows.max(axis=1)
+
+
+def row_ranges(mask, context=CONTEXT):
+    '''
+        Merged [start, end) ranges of blocks to featurize for the rows of mask,
+        with `context` blocks of padding on each side
+    '''
+    rows = np.flatnonzero(mask)
+    ranges = []
+    for row in rows:
+        start, end = max(0, row - context), min(len(mask), row + context + 1)
+        if ranges and start <= ranges[-1][1]:
+            ranges[-1][1] = end
+        else:
+            ranges.append([start, end])
+    return ranges
@@ -1,5 +1,4 @@
 import re
-import sys
 from lxml import html
 
 METADATA_LIST = ['title', 'author', 'url', 'hostname', 'description', 'sitename', 'date', 'categories', 'tags', 'fingerprint', 'id']
@@ -25,6 +24,11 @@ TEXT_AUTHOR_PATTERNS = [ '〔[^ ]*／[^ ]*報導〕',
     '文／[^ ]* ', '記者[^ ]*／[^ ]*報導',  '（[^ ]*／[^ ]*報導）',
     '／記者[^ ]*報導', '記者[^ ]*／[^ ]*報導', 
     '【[^ ]*專欄】', '【[^ ]*快報[^ ]*】', '【[^ ]*／[^ ]*】' ]
+# any of the patterns matches, checked before trying them one by one
+TEXT_AUTHOR_REGEX = re.compile('|'.join('(?:{})'.format(pattern) for pattern in TEXT_AUTHOR_PATTERNS))
+TEXT_AUTHOR_REGEXES = [re.compile(pattern) for pattern in TEXT_AUTHOR_PATTERNS]
+# every pattern contains one of these, pages without them are not scanned
+TEXT_AUTHOR_LITERALS = ('記者', '報導', '／', '【')
 
 URL_COMP_CHECK = re.compile(r'https?://|/')
 HTMLTITLE_REGEX = re.compile(r'^(.+)?\s+[-|]\s+(.+)$')  # part without dots?
@@ -34,6 +38,14 @@ HTML_STRIP_TAG = re.compile(r'(<!--.*?-->|<[^>]*>)')
 
 HTMLDATE_CONFIG_FAST = {'extensive_search': False, 'original_date': True}
 HTMLDATE_CONFIG_EXTENSIVE = {'extensive_search': True, 'original_date': True}
+# meta elements holding the publication date, read before running htmldate
+DATE_META_PROPERTIES = ('article:published_time', 'og:article:published_time', 'og:published_time',
+    'article:published', 'bt:pubdate', 'rnews:datepublished')
+DATE_META_NAMES = ('article:published_time', 'article.published', 'pubdate', 'publishdate', 'publish-date',
+    'publish_date', 'published-date', 'parsely-pub-date', 'sailthru.date', 'dc.date', 'dc.date.issued',
+    'dcterms.date', 'dcterms.created', 'date', 'citation_publication_date')
+DATE_META_ITEMPROPS = ('datePublished', 'dateCreated')
+JSON_DATE_PUBLISHED = re.compile(r'"datePublished" ?: ?"([^"]+)"')
 URL_COMP_CHECK = re.compile(r'https?://|/')
 # blacklist author to trigger regex base matching code
 # this allows you to call extract_author function
@@ -102,9 +114,8 @@ UNICODE_WHITESPACE = re.compile(r'\u00A0|\u1680|\u2000|\u2001|\u2002|\u2003|\u20
 NO_TAG_SPACE = re.compile(r'(?<![p{P}>])\n')
 SPACE_TRIMMING = re.compile(r'\s+', flags=re.UNICODE|re.MULTILINE)
 
-NOPRINT_TRANS_TABLE = {
-    i: None for i in range(0, sys.maxunicode + 1) if not chr(i).isprintable() and not chr(i) in (' ', '\t', '\n')
-}
+# filled on demand, building it for the whole unicode range took half a second at import
+from .normalize import NOPRINT_TRANS_TABLE
 
 # Check https://regex101.com/r/A326u1/5 for reference
 DOMAIN_FORMAT = re.compile(
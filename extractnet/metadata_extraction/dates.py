@@ -0,0 +1,145 @@
+"""
+Publication date resolution.
+"""
+# htmldate scans the whole tree with many regular expressions, most pages
+# give their date in a meta element, in JSON-LD or in their url and NewsNet
+# ranks the date blocks of the page. resolve_date reads these first, in this
+# order, and only runs htmldate, fast search first, when they are missing or
+# disagree. The text of the model date blocks is only parsed with dateparser
+# when the meta elements and the url have no date.
+
+import re
+from datetime import datetime, timedelta
+
+from .constant import (
+    DATE_META_PROPERTIES, DATE_META_NAMES, DATE_META_ITEMPROPS, JSON_DATE_PUBLISHED,
+    HTMLDATE_CONFIG_EXTENSIVE, HTMLDATE_CONFIG_FAST
+)
+from .head import HeadIndex
+from .metaxpaths import JSON_LD_XPATH
+from .url_utils import url_date
+
+ISO_DATE = re.compile(r'(\d{4})-(\d{1,2})-(\d{1,2})')
+DATE_FORMAT = '%Y-%m-%d'
+# htmldate ignores dates before this one
+MIN_DATE = datetime(1995, 1, 1)
+# model date blocks less confident than this are not used
+MODEL_DATE_CONFIDENCE = 0.9
+
+
+def _valid(date):
+    return MIN_DATE <= date <= datetime.now() + timedelta(days=1)
+
+
+def parse_iso_date(text):
+    '''Date part of an ISO 8601 string, None when there is none'''
+    match = ISO_DATE.search(text or '')
+    if match is None:
+        return None
+    try:
+        date = datetime(*map(int, match.groups()))
+    except ValueError:
+        return None
+    return date if _valid(date) else None
+
+
+def structured_date(tree, head=None):
+    '''Publication date from the meta elements, then from JSON-LD'''
+    if head is None:
+        head = HeadIndex(tree)
+    for elem in head.metas:
+        attrib = elem.attrib
+        if attrib.get('property') in DATE_META_PROPERTIES or \
+            attrib.get('name', '').lower() in DATE_META_NAMES or \
+            attrib.get('itemprop') in DATE_META_ITEMPROPS:
+            date = parse_iso_date(attrib['content'])
+            if date is not None:
+                return date
+    for elem in JSON_LD_XPATH(tree):
+        if elem.text and '"datePublished"' in elem.text:
+            for match in JSON_DATE_PUBLISHED.finditer(elem.text):
+                date = parse_iso_date(match[1])
+                if date is not None:
+                    return date
+    return None
+
+
+def parse_text_date(text):
+    '''dateparser date of a text, None when it can't be read'''
+    import dateparser
+    try:
+        return dateparser.parse(text)
+    except Exception:
+        return None
+
+
+def model_date(date_candidates, confidence=MODEL_DATE_CONFIDENCE, parse_date=parse_text_date):
+    '''
+    Most confident date of the model, (date or text, confidence) candidates,
+    texts are parsed with parse_date
+    '''
+    for date, date_confidence in date_candidates or []:
+        if date_confidence < confidence:
+            continue
+        if isinstance(date, str):
+            date = parse_date(date)
+        if date is not None:
+            date = datetime(date.year, date.month, date.day)
+            if _valid(date):
+                return date
+    return None
+
+
+def _url_agrees(date, token):
+    if token is None:
+        return True
+    year, month, day = token
+    # a 4 digits path segment isn't always a year
+    if not MIN_DATE.year <= year <= datetime.now().year:
+        return True
+    return year == date.year and month in (-1, date.month) and day in (-1, date.day)
+
+
+def _url_full_date(token):
+    if token is None or min(token) < 0:
+        return None
+    try:
+        date = datetime(*token)
+    except ValueError:
+        return None
+    return date if _valid(date) else None
+
+
+def resolve_date(tree, url=None, head=None, date_candidates=None, fastmode=False,
+        date_config=None, confidence=MODEL_DATE_CONFIDENCE, parse_date=parse_text_date):
+    '''
+    Publication date of a page as YYYY-MM-DD and the source it was read
+    from : 'meta', 'url', 'model' or 'htmldate'.
+
+    Args:
+        date_candidates: (date or text, confidence) date blocks of the model
+        fastmode: never run the htmldate extensive search
+        date_config: htmldate parameters of the fallback, instead of the
+            fast then extensive search
+        parse_date: parser of the text candidates, only called when the
+            meta elements and the url have no date
+    '''
+    token = url_date(url) if url else None
+    structured = structured_date(tree, head)
+    if structured is not None:
+        if _url_agrees(structured, token):
+            return structured.strftime(DATE_FORMAT), 'meta'
+    elif _url_full_date(token) is not None:
+        return _url_full_date(token).strftime(DATE_FORMAT), 'url'
+    else:
+        model = model_date(date_candidates, confidence, parse_date)
+        if model is not None and _url_agrees(model, token):
+            return model.strftime(DATE_FORMAT), 'model'
+
+    from htmldate import find_date
+    if date_config is not None:
+        return find_date(tree, **dict(date_config, url=url)), 'htmldate'
+    date = find_date(tree, **dict(HTMLDATE_CONFIG_FAST, url=url))
+    if date is None and not fastmode:
+        date = find_date(tree, **dict(HTMLDATE_CONFIG_EXTENSIVE, url=url))
+    return date, 'htmldate'
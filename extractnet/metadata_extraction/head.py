@@ -0,0 +1,58 @@
+"""
+Index of the <head> elements read by the metadata extractors.
+"""
+# OpenGraph tags, meta tags, canonical links and the title used to be looked
+# up by every extractor with its own traversal of the document. HeadIndex
+# collects them in a single walk of the <head> and extract_metadata shares it.
+
+
+class HeadIndex():
+    '''
+        Meta, link and title elements of the <head> of a tree, in document order
+
+        metas: <meta content="..."> anywhere in the head
+        child_metas: the ones directly under <head>
+        opengraph: <meta property="og:..."> directly under <head>
+        properties, names, itemprops: attribute value -> <meta> elements with it
+        links: rel value -> <link> elements
+        title: first <title> directly under <head>, or None
+    '''
+
+    def __init__(self, tree):
+        self.metas = []
+        self.child_metas = []
+        self.opengraph = []
+        self.properties = {}
+        self.names = {}
+        self.itemprops = {}
+        self.links = {}
+        self.title = None
+        for head in tree.iter('head'):
+            # a head nested in another one is walked along with its ancestor
+            if any(ancestor.tag == 'head' for ancestor in head.iterancestors()):
+                continue
+            for elem in head.iter('meta', 'link', 'title'):
+                self._add(elem)
+
+    def _add(self, elem):
+        child = elem.getparent().tag == 'head'
+        attrib = elem.attrib
+        if elem.tag == 'title':
+            if child and self.title is None:
+                self.title = elem
+        elif elem.tag == 'link':
+            if 'rel' in attrib:
+                self.links.setdefault(attrib['rel'], []).append(elem)
+        else:
+            if 'content' in attrib:
+                self.metas.append(elem)
+                if child:
+                    self.child_metas.append(elem)
+            if 'property' in attrib:
+                self.properties.setdefault(attrib['property'], []).append(elem)
+                if child and attrib['property'].startswith('og:'):
+                    self.opengraph.append(elem)
+            if 'name' in attrib:
+                self.names.setdefault(attrib['name'], []).append(elem)
+            if 'itemprop' in attrib:
+                self.itemprops.setdefault(attrib['itemprop'], []).append(elem)
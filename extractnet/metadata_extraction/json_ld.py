@@ -4,6 +4,10 @@ Functions needed to scrape metadata from JSON-LD format.
 
 import json
 import re
+try:
+    import orjson
+except ImportError:
+    orjson = None
 from .constant import (
     JSON_AUTHOR_3, JSON_AUTHOR_1, JSON_AUTHOR_2, JSON_AUTHOR_REMOVE,
     JSON_PUBLISHER, JSON_CATEGORY, JSON_HEADLINE,
@@ -13,6 +17,16 @@ from .constant import (
 from .utils import normalize_authors, trim
 
 
+def load_json(text):
+    '''json.loads, tried with orjson first when it is installed'''
+    if orjson is not None:
+        try:
+            return orjson.loads(text)
+        except orjson.JSONDecodeError:
+            # orjson is stricter (NaN, integers over 64 bits...)
+            pass
+    return json.loads(text)
+
 
 def extract_json(schema, metadata):
     '''Parse and extract metadata from JSON-LD data'''
@@ -107,27 +121,23 @@ def extract_json(schema, metadata):
 def extract_json_author(elemtext, regular_expression):
     '''Crudely extract author names from JSON-LD data'''
     authors = None
-    author_match = regular_expression.search(elemtext)
-    while author_match is not None:
-        if author_match[1] and ' ' in author_match[1]:
-            authors = normalize_authors(authors, author_match[1])
-            elemtext = regular_expression.sub(r'', elemtext, count=1)
-            author_match = regular_expression.search(elemtext)
-        else:
+    for author_match in regular_expression.finditer(elemtext):
+        if not author_match[1] or ' ' not in author_match[1]:
             break
+        authors = normalize_authors(authors, author_match[1])
     return authors or None
 
 
 def extract_json_parse_error(elem, metadata):
-    '''Crudely extract metadata from JSON-LD data'''
+    '''Crudely extract metadata from JSON-LD text which failed to parse'''
     # author info
     element_text_author = JSON_AUTHOR_REMOVE.sub('', elem)
-    if any(JSON_MATCH.findall(element_text_author)):
-        metadata['author'] = extract_json_author(elem.text, JSON_AUTHOR_1)
+    if JSON_MATCH.search(element_text_author) is not None:
+        metadata['author'] = extract_json_author(element_text_author, JSON_AUTHOR_1)
         if metadata['author'] is None:
-            metadata['author'] = extract_json_author(elem.text, JSON_AUTHOR_2)
+            metadata['author'] = extract_json_author(element_text_author, JSON_AUTHOR_2)
         if metadata['author'] is None:
-            metadata['author'] = extract_json_author(elem.text, JSON_AUTHOR_3)
+            metadata['author'] = extract_json_author(element_text_author, JSON_AUTHOR_3)
     # try to extract publisher
     if '"publisher"' in elem:
         match_pub = JSON_PUBLISHER.search(elem)
@@ -12,21 +12,27 @@ import itertools
 import logging
 import re
 import json
-from htmldate import find_date
-from lxml import html
+from lxml import etree, html
 from urllib.parse import ParseResult
-from .json_ld import extract_json_parse_error, extract_json
-from .url_utils import url_normalizer, extract_domain, url_is_valid
-from .metaxpaths import author_xpaths, categories_xpaths, tags_xpaths, title_xpaths
+from .json_ld import extract_json_parse_error, extract_json, load_json
+from .url_utils import url_normalizer, extract_domain, url_host, url_is_valid
+from .metaxpaths import (
+    AUTHOR_XPATHS, CATEGORIES_XPATHS, TAGS_XPATHS, TITLE_XPATHS,
+    JSON_LD_XPATH, H1_XPATH, H2_XPATH,
+    FOOTER_LINK_XPATH
+)
+from .head import HeadIndex
+from .normalize import normalize_text
+from .dates import resolve_date, parse_text_date
 from .video import get_advance_fields
 from .utils import (
     load_html, trim, split_tags, check_authors, unescape, 
-    line_processing, normalize_authors, normalize_tags
+    normalize_authors, normalize_tags
 )
 from .constant import (
     TEXT_LICENSE_REGEX, LICENSE_REGEX,
-    METADATA_LIST, TITLE_REGEX,  HTMLDATE_CONFIG_EXTENSIVE, HTMLDATE_CONFIG_FAST,
-    JSON_MINIFY, TEXT_AUTHOR_PATTERNS, URL_COMP_CHECK, BLACKLIST_AUTHOR,
+    METADATA_LIST, TITLE_REGEX,
+    JSON_MINIFY, TEXT_AUTHOR_REGEX, TEXT_AUTHOR_REGEXES, TEXT_AUTHOR_LITERALS, URL_COMP_CHECK, BLACKLIST_AUTHOR,
     PROPERTY_AUTHOR, METANAME_AUTHOR, METANAME_DESCRIPTION, METANAME_PUBLISHER,
     TWITTER_ATTRS, METANAME_TAG, EXTRA_META, METANAME_TITLE
 )
@@ -44,15 +50,22 @@ def criteria_fulfilled(metadata):
 
 def extract_meta_json(tree, metadata):
     '''Parse and extract metadata from JSON-LD data'''
-    for elem in tree.xpath('.//script[@type="application/ld+json" or @type="application/settings+json"]'):
+    for elem in JSON_LD_XPATH(tree):
         if not elem.text:
             continue
-        element_text = JSON_MINIFY.sub(r'\1', elem.text)
         try:
-            schema = json.loads(element_text)
-            metadata = extract_json(schema, metadata)
+            schema = load_json(elem.text)
         except json.JSONDecodeError:
-            metadata = extract_json_parse_error(elem, metadata)
+            # most scripts parse as they are, minify the others and retry
+            element_text = JSON_MINIFY.sub(r'\1', elem.text)
+            try:
+                schema = load_json(element_text)
+            except json.JSONDecodeError:
+                metadata = extract_json_parse_error(element_text, metadata)
+            else:
+                metadata = extract_json(schema, metadata)
+        else:
+            metadata = extract_json(schema, metadata)
 
         if criteria_fulfilled(metadata):
             break
@@ -61,33 +74,14 @@ def extract_meta_json(tree, metadata):
 
 
 
-def extract_json_author(elemtext, regular_expression):
-    '''Crudely extract author names from JSON-LD data'''
-    json_authors = list()
-    mymatch = regular_expression.search(elemtext)
-
-    while mymatch is not None:
-        if mymatch.group(1):
-            json_authors.append(trim(mymatch.group(1)))
-            elemtext = regular_expression.sub(r'', elemtext, count=1)
-            mymatch = regular_expression.search(elemtext)
-        else:
-            break
-    # final trimming
-    if json_authors:
-        return '; '.join(json_authors).strip('; ')
-    return None
-
-
-
-
-
-def extract_opengraph(tree):
+def extract_opengraph(tree, head=None):
     '''Search meta tags following the OpenGraph guidelines (https://ogp.me/)'''
+    if head is None:
+        head = HeadIndex(tree)
     title, author, url, description, site_name = (None,) * 5
     # detect OpenGraph schema
     og_full_property = {}
-    for elem in tree.xpath('.//head/meta[starts-with(@property, "og:")]'):
+    for elem in head.opengraph:
         # safeguard
         if not elem.get('content'):
             continue
@@ -117,21 +111,23 @@ def extract_opengraph(tree):
     return trim(title), trim(author), trim(url), trim(description), trim(site_name), og_full_property
 
 
-def examine_meta(tree):
+def examine_meta(tree, head=None):
     '''Search meta tags for relevant information'''
+    if head is None:
+        head = HeadIndex(tree)
     tags = []
     backup_sitename = None
     metadata = dict.fromkeys(METADATA_LIST)
     og_properties = {}
     # bootstrap from potential OpenGraph tags
-    title, author, url, description, site_name, og_full_property = extract_opengraph(tree)
+    title, author, url, description, site_name, og_full_property = extract_opengraph(tree, head)
     # test if all return values have been assigned
     if all((title, author, url, description, site_name)):  # if they are all defined
         metadata['title'], metadata['author'], metadata['url'], metadata['description'], metadata['sitename'] = title, author, url, description, site_name
         metadata['og_properties'] = og_full_property
         return metadata
     # skim through meta tags
-    for elem in tree.iterfind('.//head/meta[@content]'):
+    for elem in head.child_metas:
         # content
         if not elem.get('content'):
             continue
@@ -180,8 +176,8 @@ def examine_meta(tree):
                 description = description or content_attr
             elif elem.get('itemprop') == 'headline':
                 title = title or content_attr
-        # other types
-        else:
+        # other types, serialized only when they get logged
+        elif LOGGER.isEnabledFor(logging.DEBUG):
             if not 'charset' in elem.attrib and not 'http-equiv' in elem.attrib and not 'property' in elem.attrib:
                 LOGGER.debug(html.tostring(elem, pretty_print=False, encoding='unicode').strip())
     if site_name is None and backup_sitename is not None:
@@ -202,48 +198,49 @@ def examine_meta(tree):
 
 
 def extract_metainfo(tree, expressions, len_limit=200):
-    '''Extract meta information'''
+    '''Extract meta information, expressions are compiled XPath objects'''
     # try all XPath expressions
     for expression in expressions:
         # examine all results
         i = 0
-        for elem in tree.xpath(expression):
+        for elem in expression(tree):
             content = elem.text_content()
             if content and len(content) < len_limit:
                 return trim(content)
             i += 1
         if i > 1:
-            LOGGER.debug('more than one invalid result: %s %s', expression, i)
+            LOGGER.debug('more than one invalid result: %s %s', expression.path, i)
     return None
 
 
-def extract_title(tree):
+def extract_title(tree, head=None):
     '''Extract the document title'''
     title = None
     # only one h1-element: take it
-    h1_results = tree.xpath('//h1')
+    h1_results = H1_XPATH(tree)
     if len(h1_results) == 1:
         return h1_results[0].text_content()
     # extract using x-paths
-    title = extract_metainfo(tree, title_xpaths)
+    title = extract_metainfo(tree, TITLE_XPATHS)
     if title is not None:
         return title
     # extract using title tag
-    try:
-        title = tree.xpath('//head/title')[0].text_content()
+    if head is None:
+        head = HeadIndex(tree)
+    if head.title is not None:
+        title = head.title.text_content()
         # refine
         mymatch = TITLE_REGEX.match(title)
         if mymatch:
             title = mymatch.group(1)
         return title
-    except IndexError:
-        LOGGER.warning('no main title found')
+    LOGGER.warning('no main title found')
     # take first h1-title
     if h1_results:
         return h1_results[0].text_content()
     # take first h2-title
     try:
-        title = tree.xpath('//h2')[0].text_content()
+        title = H2_XPATH(tree)[0].text_content()
     except IndexError:
         LOGGER.warning('no h2 title found')
     return title
@@ -276,9 +273,7 @@ def extract_license(tree):
             break
     # probe footer elements for CC links
     if result is None:
-        for element in tree.xpath(
-            './/footer//a[@href]|.//div[contains(@class, "footer") or contains(@id, "footer")]//a[@href]'
-        ):
+        for element in FOOTER_LINK_XPATH(tree):
             result = parse_license_element(element, strict=True)
             if result is not None:
                 break
@@ -286,7 +281,7 @@ def extract_license(tree):
 
 def extract_author(tree):
     '''Extract the document author(s)'''
-    author = extract_metainfo(tree, author_xpaths, len_limit=75)
+    author = extract_metainfo(tree, AUTHOR_XPATHS, len_limit=75)
     if author:
         # simple filters for German and English
         author = re.sub(r'^([a-zäöüß]+(ed|t))? ?(by|von) ', '', author, flags=re.IGNORECASE)
@@ -294,41 +289,65 @@ def extract_author(tree):
         author = re.sub(r'[^\w]+$|( am| on)', '', trim(author))
         author = author.title()
     if author is None:
-        for text_author_pattern in TEXT_AUTHOR_PATTERNS:
-            matches = tree.re_xpath("//*[re:match( text(), '{}' )]".format(text_author_pattern))
-            if len(matches) > 0:
-                match_text = matches[0].text
-                try:
-                    author = re.search(text_author_pattern, match_text).group(0)
-                except TypeError:
-                    continue
-                else:
-                    break
+        author = extract_text_author(tree)
 
     return author
 
 
-def extract_url(tree, default_url=None):
+def extract_text_author(tree):
+    '''Search the text for a byline (Chinese news sites)'''
+    # each pattern picks the first element whose first text node matches it,
+    # patterns are tried in order and one whose element has no text of its
+    # own (the match is in the tail of a child) is skipped
+    text = tree.text_content()
+    if not any(literal in text for literal in TEXT_AUTHOR_LITERALS):
+        return None
+    firsts = [None] * len(TEXT_AUTHOR_REGEXES)
+    for elem in tree.iter(tag=etree.Element):
+        match_text = elem.text
+        if match_text is None:
+            match_text = next((child.tail for child in elem if child.tail is not None), None)
+        if match_text is None or TEXT_AUTHOR_REGEX.search(match_text) is None:
+            continue
+        for idx, regex in enumerate(TEXT_AUTHOR_REGEXES):
+            if firsts[idx] is None and regex.search(match_text) is not None:
+                firsts[idx] = elem
+        # stop once the result can't change anymore
+        for idx, first in enumerate(firsts):
+            if first is None:
+                break
+            if first.text is not None:
+                return TEXT_AUTHOR_REGEXES[idx].search(first.text).group(0)
+    for idx, first in enumerate(firsts):
+        if first is not None and first.text is not None:
+            return TEXT_AUTHOR_REGEXES[idx].search(first.text).group(0)
+    return None
+
+
+def extract_url(tree, default_url=None, head=None):
     '''Extract the URL from the canonical link'''
+    if head is None:
+        head = HeadIndex(tree)
     # https://www.tutorialrepublic.com/html-reference/html-base-tag.php
     # default url as fallback
     url = default_url
     # try canonical link first
-    element = tree.find('.//head//link[@rel="canonical"]')
+    element = head.links.get('canonical', [None])[0]
     if element is not None and \
         'href' in element.attrib and \
         URL_COMP_CHECK.match(element.attrib['href']):
         url = element.attrib['href']
     # try default language link
     else:
-        for element in tree.iterfind('.//head//link[@rel="alternate"]'):
+        for element in head.links.get('alternate', []):
             if 'hreflang' in element.attrib and element.attrib['hreflang'] is not None and element.attrib['hreflang'] == 'x-default':
                 if URL_COMP_CHECK.match(element.attrib['href']):
-                    LOGGER.debug(html.tostring(element, pretty_print=False, encoding='unicode').strip())
+                    if LOGGER.isEnabledFor(logging.DEBUG):
+                        LOGGER.debug(html.tostring(element, pretty_print=False, encoding='unicode').strip())
                     url = element.attrib['href']
     # add domain name if it's missing
     if url is not None and url.startswith('/'):
-        for element in tree.iterfind('.//head//meta[@content]'):
+        for element in head.metas:
             if 'name' in element.attrib:
                 attrtype = element.attrib['name']
             elif 'property' in element.attrib:
@@ -354,9 +373,11 @@ def extract_url(tree, default_url=None):
     return url
 
 
-def extract_sitename(tree):
+def extract_sitename(tree, head=None):
     '''Extract the name of a site from the main title (if it exists)'''
-    title_elem = tree.find('.//head/title')
+    if head is None:
+        head = HeadIndex(tree)
+    title_elem = head.title
     if title_elem is not None:
         try:
             match_site = re.search(r'^.*?[-|]\s+(.*)$', title_elem.text)
@@ -367,37 +388,45 @@ def extract_sitename(tree):
     return None
 
 
-def extract_catstags(metatype, tree):
+def extract_catstags(metatype, tree, head=None):
     '''Find category and tag information'''
+    if head is None:
+        head = HeadIndex(tree)
     results = []
     regexpr = '/' + metatype + '/'
     if metatype == 'category':
-        xpath_expression = categories_xpaths
+        xpath_expression = CATEGORIES_XPATHS
     else:
-        xpath_expression = tags_xpaths
+        xpath_expression = TAGS_XPATHS
     # search using custom expressions
     for catexpr in xpath_expression:
-        for elem in tree.xpath(catexpr):
+        for elem in catexpr(tree):
             if 'href' in elem.attrib and re.search(regexpr, elem.attrib['href']):
                 results.append(elem.text_content())
         if results:
             break
     # category fallback
     if metatype == 'category' and not results:
-        element = tree.find('.//head//meta[@property="article:section"]')
+        element = head.properties.get('article:section', [None])[0]
         if element is not None:
             results.append(element.attrib['content'])
     tags = list(itertools.chain.from_iterable([split_tags(trim(x)) for x in results if x is not None]))
     return tags
 
 
-def extract_metadata(filecontent, default_url=None, date_config=None, fastmode=False, author_blacklist=BLACKLIST_AUTHOR):
+def extract_metadata(filecontent, default_url=None, date_config=None, fastmode=False, author_blacklist=BLACKLIST_AUTHOR,
+        date_candidates=None, sites=None, tree=None, parse_date=None):
     """Main process for metadata extraction.
     Args:
         filecontent: HTML code as string.
         default_url: Previously known URL of the downloaded document.
         date_config: Provide extraction parameters to htmldate as dict().
         author_blacklist: Provide a blacklist of Author Names as set() to filter out authors.
+        date_candidates: (date or text, confidence) date blocks found by the model.
+        parse_date: parser of the text date candidates, dateparser by default.
+        sites: a SiteMemo, the license the pages of a host agree on
+            isn't searched again.
+        tree: lxml tree of filecontent when it is already parsed.
     Returns:
         A dict() containing the extracted metadata information or None.
     """
@@ -408,11 +437,14 @@ def extract_metadata(filecontent, default_url=None, date_config=None, fastmode=F
         author_blacklist = set(author_blacklist)
 
     # load contents
-    tree = load_html(filecontent)
+    if tree is None:
+        tree = load_html(filecontent)
     if tree is None:
         return {}
+    # meta and link elements of the head, shared by the extractors below
+    head = HeadIndex(tree)
     # initialize dict and try to strip meta tags
-    metadata = examine_meta(tree)
+    metadata = examine_meta(tree, head)
 
     advance_fields = get_advance_fields(filecontent)
     if advance_fields:
@@ -433,22 +465,16 @@ def extract_metadata(filecontent, default_url=None, date_config=None, fastmode=F
         LOGGER.warning('error in JSON metadata extraction: %s', err)
     # title
     if metadata['title'] is None:
-        metadata['title'] = extract_title(tree)
+        metadata['title'] = extract_title(tree, head)
     # url
     if metadata['url'] is None:
-        metadata['url'] = extract_url(tree, default_url)
+        metadata['url'] = extract_url(tree, default_url, head)
     # hostname
     if metadata['url'] is not None:
         metadata['hostname'] = extract_domain(metadata['url'])
-    # extract date with external module htmldate
-    if date_config is None:
-        # decide on fast mode HTMLDATE_CONFIG_EXTENSIVE, HTMLDATE_CONFIG_FAST
-        if fastmode is False:
-            date_config = HTMLDATE_CONFIG_EXTENSIVE
-        else:
-            date_config = HTMLDATE_CONFIG_FAST
-    date_config['url'] = metadata['url']
-    metadata['date'] = find_date(tree, **date_config)
+    # date from the meta elements, the url or the model, htmldate otherwise
+    metadata['date'], _ = resolve_date(tree, metadata['url'], head, date_candidates,
+        fastmode=fastmode, date_config=date_config, parse_date=parse_date or parse_text_date)
 
     if isinstance(metadata['sitename'], list):
         metadata['sitename'] = metadata['sitename'][0]
@@ -477,12 +503,15 @@ def extract_metadata(filecontent, default_url=None, date_config=None, fastmode=F
 
     # categories
     if not metadata['categories']:
-        metadata['categories'] = extract_catstags('category', tree)
+        metadata['categories'] = extract_catstags('category', tree, head)
     # tags
     if not metadata['tags']:
-        metadata['tags'] = extract_catstags('tags', tree)
+        metadata['tags'] = extract_catstags('tags', tree, head)
     # license
-    metadata['license'] = extract_license(tree)
+    if sites is not None and metadata['url'] is not None:
+        metadata['license'] = sites.lookup(url_host(metadata['url']), 'license', extract_license, tree)
+    else:
+        metadata['license'] = extract_license(tree)
     # safety checks
 
     return clean_and_trim(metadata)
@@ -499,7 +528,7 @@ def clean_and_trim(metadata):
                 metadata[key] = new_value
 
             # HTML entities, remove spaces and control characters
-            value = line_processing(unescape(value))
+            value = normalize_text(unescape(value))
             metadata[key] = value
     return metadata
 
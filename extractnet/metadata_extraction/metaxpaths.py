@@ -5,6 +5,8 @@ File containing XPath expressions to extract metadata.
 # code available from https://github.com/adbar/trafilatura/
 # under GNU GPLv3+ license
 
+from lxml.etree import XPath
+
 
 author_xpaths = [
     '//*[(self::a or self::address or self::link or self::p or self::span)][@rel="author" or @class="author" or rel="me"]|//author',
@@ -49,4 +51,19 @@ title_xpaths = [
     '//h1[contains(@class, "title") or contains(@id, "title")]',
     '//header/h1',
 ]
-# json-ld headline
\ No newline at end of file
+# json-ld headline
+
+
+# compiled once at import, tree.xpath(string) parses the expression again on
+# every call and metadata extraction runs a few dozen of them per page
+AUTHOR_XPATHS = [XPath(expression) for expression in author_xpaths]
+CATEGORIES_XPATHS = [XPath(expression) for expression in categories_xpaths]
+TAGS_XPATHS = [XPath(expression) for expression in tags_xpaths]
+TITLE_XPATHS = [XPath(expression) for expression in title_xpaths]
+
+JSON_LD_XPATH = XPath('.//script[@type="application/ld+json" or @type="application/settings+json"]')
+H1_XPATH = XPath('//h1')
+H2_XPATH = XPath('//h2')
+FOOTER_LINK_XPATH = XPath(
+    './/footer//a[@href]|.//div[contains(@class, "footer") or contains(@id, "footer")]//a[@href]'
+)
@@ -0,0 +1,55 @@
+"""
+Text normalization of the metadata fields.
+"""
+# line_processing used to replace the spacing entities, turn newlines into
+# spaces, test every character against isprintable through an lru_cache,
+# run the two trim regexes and scan the result with isspace. Since every
+# whitespace run ends up as a single space, normalize_text gives the same
+# output with str.translate and one regex. utils.line_processing is kept as a
+# wrapper of it.
+
+import re
+
+SPACES = re.compile(r'\s+')
+# HTML spacing entities, turned into spaces
+SPACE_ENTITIES = (('&#13;', '\r'), ('&#10;', '\n'), ('&nbsp;', ' '))
+
+
+class TranslationTable(dict):
+    '''
+        str.translate table deleting the characters rejected by keep, filled
+        on demand instead of for the whole unicode range
+    '''
+
+    def __init__(self, keep):
+        super().__init__()
+        self.keep = keep
+
+    def __missing__(self, codepoint):
+        value = codepoint if self.keep(chr(codepoint)) else None
+        self[codepoint] = value
+        return value
+
+
+# characters removed by remove_control_characters
+PRINTABLE_TABLE = TranslationTable(lambda char: char.isprintable() or char.isspace())
+NOPRINT_TRANS_TABLE = TranslationTable(lambda char: char.isprintable() or char in (' ', '\t', '\n'))
+
+
+def remove_control_characters(string):
+    '''Prevent non-printable and XML invalid character errors'''
+    if string.isprintable():
+        return string
+    return string.translate(PRINTABLE_TABLE)
+
+
+def normalize_text(text):
+    '''
+        Spacing entities and whitespace runs to a single space, non printable
+        characters removed, None when nothing is left
+    '''
+    if '&' in text:
+        for entity, char in SPACE_ENTITIES:
+            text = text.replace(entity, char)
+    text = SPACES.sub(' ', remove_control_characters(text)).strip(' ')
+    return text or None
@@ -0,0 +1,114 @@
+"""
+Per host memo of site-level metadata.
+"""
+# The license is the same on every page of a site but the links and footer
+# are scanned for it again on each page. A SiteMemo records the license found
+# on the pages of a host, once min_pages pages in a row agree the scan is
+# skipped and the value reused until the host expires after ttl seconds and
+# is learned again. A page without a license is never reused, the next pages
+# are scanned. The license is the only field memoized: the sitename fallback
+# and the url date depend on the url of each page, the publisher comes from
+# the meta elements read anyway.
+
+import sys
+import threading
+import time
+
+from ..caches import SizedCache, entry_size
+
+
+class HostFacts():
+
+    __slots__ = ('expires', 'values')
+
+    def __init__(self, expires):
+        self.expires = expires
+        # field -> [value, number of pages in a row which found it]
+        self.values = {}
+
+
+def _host_size(host, facts):
+    size = entry_size(host, facts)
+    for value, _ in list(facts.values.values()):
+        size += sys.getsizeof(value)
+    return size
+
+
+class SiteMemo(SizedCache):
+    '''
+        Thread safe LRU of the site-level fields (the license) of every host,
+        registered in caches as metadata.sites
+
+        ttl: seconds a host is remembered before its fields are learned again
+        min_pages: pages in a row of a host which must agree on a field
+            before its search is skipped
+        max_hosts: least recently used hosts are forgotten past this number
+        max_bytes: and past this estimated size, None for no bound
+    '''
+
+    def __init__(self, ttl=3600, min_pages=3, max_hosts=10000, max_bytes=8 << 20):
+        super().__init__('metadata.sites', max_bytes=max_bytes, max_entries=max_hosts,
+            sizeof=_host_size)
+        self.ttl = ttl
+        self.min_pages = min_pages
+        self.facts_lock = threading.Lock()
+
+    def _facts(self, host, create=False):
+        facts = self.get(host)
+        if facts is not None and facts.expires <= time.monotonic():
+            facts = None
+        if facts is None and create:
+            facts = HostFacts(time.monotonic() + self.ttl)
+            self.put(host, facts)
+        return facts
+
+    def known(self, host, field):
+        '''
+            (True, value) when the pages of host agree on field, (False, None)
+            when it has to be searched
+        '''
+        if host is None:
+            return False, None
+        facts = self._facts(host)
+        if facts is None:
+            return False, None
+        with self.facts_lock:
+            learned = facts.values.get(field)
+            if learned is None or learned[1] < self.min_pages:
+                return False, None
+            return True, learned[0]
+
+    def observe(self, host, field, value):
+        '''
+            Record the value of field found on a page of host, a page where it
+            isn't found (None) breaks the agreement and is not learned
+        '''
+        if host is None:
+            return
+        if value is None:
+            facts = self._facts(host)
+            if facts is not None:
+                with self.facts_lock:
+                    facts.values.pop(field, None)
+            return
+        facts = self._facts(host, create=True)
+        with self.facts_lock:
+            learned = facts.values.get(field)
+            if learned is not None and learned[0] == value:
+                learned[1] += 1
+            else:
+                facts.values[field] = [value, 1]
+        # size the host again with its new value
+        self.put(host, facts)
+
+    def lookup(self, host, field, search, *args):
+        '''
+            Value of field for a page of host, search(*args) runs until the
+            pages of host agree on it
+        '''
+        found, value = self.known(host, field)
+        if found:
+            return value
+        value = search(*args)
+        self.observe(host, field, value)
+        return value
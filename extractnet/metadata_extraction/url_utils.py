@@ -1,7 +1,8 @@
 import re
 from datetime import datetime
-from urllib.parse import ParseResult, parse_qs, urlencode, urlparse
-from tld import get_tld
+from urllib.parse import ParseResult, parse_qs, urlencode, urlparse, urlsplit
+
+from ..caches import memoize
 
 NETLOC_RE = re.compile(r'(?<=\w):(?:80|443|8000|8080|5000)')
 TYPICAL = re.compile(r'/+')
@@ -74,24 +75,34 @@ def date_updater(url_date_token, date):
 
     return date
 
-def validate_date(url, date):
+def url_date(url):
+    '''
+        (year, month, day) found in the url, -1 for the missing parts, None
+        when the url has no date
+    '''
     for url_date_re in URL_DATE:
         match = url_date_re.findall(url)
         if len(match):
             break
 
     if len(match) == 0:
-        return date
+        return None
 
     token = match[0]
     if not isinstance(token, tuple):
         token = (token,)
 
-    date_tuple = parse_url_date(token)
+    return parse_url_date(token)
+
+def validate_date(url, date):
+    date_tuple = url_date(url)
+    if date_tuple is None:
+        return date
     return date_updater(date_tuple, date)
 
-def extract_domain(url, blacklist=None):
+def _registered_domain(url):
     # new code: Python >= 3.6 with tld module
+    from tld import get_tld
     tldinfo = get_tld(url, as_object=True, fail_silently=True)
     # invalid input OR domain TLD blacklist
     if tldinfo is None:
@@ -101,6 +112,25 @@ def extract_domain(url, blacklist=None):
         return domain.lower()
     return domain
 
+# get_tld only reads the host, pages of a site share the result. It doesn't
+# change over time unlike the fields of sites.SiteMemo, so it has no ttl
+_origin_domain = memoize('metadata.domains', max_bytes=1 << 20)(_registered_domain)
+
+def extract_domain(url, blacklist=None):
+    try:
+        parts = urlsplit(url)
+    except ValueError:
+        return None
+    if not parts.scheme or not parts.netloc:
+        return _registered_domain(url)
+    return _origin_domain('{}://{}'.format(parts.scheme, parts.netloc))
+
+def url_host(url):
+    '''Lowercase host name of an url, None when it has none'''
+    try:
+        return urlsplit(url).hostname
+    except ValueError:
+        return None
 
 def url_is_valid(url):
     try:
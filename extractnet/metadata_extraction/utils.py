@@ -9,7 +9,6 @@ Module bundling functions related to HTML and text processing.
 import logging
 from html import unescape
 from lxml import etree, html
-from functools import lru_cache
 import urllib
 import urllib.parse
 import json
@@ -19,11 +18,11 @@ try:
     from cchardet import detect as cchardet_detect
 except ImportError:
     cchardet_detect = None
-from charset_normalizer import from_bytes
-from bs4 import BeautifulSoup as bs
+from ..caches import memoize
+from .normalize import normalize_text, remove_control_characters
 from .constant import (
     HTML_PARSER, RECOVERY_PARSER, SPLIT_TOKENS, NO_TAG_SPACE, SPACE_TRIMMING,
-    UNICODE_ALIASES, LINES_TRIMMING, CLEAN_META_TAGS,
+    UNICODE_ALIASES, CLEAN_META_TAGS,
     AUTHOR_EMAIL, AUTHOR_EMOJI_REMOVE, AUTHOR_PREFIX, AUTHOR_SPLIT,
     AUTHOR_REMOVE_SPECIAL, AUTHOR_REPLACE_JOIN, AUTHOR_REMOVE_NICKNAME, 
     AUTHOR_REMOVE_NUMBERS, AUTHOR_REMOVE_PREPOSITION, AUTHOR_TWITTER
@@ -46,31 +45,14 @@ def isutf8(data):
     else:
         return True
 
-@lru_cache(maxsize=1114111)  # sys.maxunicode = 1114111
 def return_printables_and_spaces(char):
     'Return a character if it belongs to certain classes'
-    if char.isprintable() or char.isspace():
-        return char
-    return ''
+    return remove_control_characters(char)
 
-
-def remove_control_characters(string):
-    '''Prevent non-printable and XML invalid character errors'''
-    return ''.join(map(return_printables_and_spaces, string))
-
-@lru_cache(maxsize=1024)
 def line_processing(line):
     '''Remove HTML space entities, then discard incompatible unicode
        and invalid XML characters on line level'''
-    # spacing HTML entities: https://www.w3.org/MarkUp/html-spec/html-spec_13.html
-    line = line.replace('&#13;', '\r').replace('&#10;', '\n').replace('&nbsp;', '\u00A0')
-    # remove newlines that are not related to punctuation or markup
-    # remove non-printable chars and normalize space characters (including Unicode spaces)
-    line = trim(remove_control_characters(LINES_TRIMMING.sub(r' ', line)))
-    # prune empty lines
-    if all(map(str.isspace, line)):
-        line = None
-    return line
+    return normalize_text(line)
 
 def detect_encoding(bytesobject):
     """"Read all input or first chunk and return a list of encodings"""
@@ -85,6 +67,7 @@ def detect_encoding(bytesobject):
         if cchardet_guess is not None:
             guesses.append(cchardet_guess.lower())
     # try charset_normalizer on first part, fallback on full document
+    from charset_normalizer import from_bytes
     detection_results = from_bytes(bytesobject[:15000]) or from_bytes(bytesobject)
     # return alternatives
     if len(detection_results) > 0:
@@ -171,7 +154,7 @@ def split_tags(string):
         return [string]
     return [string]
 
-@lru_cache(maxsize=128)
+@memoize('metadata.trim', max_bytes=1 << 20)
 def trim(string):
     '''Remove unnecessary spaces within a text string'''
     try:
@@ -220,6 +203,7 @@ def parse_server_side_render(raw_html):
 def parse_ld_json(raw_html):
 	results = []
 	if '<script type="application/ld+json">' in raw_html:
+		from bs4 import BeautifulSoup as bs
 		soup = bs(raw_html, 'lxml')
 		for script_tag in soup.findAll('script', {'type': 'application/ld+json'}):
 			json_string = script_tag.string
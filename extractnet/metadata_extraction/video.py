@@ -1,5 +1,4 @@
 import json
-from bs4 import BeautifulSoup as bs 
 from xml.sax.saxutils import escape
 from .utils import get_raw_html
 
@@ -15,6 +14,7 @@ BLACKLISTED = [
 VALID_AUDIO_EXTENSION = ['.mp3', '.wav', '.aac', 'flac', '.vox', 'webm']
 
 def handle_akamai_video(akamai_url):
+    from bs4 import BeautifulSoup as bs
     raw_html = get_raw_html(akamai_url)
     soup = bs(raw_html, 'lxml')
     best_url = None
@@ -39,11 +39,13 @@ def aljazeera_video_prop(vid):
     return {}
 
 def speechkit_audio(url):
+    from bs4 import BeautifulSoup as bs
     raw_html = get_raw_html(url)
     soup = bs(raw_html, 'lxml')
     return soup.find('meta', {'name': 'twitter:player:stream'}).get('content')
 
 def get_advance_fields(raw_html):
+    from bs4 import BeautifulSoup as bs
     soup = bs(raw_html, 'lxml')
 
     '''
@@ -0,0 +1,418 @@
+'''
+    Deserialized model bundle
+
+    The author tagger used to be shipped as two joblib pickles, unpickling
+    them means importing sklearn_crfsuite, copying the crfsuite model into a
+    temporary file and rebuilding a python dict of 2k+ lists. The bundle keeps
+    the same models in their native formats instead :
+
+        char_embedding.npy          float32 matrix, one row per character,
+                                    memory mapped read only so every worker
+                                    process on a host shares the same pages
+        char_embedding.vocab.json   character -> row index
+        crf.npz                     the crfsuite weights as numpy arrays, decoded
+                                    by ViterbiCRF without crfsuite
+
+    The crfsuite model crf.npz is exported from isn't shipped, it is kept as
+    test/datafiles/crf.crfsuite to rebuild the bundle and to check ViterbiCRF
+    against crfsuite. Build the bundle with scripts/build_model_bundle.py,
+    loaders below also read a crf.crfsuite or the joblib files of a model
+    directory without bundle.
+'''
+import io
+import json
+import os
+import struct
+
+import numpy as np
+
+from . import _crf
+
+UNK = 'UNK'
+
+EMBEDDING_MATRIX = 'char_embedding.npy'
+EMBEDDING_VOCAB = 'char_embedding.vocab.json'
+CRF_MODEL = 'crf.crfsuite'
+CRF_WEIGHTS = 'crf.npz'
+
+# crfsuite attribute separator of {key: str} and nested features
+_SEP = ':'
+# groups of positions with the same features read column by column from this size
+MIN_COLUMN_ROWS = 16
+
+
+class CharEmbedding():
+    '''
+        Read only mapping from a character to its embedding, supports the
+        subset of dict used by word2features
+    '''
+
+    def __init__(self, vocab, matrix):
+        self.vocab = vocab
+        self.matrix = matrix
+        self.unk_index = vocab[UNK]
+
+    @classmethod
+    def load(cls, matrix_path, vocab_path=None, mmap=True):
+        if vocab_path is None:
+            vocab_path = matrix_path[:-len('.npy')] + '.vocab.json'
+        with io.open(vocab_path, 'r', encoding='utf-8') as f:
+            vocab = json.load(f)
+        return cls(vocab, np.load(matrix_path, mmap_mode='r' if mmap else None))
+
+    @classmethod
+    def from_dict(cls, embeddings):
+        vocab = { key: idx for idx, key in enumerate(embeddings.keys()) }
+        matrix = np.array([ embeddings[key] for key in vocab ], dtype=np.float32)
+        return cls(vocab, matrix)
+
+    def save(self, matrix_path, vocab_path=None):
+        if vocab_path is None:
+            vocab_path = matrix_path[:-len('.npy')] + '.vocab.json'
+        np.save(matrix_path, self.matrix)
+        with io.open(vocab_path, 'w', encoding='utf-8') as f:
+            json.dump(self.vocab, f, ensure_ascii=False)
+
+    def __contains__(self, key):
+        return key in self.vocab
+
+    def __getitem__(self, key):
+        return self.matrix[self.vocab[key]].tolist()
+
+    def rows(self, chars):
+        '''
+            Embedding of every character in chars, unknown ones map to UNK
+        '''
+        vocab, unk_index = self.vocab, self.unk_index
+        return self.matrix[[ vocab.get(char, unk_index) for char in chars ]].tolist()
+
+    def __len__(self):
+        return len(self.vocab)
+
+    def keys(self):
+        return self.vocab.keys()
+
+
+class CRFTagger():
+    '''
+        Thin wrapper around pycrfsuite.Tagger exposing the predict api of
+        sklearn_crfsuite.CRF
+    '''
+
+    def __init__(self, model_path):
+        import pycrfsuite
+        self.model_path = model_path
+        self.tagger = pycrfsuite.Tagger()
+        self.tagger.open(model_path)
+
+    def predict_single(self, xseq):
+        return self.tagger.tag(xseq)
+
+    def predict(self, X):
+        return [ self.tagger.tag(xseq) for xseq in X ]
+
+    def predict_marginals_single(self, xseq):
+        labels = self.tagger.labels()
+        self.tagger.set(xseq)
+        return [ { label: self.tagger.marginal(label, i) for label in labels }
+            for i in range(len(xseq)) ]
+
+    def predict_marginals(self, X):
+        return [ self.predict_marginals_single(xseq) for xseq in X ]
+
+    # pycrfsuite.Tagger holds a C pointer to the opened model
+    def __getstate__(self):
+        return { 'model_path': self.model_path }
+
+    def __setstate__(self, state):
+        self.__init__(state['model_path'])
+
+
+def read_crfsuite(path):
+    '''
+        Labels, attributes, state weights (attribute x label) and transition
+        weights (label x label) of a crfsuite model file
+    '''
+    with io.open(path, 'rb') as f:
+        data = f.read()
+    magic, _, _, _, _, num_labels, num_attrs, off_features, off_labels, off_attrs, _, _ = \
+        struct.unpack_from('<4sI4sI8I', data, 0)
+    if magic != b'lCRF':
+        raise ValueError('{} is not a crfsuite model'.format(path))
+
+    def strings(offset):
+        # CQDB chunk, the backward array maps an id to its record
+        _, _, _, _, size, bwd_offset = struct.unpack_from('<4s5I', data, offset)
+        records = struct.unpack_from('<{}I'.format(size), data, offset + bwd_offset)
+        values = []
+        for record in records:
+            _, length = struct.unpack_from('<2I', data, offset + record)
+            start = offset + record + 8
+            # lengths count the trailing null byte
+            values.append(data[start:start + length - 1].decode('utf-8'))
+        return values
+
+    labels, attributes = strings(off_labels), strings(off_attrs)
+    _, _, num_features = struct.unpack_from('<4s2I', data, off_features)
+    features = np.frombuffer(data, count=num_features, offset=off_features + 12,
+        dtype=np.dtype([('type', '<u4'), ('src', '<u4'), ('dst', '<u4'), ('weight', '<f8')]))
+
+    state = np.zeros((num_attrs, num_labels), dtype=np.float64)
+    transitions = np.zeros((num_labels, num_labels), dtype=np.float64)
+    is_state = features['type'] == 0
+    state[features['src'][is_state], features['dst'][is_state]] = features['weight'][is_state]
+    transitions[features['src'][~is_state], features['dst'][~is_state]] = features['weight'][~is_state]
+    return labels, attributes, state, transitions
+
+
+def _attributes(features, prefix=''):
+    # same conversion as pycrfsuite from a feature dict to crfsuite attributes
+    if not isinstance(features, dict):
+        for key in features:
+            yield prefix + key, 1.0
+        return
+    for key, value in features.items():
+        if isinstance(value, (dict, list, set)):
+            yield from _attributes(value, prefix + key + _SEP)
+        elif isinstance(value, str):
+            yield prefix + key + _SEP + value, 1.0
+        elif isinstance(value, bytes):
+            yield prefix + key + _SEP + value.decode('utf-8'), 1.0
+        else:
+            yield prefix + key, float(value)
+
+
+class ViterbiCRF():
+    '''
+        Decoder of a linear chain crf exported from crfsuite, with the predict
+        api of sklearn_crfsuite.CRF. Sequences of a predict call are scored
+        together and decoded with one batched viterbi pass, labels are the ones
+        crfsuite tags
+    '''
+
+    def __init__(self, labels, attributes, state, transitions):
+        self.labels = list(labels)
+        self.attributes = { attribute: idx for idx, attribute in enumerate(attributes) }
+        self.state = np.ascontiguousarray(state, dtype=np.float64)
+        self.transitions = np.ascontiguousarray(transitions, dtype=np.float64)
+        # unknown attributes point to a zero weight row
+        self.pad = len(state)
+        self._state = np.vstack([state, np.zeros((1, len(self.labels)))])
+        # feature key -> string value -> attribute index
+        self._values = {}
+
+    @classmethod
+    def from_crfsuite(cls, path):
+        return cls(*read_crfsuite(path))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as weights:
+            return cls(weights['labels'].tolist(), weights['attributes'].tolist(),
+                weights['state'], weights['transitions'])
+
+    def save(self, path):
+        attributes = sorted(self.attributes, key=self.attributes.get)
+        np.savez_compressed(path, labels=np.array(self.labels), attributes=np.array(attributes),
+            state=self.state, transitions=self.transitions)
+
+    def _values_of(self, key):
+        values = self._values.get(key)
+        if values is None:
+            prefix = key + _SEP
+            values = { attribute[len(prefix):]: idx for attribute, idx in self.attributes.items()
+                if attribute.startswith(prefix) }
+            self._values[key] = values
+        return values
+
+    def _column(self, key, values):
+        '''
+            Attribute indices and values of a feature key at many positions,
+            None when they aren't all numbers or all strings
+        '''
+        kinds = set(map(type, values))
+        if kinds <= {float, bool, int}:
+            return self.attributes.get(key, self.pad), values
+        if kinds == {str}:
+            lookup = self._values_of(key).get
+            pad = self.pad
+            return [ lookup(value, pad) for value in values ], 1.0
+        return None
+
+    def _group(self, keys, group):
+        # (positions x keys) attribute indices and values, None when a
+        # feature isn't a number or a string
+        indices = np.empty((len(group), len(keys)), dtype=np.int32)
+        values = np.empty((len(group), len(keys)), dtype=np.float64)
+        for column, (key, column_values) in enumerate(zip(keys, zip(*[ features.values() for features in group ]))):
+            found = self._column(key, column_values)
+            if found is None:
+                return None
+            indices[:, column], values[:, column] = found
+        return indices, values
+
+    def scores(self, X):
+        '''
+            State scores of the positions of every sequence of feature dicts,
+            concatenated. Weights are summed in the order crfsuite does
+        '''
+        from scipy.sparse import csr_matrix
+
+        positions = [ features for xseq in X for features in xseq ]
+        # positions with the same keys in the same order are read column by
+        # column, word2features gives the same keys to most of them
+        groups = {}
+        for row, features in enumerate(positions):
+            groups.setdefault(tuple(features), []).append(row)
+
+        order, lengths, indices, values = [], [], [], []
+        # positions of small groups are read one by one
+        row_order, row_lengths, row_indices, row_values = [], [], [], []
+        for keys, rows in groups.items():
+            group = [ positions[row] for row in rows ]
+            found = self._group(keys, group) if len(rows) >= MIN_COLUMN_ROWS else None
+            if found is not None:
+                order.extend(rows)
+                lengths.append(np.full(len(rows), len(keys)))
+                indices.append(found[0].ravel())
+                values.append(found[1].ravel())
+                continue
+            get, pad = self.attributes.get, self.pad
+            for row, features in zip(rows, group):
+                start = len(row_indices)
+                for attribute, value in _attributes(features):
+                    row_indices.append(get(attribute, pad))
+                    row_values.append(value)
+                row_order.append(row)
+                row_lengths.append(len(row_indices) - start)
+        order.extend(row_order)
+        lengths.append(np.array(row_lengths, dtype=np.int64))
+        indices.append(np.array(row_indices, dtype=np.int32))
+        values.append(np.array(row_values, dtype=np.float64))
+
+        scores = np.zeros((len(positions), len(self.labels)), dtype=np.float64)
+        if len(order) == 0:
+            return scores
+        indptr = np.concatenate([[0], np.cumsum(np.concatenate(lengths))])
+        # csr x dense adds the weight rows of every position in storage
+        # order, the order of its features
+        attributes = csr_matrix((np.concatenate(values), np.concatenate(indices), indptr),
+            shape=(len(order), len(self._state)))
+        scores[order] = attributes @ self._state
+        return scores
+
+    def viterbi(self, scores, lengths):
+        '''
+            Best label index paths of padded state scores (batch x length x
+            labels), ties go to the lowest label index as in crfsuite
+        '''
+        n_seqs, max_length, n_labels = scores.shape
+        if n_seqs == 1:
+            paths = np.zeros((1, max_length), dtype=np.intp)
+            paths[0, :lengths[0]] = _crf.viterbi(np.ascontiguousarray(scores[0, :lengths[0]]), self.transitions)
+            return paths
+        # longest first, sequences still running at t are a prefix
+        by_length = np.argsort(-lengths, kind='stable')
+        scores, lengths = scores[by_length], lengths[by_length]
+        running = np.searchsorted(-lengths, -np.arange(max_length), side='left')
+
+        best = scores[:, 0].copy()
+        backpointers = np.empty((max_length, n_seqs, n_labels), dtype=np.intp)
+        backpointers[:] = np.arange(n_labels)
+        candidates = np.empty((n_seqs, n_labels, n_labels), dtype=np.float64)
+        transitions = self.transitions[None]
+        for t in range(1, max_length):
+            n = running[t]
+            np.add(best[:n, :, None], transitions, out=candidates[:n])
+            np.argmax(candidates[:n], axis=1, out=backpointers[t, :n])
+            np.max(candidates[:n], axis=1, out=best[:n])
+            best[:n] += scores[:n, t]
+
+        paths = np.empty((n_seqs, max_length), dtype=np.intp)
+        paths[:, -1] = best.argmax(axis=1)
+        rows = np.arange(n_seqs)
+        for t in range(max_length - 1, 0, -1):
+            paths[:, t - 1] = backpointers[t, rows, paths[:, t]]
+        unsorted = np.empty_like(paths)
+        unsorted[by_length] = paths
+        return unsorted
+
+    def predict(self, X):
+        if len(X) == 1:
+            return [ self.predict_single(X[0]) ]
+        lengths = np.array([ len(xseq) for xseq in X ], dtype=np.intp)
+        if len(X) == 0 or lengths.max() == 0:
+            return [ [] for _ in X ]
+        scores = np.zeros((len(X), lengths.max(), len(self.labels)), dtype=np.float64)
+        scores[np.arange(lengths.max()) < lengths[:, None]] = self.scores(X)
+        labels = self.labels
+        return [ [ labels[label] for label in path[:length] ]
+            for path, length in zip(self.viterbi(scores, lengths), lengths) ]
+
+    def predict_single(self, xseq):
+        # one sequence is scored and decoded by the compiled kernels, a
+        # byline doesn't fill the batched numpy calls
+        scores = _crf.state_scores(list(xseq), self.attributes, self._values, self._values_of,
+            _attributes, self.state)
+        labels = self.labels
+        return [ labels[label] for label in _crf.viterbi(scores, self.transitions) ]
+
+
+def load_char_embedding(path):
+    '''
+        Load a char embedding from a bundle .npy file, any other path is
+        treated as a joblib pickled dict
+    '''
+    if path.endswith('.npy'):
+        return CharEmbedding.load(path)
+    import joblib
+    return joblib.load(path)
+
+
+def load_crf(path):
+    '''
+        Load the author crf from exported .npz weights or a .crfsuite model
+        file, any other path is treated as a joblib pickled sklearn_crfsuite.CRF
+    '''
+    if path.endswith('.npz'):
+        return ViterbiCRF.load(path)
+    if path.endswith('.crfsuite'):
+        return CRFTagger(path)
+    import joblib
+    return joblib.load(path)
+
+
+def resolve(directory, bundle_name, *fallback_names):
+    '''
+        Pick the first of the bundle files present in directory, otherwise the
+        last legacy one
+    '''
+    for name in (bundle_name,) + fallback_names[:-1]:
+        path = os.path.join(directory, name)
+        if os.path.exists(path):
+            return path
+    return os.path.join(directory, fallback_names[-1])
+
+
+def build_bundle(embedding_path, crf_path, output_dir):
+    '''
+        Convert the joblib pickled embedding and the crf, a crfsuite model
+        file or a joblib pickled sklearn_crfsuite.CRF, into bundle files
+    '''
+    import joblib
+
+    embedding = joblib.load(embedding_path)
+    if not isinstance(embedding, CharEmbedding):
+        embedding = CharEmbedding.from_dict(embedding)
+    embedding.save(os.path.join(output_dir, EMBEDDING_MATRIX),
+        os.path.join(output_dir, EMBEDDING_VOCAB))
+
+    crf = None
+    if not crf_path.endswith('.crfsuite'):
+        # sklearn_crfsuite keeps the trained model in a temporary file, which
+        # is removed with crf
+        crf = joblib.load(crf_path)
+        crf_path = crf.modelfile.name
+    ViterbiCRF.from_crfsuite(crf_path).save(os.path.join(output_dir, CRF_WEIGHTS))
+    return [ os.path.join(output_dir, name)
+        for name in (EMBEDDING_MATRIX, EMBEDDING_VOCAB, CRF_WEIGHTS) ]
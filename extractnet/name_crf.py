@@ -1,11 +1,11 @@
 import os
 from sklearn.base import BaseEstimator
-import joblib
 import numpy as np
-import dateparser
 import logging
 from .util import convert_segmentation_to_text, get_module_res
-from .sequence_tagger.models import word2features
+from .model_bundle import (load_char_embedding, load_crf, resolve,
+    EMBEDDING_MATRIX, CRF_MODEL, CRF_WEIGHTS)
+from .sequence_tagger.models import sent2features
 
 
 class AuthorExtraction(BaseEstimator):
@@ -13,21 +13,29 @@ class AuthorExtraction(BaseEstimator):
             author_tagger=None):
         
         if author_embeddings is None:
-            author_embeddings = get_module_res('models/char_embedding.joblib')
+            author_embeddings = resolve(get_module_res('models'), EMBEDDING_MATRIX, 'char_embedding.joblib')
 
         if author_tagger is None:
-            author_tagger = get_module_res('models/crf.joblib')
+            author_tagger = resolve(get_module_res('models'), CRF_WEIGHTS, CRF_MODEL, 'crf.joblib')
 
-        self.author_embedding = joblib.load(author_embeddings)
-        self.author_tagger = joblib.load(author_tagger)
+        self.author_embedding = load_char_embedding(author_embeddings)
+        self.author_tagger = load_crf(author_tagger)
 
     def __call__(self, text):
         if isinstance(text, list):
-            return [ self.segment(t) for t in text]
+            return self.segment_batch(text)
         return self.segment(text)
 
+    def segment_batch(self, texts):
+        '''
+            Names of every text, tagged in a single crf call
+        '''
+        texts = [ text.strip() for text in texts ]
+        y_preds = self.author_tagger.predict([ sent2features(text, self.author_embedding) for text in texts ])
+        return [ convert_segmentation_to_text(y_pred, text) for y_pred, text in zip(y_preds, texts) ]
+
     def segment(self, text):
         text = text.strip()
-        embeddings = [word2features(text, i, self.author_embedding) for i in range(len(text))]
+        embeddings = sent2features(text, self.author_embedding)
         y_pred = self.author_tagger.predict([embeddings])
         return convert_segmentation_to_text(y_pred[0], text)
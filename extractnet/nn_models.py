@@ -1,4 +1,5 @@
-import onnxruntime as ort
+import os
+import weakref
 import numpy as np
 from scipy.special import expit
 from sklearn.utils.extmath import softmax
@@ -8,6 +9,43 @@ from .blocks import TagCountReadabilityBlockifier
 
 EMPTY_HTML = "<article><p>content</p><p>blocked</p><p>404</p></article>"
 
+# onnxruntime sessions own a thread pool which does not survive fork(),
+# sessions created in a parent process are rebuilt in every forked child
+_SESSIONS = weakref.WeakSet()
+# sessions inherited from the parent, never destroyed in the child since
+# their destructor would join threads which only exist in the parent
+_INHERITED_SESSIONS = []
+
+def _reload_sessions_after_fork():
+    for model in list(_SESSIONS):
+        _INHERITED_SESSIONS.append(model.ort_session)
+        model.load_session()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reload_sessions_after_fork)
+
+class PreparedPage():
+    '''
+        A page between the stages of NewsNet.predict, result is the
+        extraction result of a page the Extractor settles before the model
+    '''
+
+    __slots__ = ('html', 'url', 'blocks', 'features', 'hashes', 'logits', 'signatures',
+        'expected', 'output', 'result')
+
+    def __init__(self, html, url=None):
+        self.html = html
+        self.url = url
+        self.blocks = None
+        self.features = None
+        self.hashes = None
+        self.logits = None
+        self.signatures = None
+        self.expected = None
+        self.output = None
+        self.result = None
+
+
 class NewsNet():
     '''
         Inputs 
@@ -20,52 +58,312 @@ class NewsNet():
     CSS_FEAT_SIZE = 43
     feats = ('kohlschuetter', 'weninger', 'readability', 'css')
 
-    def __init__(self, model_weight=None, cls_threshold=0.1, binary_threshold=0.5):
+    # built from news_net.onnx by scripts/build_model_variants.py
+    model_variants = {
+        'float32': 'news_net.onnx',
+        'int8': 'news_net.int8.onnx',           # dynamic int8 quantization
+        'optimized': 'news_net.optimized.onnx', # onnxruntime extended graph optimizations applied offline
+    }
+
+    def __init__(self, model_weight=None, cls_threshold=0.1, binary_threshold=0.5,
+            model_variant='float32', window_size=None, window_overlap=256, max_batch_blocks=65536):
+        '''
+            model_weight: path to an onnx model, overrides model_variant
+            model_variant: one of `model_variants`, loaded from the packaged models
+            window_size: pages with more blocks are split into overlapping windows
+                of window_size blocks (e.g. 2048), None (default) runs every page in
+                one piece
+            window_overlap: number of blocks shared by consecutive windows
+            max_batch_blocks: upper bound of batch size x sequence length per onnx run
+        '''
+        if window_size is not None and not 0 <= window_overlap < window_size:
+            raise ValueError('window_overlap must be in [0, window_size)')
+        self.window_size = window_size
+        self.window_overlap = window_overlap
+        self.max_batch_blocks = max_batch_blocks
         self.feature_transform = get_and_union_features(self.feats)
-        model_weight = get_module_res('models/news_net.onnx') if model_weight is None else model_weight
-        self.ort_session = ort.InferenceSession(model_weight)
+        self.model_variant = model_variant
+        if model_weight is None:
+            model_weight = self.variant_path(model_variant)
+        # keep the serialized model around, forked children rebuild their
+        # session from these (copy-on-write shared) bytes without touching disk
+        with open(model_weight, 'rb') as f:
+            self.model_bytes = f.read()
+        self.load_session()
+        _SESSIONS.add(self)
         self.binary_threshold = binary_threshold
         self.cls_threshold = cls_threshold
 
+    @classmethod
+    def variant_path(cls, model_variant='float32', directory=None):
+        if model_variant not in cls.model_variants:
+            raise ValueError('unknown model variant "{}", expected one of {}'.format(
+                model_variant, ', '.join(cls.model_variants)))
+        if directory is None:
+            directory = get_module_res('models')
+        path = os.path.join(directory, cls.model_variants[model_variant])
+        if not os.path.exists(path):
+            raise FileNotFoundError('model variant "{}" not found at {}, build it with '
+                'python scripts/build_model_variants.py --model-dir {}'.format(model_variant, path, directory))
+        return path
 
-    def preprocess(self, html):
-        blocks = TagCountReadabilityBlockifier.blockify(html, encoding='utf-8')
+    def load_session(self):
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        if self.model_variant == 'optimized':
+            # graph already optimized offline, skip it at load time
+            options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_DISABLE_ALL
+        self.ort_session = ort.InferenceSession(self.model_bytes, options,
+            providers=['CPUExecutionProvider'])
+        self.session_pid = os.getpid()
+
+    def warmup(self, max_blocks=64):
+        '''
+            Run the session once on a few sequence lengths, onnxruntime allocates
+            its memory arena and picks kernels during the first runs
+        '''
+        feat_size = self.BASE_FEAT_SIZE + self.CSS_FEAT_SIZE
+        seq_len = 3
+        while seq_len <= max_blocks:
+            self.inference([np.zeros((seq_len, feat_size), dtype=np.float32)])
+            seq_len *= 4
+
+
+    def blockify(self, html):
+        # the features read the text and css as bytes
+        blocks = TagCountReadabilityBlockifier.blockify(html, encoding='utf-8', decode=False)
         if len(blocks) == 0: # warning failed extraction
-            blocks = TagCountReadabilityBlockifier.blockify(EMPTY_HTML, encoding='utf-8')
-        elif len(blocks) < 3: # pad block
-            blocks = [blocks[0]]+blocks + [blocks[-1]]
-        blocks = np.array(blocks)
+            blocks = TagCountReadabilityBlockifier.blockify(EMPTY_HTML, encoding='utf-8', decode=False)
+        return np.array(blocks)
+
+    def preprocess(self, html):
+        blocks = self.blockify(html)
         feat = self.feature_transform.transform(blocks).astype(np.float32)
         return feat, blocks
 
+    def featurize_incremental(self, blocks, previous, mapping):
+        '''
+            Features of blocks, reusing the rows of previous.features for blocks
+            matched by mapping (see incremental.align) whose neighbourhood did
+            not change. Readability scores depend on the whole page and are
+            always computed again
+        '''
+        from .incremental import reusable_blocks, row_ranges, CONTEXT
+
+        n_blocks = len(blocks)
+        reusable = reusable_blocks(mapping, len(previous.features))
+        feat = np.empty((n_blocks, previous.features.shape[1]), dtype=np.float32)
+        feat[reusable] = previous.features[mapping[reusable]]
+        ranges = row_ranges(~reusable)
+
+        offset = 0
+        for name, transformer in self.feature_transform.transformer_list:
+            if name == 'readability':
+                values = transformer.transform(blocks)
+                feat[:, offset:offset+values.shape[1]] = values
+                offset += values.shape[1]
+                continue
+            width = None
+            for start, end in ranges:
+                values = transformer.transform(blocks[start:end])
+                width = values.shape[1]
+                # rows next to a range boundary inside the page miss context
+                inner_start = start if start == 0 else start + CONTEXT
+                inner_end = end if end == n_blocks else end - CONTEXT
+                feat[inner_start:inner_end, offset:offset+width] = values[inner_start-start:inner_end-start]
+            if width is None:
+                width = self.feature_widths()[name]
+            offset += width
+        return feat
+
+    def feature_widths(self):
+        if not hasattr(self, '_feature_widths'):
+            blocks = self.blockify(EMPTY_HTML)
+            self._feature_widths = { name: transformer.transform(blocks).shape[1]
+                for name, transformer in self.feature_transform.transformer_list }
+        return self._feature_widths
 
-    def predict(self, html, top_rank=10):
+
+    def window_starts(self, length):
+        '''
+            Start offsets of the windows covering `length` blocks, all windows
+            have window_size blocks, the last one is aligned to the end of the page
+        '''
+        if self.window_size is None or length <= self.window_size:
+            return [0]
+        stride = self.window_size - self.window_overlap
+        starts = list(range(0, length - self.window_size, stride))
+        starts.append(length - self.window_size)
+        return starts
+
+    def stitch(self, starts, window_logits, length):
+        '''
+            Merge the logits of overlapping windows, every block keeps the
+            logits of the window it is closest to the center of
+        '''
+        if len(starts) == 1:
+            return window_logits[0]
+        logits = np.empty((length,) + window_logits[0].shape[1:], dtype=window_logits[0].dtype)
+        # windows have the same size : the boundary between two windows is the
+        # middle point between their centers
+        bounds = [0] + [ (start + next_start + self.window_size) // 2
+            for start, next_start in zip(starts[:-1], starts[1:]) ] + [length]
+        for idx, start in enumerate(starts):
+            logits[bounds[idx]:bounds[idx+1]] = window_logits[idx][bounds[idx]-start:bounds[idx+1]-start]
+        return logits
+
+    def inference(self, features):
+        '''
+            features: list of feature matrix as returned by `preprocess`
+            returns a list of logits, one per document
+
+            the GRU in news_net does not take sequence length as input, padding
+            shorter documents would change their predictions. Documents are grouped
+            by number of blocks instead and each group runs as a single batch.
+            With a window_size, long documents are split into windows (see
+            window_starts) which are batched together, so memory is bounded by the
+            window size
+        '''
+        if self.session_pid != os.getpid():
+            # forked on a python without os.register_at_fork
+            _INHERITED_SESSIONS.append(self.ort_session)
+            self.load_session()
+
+        # every sequence fed to the model, a view on its document features
+        sequences, doc_starts = [], []
+        for feat in features:
+            starts = self.window_starts(len(feat))
+            doc_starts.append(starts)
+            for start in starts:
+                sequences.append(feat[start:start+self.window_size] if len(starts) > 1 else feat)
+
+        groups = {}
+        for seq_id, sequence in enumerate(sequences):
+            groups.setdefault(len(sequence), []).append(seq_id)
+
+        outputs = [None] * len(sequences)
+        for length, seq_ids in groups.items():
+            batch_size = max(1, self.max_batch_blocks // max(length, 1))
+            for offset in range(0, len(seq_ids), batch_size):
+                chunk = seq_ids[offset:offset+batch_size]
+                batch = np.stack([ sequences[seq_id] for seq_id in chunk ])
+                inputs_onnx = {
+                    'input': np.ascontiguousarray(batch[:, :, :self.BASE_FEAT_SIZE]),
+                    'css': np.ascontiguousarray(batch[:, :, self.BASE_FEAT_SIZE:])
+                }
+                results = self.ort_session.run(None, inputs_onnx)[0]
+                for jdx, seq_id in enumerate(chunk):
+                    outputs[seq_id] = results[jdx]
+
+        logits, seq_id = [], 0
+        for idx, starts in enumerate(doc_starts):
+            window_logits = outputs[seq_id:seq_id+len(starts)]
+            seq_id += len(starts)
+            logits.append(self.stitch(starts, window_logits, len(features[idx])))
+        return logits
+
+    def predict(self, html, top_rank=10, cache=None, templates=None, urls=None, return_blocks=False):
         '''
             html: HTML string or list of HTML string
             top_rank: top K block which used to predict author, breadcrumbs(keywords), date
+            cache: an incremental.BlockCache, pages with a url are extracted
+                incrementally from their previous version in the cache
+            templates: a templates.TemplateStore, pages with a url are extracted
+                from their domain template when it is learned
+            urls: url of html, a list for a list of html, None entries skip
+                the cache and templates
+            return_blocks: also return the blocks of html
         '''
-        single = False
-        if isinstance(html, list):
-            x, css, blocks= [], [], []
-            for html_ in html:
-                feat, block = self.preprocess(html_)
-                x.append(feat[:, :self.BASE_FEAT_SIZE])
-                css.append(feat[:, self.BASE_FEAT_SIZE:])
-                blocks.append(block)
-            x = np.array(x)
-            css = np.array(css)
+        single = not isinstance(html, list)
+        if single:
+            html = [html]
+            urls = [urls]
+        if urls is None:
+            urls = [None] * len(html)
+
+        pages = [ self.prepare(html_, cache=cache, templates=templates, url=url)
+            for html_, url in zip(html, urls) ]
+        self.infer(pages)
+        self.finish(pages, cache=cache, templates=templates, top_rank=top_rank)
+        outputs = [ page.output for page in pages ]
+        if return_blocks:
+            blocks = [ page.blocks for page in pages ]
+            return (outputs[0], blocks[0]) if single else (outputs, blocks)
+        return outputs[0] if single else outputs
+
+    def prepare(self, html, cache=None, templates=None, url=None):
+        '''
+            First stage of predict for one page: blocks and features, or the
+            output when its domain template decodes it, see predict for the
+            arguments
+        '''
+        page = PreparedPage(html, url)
+        page.blocks = self.blockify(html)
+        if url is None or (cache is None and templates is None):
+            page.features = self.feature_transform.transform(page.blocks).astype(np.float32)
+            return page
+
+        if templates is not None:
+            page.signatures = templates.signatures(page.blocks)
+            assignment, verify = templates.match(url, page.signatures, self.label_order)
+            if assignment is not None and not verify:
+                page.output = templates.decode(assignment, page.blocks, self.label_order)
+                return page
+            page.expected = assignment
+
+        if cache is not None:
+            page.features, page.hashes, page.logits = self.featurize_cached(page.blocks, cache.get(url))
         else:
-            single = True
-            feat, block = self.preprocess(html)
-            x = np.array([feat[:, :self.BASE_FEAT_SIZE]])
-            css = np.array([feat[:, self.BASE_FEAT_SIZE:]])
-            blocks = [block]
+            page.features = self.feature_transform.transform(page.blocks).astype(np.float32)
+        return page
+
+    def infer(self, pages):
+        '''
+            Second stage of predict: the logits of the prepared pages missing
+            them, in a single inference call
+        '''
+        missing = [ page for page in pages if page.output is None and page.logits is None ]
+        if len(missing) > 0:
+            for page, value in zip(missing, self.inference([ page.features for page in missing ])):
+                page.logits = value
 
-        inputs_onnx = { 'input': x, 'css': css }
+    def finish(self, pages, cache=None, templates=None, top_rank=10):
+        '''
+            Last stage of predict: the output of the pages from their logits,
+            which are recorded in cache and templates
+        '''
+        predicted = [ page for page in pages if page.output is None ]
+        for page in predicted:
+            if page.url is None:
+                continue
+            if cache is not None:
+                from .incremental import CachedPage
+                cache.put(page.url, CachedPage(page.hashes, page.features, page.logits))
+            if templates is not None:
+                templates.observe(page.url, page.signatures, page.logits, self.label_order,
+                    self.binary_threshold, self.cls_threshold, expected=page.expected)
+
+        decoded = self.decode_output([ page.logits for page in predicted ],
+            [ page.blocks for page in predicted ], top_rank=top_rank)
+        for page, output in zip(predicted, decoded):
+            page.output = output
+
+    def featurize_cached(self, blocks, previous):
+        '''
+            Features of blocks against the previous version of the page (a
+            CachedPage or None), returns features, block hashes and the cached
+            logits when no block changed
+        '''
+        from .incremental import block_hashes, align
 
-        logits = self.ort_session.run(None, inputs_onnx)[0]
-        decoded = self.decode_output(logits, blocks, top_rank=top_rank)
-        return decoded[0] if single else decoded
+        hashes = block_hashes(blocks)
+        if previous is None:
+            feat = self.feature_transform.transform(blocks).astype(np.float32)
+            return feat, hashes, None
+        if previous.hashes == hashes:
+            return previous.features, hashes, previous.logits
+        feat = self.featurize_incremental(blocks, previous, align(previous.hashes, hashes))
+        return feat, hashes, None
 
     def decode_output(self, logits, doc_blocks, top_rank=10):
         outputs = []
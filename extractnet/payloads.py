@@ -0,0 +1,104 @@
+'''
+    Strip large inline payloads before parsing
+
+    Multi megabyte pages are mostly inline JSON state, SVG icons, CSS and
+    base64 images. None of it reaches the blocks (script, style and svg are
+    blacklisted by the blockifier) but lxml still parses and stores it, twice
+    since metadata and blocks each parse the page. PayloadFilter empties the
+    body of large <script>, <style> and <svg> elements and shortens long data:
+    URIs with regular expressions before any parsing. Scripts read by the
+    metadata stage (JSON-LD, __NEXT_DATA__) are kept whatever their size.
+'''
+import re
+
+RE_FLAGS = re.IGNORECASE | re.DOTALL
+
+PAYLOAD_PATTERN = r'(<(script|style|svg)\b[^>]*>)(.*?)(</\2\s*>)'
+DATA_URI_PATTERN = r'data:[^"\'\s)]{%d,}'
+KEEP_SCRIPT_PATTERN = r'application/(ld\+json|settings\+json)|__NEXT_DATA__'
+SVG_PATTERN = r'<svg\b'
+
+
+class PayloadFilter():
+    '''
+        min_size: pages smaller than this are returned unchanged
+        max_payload: script, style and svg bodies longer than this are emptied
+        max_data_uri: data URIs longer than this are replaced by an empty one
+        max_size: pages still longer than this once stripped are truncated,
+            None to never truncate. The cut backs off to the start of a tag or
+            a script cut in the middle, and of a utf-8 character for bytes
+    '''
+
+    def __init__(self, min_size=262144, max_payload=32768, max_data_uri=1024, max_size=None):
+        self.min_size = min_size
+        self.max_payload = max_payload
+        self.max_data_uri = max_data_uri
+        self.max_size = max_size
+        self.patterns = {}
+        for kind in (str, bytes):
+            cast = (lambda x: x) if kind is str else (lambda x: x.encode('ascii'))
+            self.patterns[kind] = (
+                re.compile(cast(PAYLOAD_PATTERN), RE_FLAGS),
+                re.compile(cast(DATA_URI_PATTERN % max_data_uri), RE_FLAGS),
+                re.compile(cast(KEEP_SCRIPT_PATTERN), RE_FLAGS),
+                re.compile(cast(SVG_PATTERN), RE_FLAGS),
+                cast('data:,'),
+                (cast('<'), cast('>'), cast('<script'), cast('</script')),
+            )
+
+    def __call__(self, html):
+        if not isinstance(html, (str, bytes)) or len(html) < self.min_size:
+            return html
+        payload, data_uri, keep_script, svg, empty_uri, markers = self.patterns[str if isinstance(html, str) else bytes]
+
+        def strip(match):
+            start_tag, tag, body, end_tag = match.groups()
+            if len(body) <= self.max_payload:
+                return match.group(0)
+            tag = tag.lower()
+            if tag in ('script', b'script') and keep_script.search(start_tag) is not None:
+                return match.group(0)
+            # the match stops at the first closing tag, an svg nested in
+            # this one would be cut in the middle
+            if tag in ('svg', b'svg') and svg.search(body) is not None:
+                return match.group(0)
+            return start_tag + end_tag
+
+        html = payload.sub(strip, html)
+        html = data_uri.sub(empty_uri, html)
+        if self.max_size is not None and len(html) > self.max_size:
+            html = _truncate(html, self.max_size, markers)
+        return html
+
+
+def _utf8_boundary(data):
+    # drop a multibyte utf-8 sequence cut at the end of data
+    end = len(data)
+    start = end
+    while start > 0 and end - start < 4 and data[start - 1] & 0xC0 == 0x80:
+        start -= 1
+    if start > 0 and data[start - 1] >= 0xC0:
+        lead = data[start - 1]
+        length = 2 if lead < 0xE0 else (3 if lead < 0xF0 else 4)
+        if end - start + 1 < length:
+            return data[:start - 1]
+    return data
+
+
+def _truncate(html, max_size, markers):
+    '''
+        html cut to at most max_size, without a tag or script cut in the
+        middle : a JSON-LD script without its end would be dropped anyway
+    '''
+    tag_start, tag_end, script_start, script_end = markers
+    html = html[:max_size]
+    start = html.rfind(tag_start)
+    if start > html.rfind(tag_end):
+        html = html[:start]
+    lowered = html.lower()
+    start = lowered.rfind(script_start)
+    if start > lowered.rfind(script_end):
+        html = html[:start]
+    if isinstance(html, bytes):
+        html = _utf8_boundary(html)
+    return html
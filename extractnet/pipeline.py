@@ -1,21 +1,62 @@
 import os
 import logging
 import numpy as np
-import dateparser
 from sklearn.base import BaseEstimator, ClassifierMixin
 from .metadata_extraction.metadata import extract_metadata
+from .metadata_extraction.dates import MODEL_DATE_CONFIDENCE
 
 from .compat import unicode_
 from .util import priority_merge, get_module_res, remove_empty_keys, attribute_sanity_check
-from .nn_models import NewsNet
+from .nn_models import NewsNet, PreparedPage
 from .name_crf import AuthorExtraction
-from .nn_models import NewsNet
+from .model_bundle import resolve, EMBEDDING_MATRIX, CRF_MODEL, CRF_WEIGHTS
+from .payloads import PayloadFilter
+from .callbacks import CallbackRunner, Document, spec_of
+
+WARMUP_HTML = '''<html lang="en"><head>
+<title>Warmup article - Example News</title>
+<meta property="og:title" content="Warmup article">
+<meta property="og:site_name" content="Example News">
+<meta name="author" content="Jane Doe">
+<meta property="article:published_time" content="2021-03-04T05:06:07Z">
+<link rel="canonical" href="https://example.com/2021/03/04/warmup-article">
+<script type="application/ld+json">{"@type": "NewsArticle", "headline": "Warmup article",
+"datePublished": "2021-03-04T05:06:07Z", "author": {"@type": "Person", "name": "Jane Doe"}}</script>
+</head><body>
+<nav><a href="/">Home</a> <a href="/world">World</a></nav>
+<article><h1>Warmup article</h1>
+<p class="byline">By Jane Doe and John Smith</p>
+<p class="date">March 4, 2021</p>
+<p>The first paragraph of a short news article used to load every model and lazy dependency before serving requests.</p>
+<p>A second paragraph with a few more sentences, so the page looks like a real article to the content model.</p>
+</article>
+<footer>Copyright 2021 Example News</footer>
+</body></html>'''
 
 
 class Extractor(BaseEstimator, ClassifierMixin):
 
     def __init__(self, author_extractor=None, content_extractor=None, postprocess=[],
-            meta_postprocess=[]):
+            meta_postprocess=[], block_cache=None, templates=None, prefilter=None,
+            payload_filter=None, raw_candidates=False, sites=None, callback_workers=4):
+        '''
+            block_cache: an incremental.BlockCache, pages extracted with a url
+                reuse the features and predictions of their previous version
+            templates: a templates.TemplateStore, pages extracted with a url
+                are matched against the learned layout of their domain
+            prefilter: a prefilter.Prefilter, pages it rejects are returned as
+                {'isArticle': False, 'articleScore': score} without running
+                metadata mining and the model
+            payload_filter: a payloads.PayloadFilter applied to pages before
+                parsing, None for the default one, False to parse pages as is
+            raw_candidates: add the ranked blocks of the model to the results
+                as 'candidates', and tag the author and parse the date of the
+                model even when metadata already has them
+            sites: a metadata_extraction.sites.SiteMemo, the license the pages
+                of a host agree on is reused instead of searched
+            callback_workers: threads running the concurrent callbacks and
+                the ones with a timeout, see callbacks.callback
+        '''
         if author_extractor is None:
             author_extractor = AuthorExtraction()
         if content_extractor is None:
@@ -29,27 +70,84 @@ class Extractor(BaseEstimator, ClassifierMixin):
         self.author_extractor = author_extractor
         self.content_extractor = content_extractor
         self.output_attributes = self.content_extractor.label_order
+        self.block_cache = block_cache
+        self.templates = templates
+        self.prefilter = prefilter
+        if payload_filter is None:
+            payload_filter = PayloadFilter()
+        self.payload_filter = payload_filter
+        self.raw_candidates = raw_candidates
+        self.sites = sites
+        self.callback_workers = callback_workers
+        self.callbacks = CallbackRunner(callback_workers)
+        # callbacks reading the tree or blocks get them from the extraction
+        self.document_callbacks = any(spec_of(function).document
+            for function in list(meta_postprocess) + list(postprocess))
 
     @staticmethod
-    def from_pretrained(directory=None):
+    def from_pretrained(directory=None, model_variant='float32', window_size=None):
         if directory is None:
             directory = get_module_res('models')
-        nn_weight_path = os.path.join(directory, 'news_net.onnx')
-        embedding_path = os.path.join(directory, 'char_embedding.joblib')
-        crf_path = os.path.join(directory, 'crf.joblib')
+        nn_weight_path = NewsNet.variant_path(model_variant, directory)
+        embedding_path = resolve(directory, EMBEDDING_MATRIX, 'char_embedding.joblib')
+        crf_path = resolve(directory, CRF_WEIGHTS, CRF_MODEL, 'crf.joblib')
 
         return Extractor(
             AuthorExtraction(embedding_path, crf_path),
-            NewsNet(model_weight=nn_weight_path)
+            NewsNet(model_weight=nn_weight_path, model_variant=model_variant,
+                window_size=window_size)
         )
 
+    def warmup(self):
+        '''
+            Load everything which is otherwise lazily loaded on the first request:
+            dateparser language data, htmldate, ftfy, the onnxruntime arena.
+            Call it before forking workers so they inherit a warm process
+        '''
+        import dateparser
+        # dateparser compiles the regexes of each locale on first use, digits
+        # are valid in every locale but this text can't be parsed by any of
+        # them, so all locales get loaded
+        dateparser.parse('99 99 99 99')
+        self.content_extractor.warmup()
+        self.extract(WARMUP_HTML)
+        self.extract([WARMUP_HTML, WARMUP_HTML])
+        return self
+
     @staticmethod
-    def extract_one_meta(document):
-        meta_data = extract_metadata(document)
+    def extract_one_meta(document, date_candidates=None, sites=None, tree=None, parse_date=None):
+        meta_data = extract_metadata(document, date_candidates=date_candidates, sites=sites, tree=tree,
+            parse_date=parse_date)
         meta_data = remove_empty_keys(meta_data)
 
         return meta_data
 
+    def page_of(self, html, url=None, blocks=None):
+        '''
+            callbacks.Document of html shared by metadata mining and the
+            callbacks, None when no callback reads it
+        '''
+        if not self.document_callbacks:
+            return None
+        return Document(html, url=url, blocks=blocks, blockify=self.content_extractor.blockify)
+
+    def mine_meta(self, document, date_candidates=None, page=None, parse_date=None):
+        '''
+            date_candidates: (text, confidence) date blocks of the model, a
+                confident one spares the htmldate search
+            page: callbacks.Document of document
+            parse_date: parser of the date candidates, only called when the
+                meta elements and the url have no date
+        '''
+        if page is None:
+            page = self.page_of(document)
+        meta_data = self.extract_one_meta(document, date_candidates, self.sites,
+            None if page is None else page.tree, parse_date)
+        if self.has_meta_pos:
+            meta_data = self.callbacks.run(self.meta_postprocess_pipelines, document, page, meta_data,
+                with_results=False)
+        return meta_data
+
     def __call__(self, html, **kwargs):
         return self.extract(html, **kwargs)
 
@@ -59,55 +157,126 @@ class Extractor(BaseEstimator, ClassifierMixin):
         extract_target=None, 
         debug=False, 
         metadata_mining=True, 
+        urls=None,
         **kwargs):
-        
-        if isinstance(html, (str, bytes, unicode_, np.unicode_)):
-            documents_meta_data = {}
-            if metadata_mining:
-                documents_meta_data = self.extract_one_meta(html)
-                if self.has_meta_pos:
-                    for pipeline in self.meta_postprocess_pipelines:
-                        meta_post_result = pipeline(html)
-                        documents_meta_data = priority_merge(meta_post_result, documents_meta_data)
-        else: # must be a list
-            documents_meta_data = []
-            if metadata_mining:
-                for document in html:
-                    document_meta_data = self.extract_one_meta(document)
-                    if self.has_meta_pos:
-                        for pipeline in self.meta_postprocess_pipelines:
-                            meta_post_result = pipeline(document)
-                            document_meta_data = priority_merge(meta_post_result, document_meta_data)
-
-                    documents_meta_data.append(document_meta_data)
-            else:
-                documents_meta_data = [{}] * len(html)
+        '''
+            html: HTML string or list of HTML string
+            url: url of a single html, used to validate the date, as block_cache key
+                and for the domain template
+            urls: list of url of a list of html
+        '''
+        single = isinstance(html, (str, bytes, unicode_, np.unicode_))
+        if single:
+            html, urls = [html], [kwargs.pop('url', None)]
+        elif urls is None:
+            urls = [None] * len(html)
+        pages = [ self.prepare(document, url) for document, url in zip(html, urls) ]
+        self.infer(pages)
+        results = [ self.finish(page, metadata_mining, **kwargs) for page in pages ]
+        return results[0] if single else results
+
+    def prepare(self, html, url=None):
+        '''
+            First stage of extract for one page: payload filter, prefilter,
+            blocks and features. Returns a nn_models.PreparedPage, its result
+            is already set when the prefilter rejects the page
+
+            Pages go through prepare, infer and finish, batches of pages
+            share the inference call of infer
+        '''
+        if self.payload_filter:
+            html = self.payload_filter(html)
+        if self.prefilter is not None:
+            accepted, score = self.prefilter(html)
+            if not accepted:
+                page = PreparedPage(html, url)
+                page.result = self.prefilter.rejected_result(score)
+                return page
+        return self.content_extractor.prepare(html, cache=self.block_cache, templates=self.templates, url=url)
 
-        output = self.content_extractor.predict(html)
-        if isinstance(output, dict):
-            return self.postprocess(html, output, documents_meta_data, **kwargs)
+    def infer(self, pages):
+        '''
+            Second stage of extract: the model output of the prepared pages,
+            the block cache and templates learn from them
+        '''
+        pages = [ page for page in pages if page.result is None ]
+        self.content_extractor.infer(pages)
+        self.content_extractor.finish(pages, cache=self.block_cache, templates=self.templates)
 
-        return [ self.postprocess(h, o, meta, **kwargs) for h, o, meta in zip(html, output, documents_meta_data)]
+    def finish(self, page, metadata_mining=True, **kwargs):
+        '''
+            Last stage of extract for one page: metadata mining, postprocess
+            and callbacks, returns the extraction result
+        '''
+        if page.result is not None:
+            return page.result
+        if page.url is not None:
+            kwargs['url'] = page.url
+        # the model runs first, its date blocks are used by metadata mining
+        return self._extract_document(page.html, page.output, metadata_mining, blocks=page.blocks, **kwargs)
 
-    def postprocess(self, html, output, meta, **kwargs):
+    def _extract_document(self, html, output, metadata_mining=True, blocks=None, **kwargs):
+        # date text -> parsed date, shared by metadata mining and postprocess
+        parsed_dates = {}
+        page = self.page_of(html, kwargs.get('url'), blocks)
+        meta = {}
+        if metadata_mining:
+            meta = self.mine_meta(html, self.date_candidates(output), page,
+                lambda date_text: self.parse_date(date_text, parsed_dates))
+        return self.postprocess(html, output, meta, parsed_dates=parsed_dates, page=page, **kwargs)
+
+    @staticmethod
+    def parse_date(date_text, parsed_dates=None):
+        '''
+            dateparser date of a model date block, None when it can't be read
+        '''
+        if parsed_dates is not None and date_text in parsed_dates:
+            return parsed_dates[date_text]
+        import dateparser
+        date = None
+        try:
+            date = dateparser.parse(date_text)
+        except Exception as err:
+            logging.error("date parsing failed, error : {}".format(err))
+        if parsed_dates is not None:
+            parsed_dates[date_text] = date
+        return date
+
+    @staticmethod
+    def date_candidates(output):
+        '''
+            (text, confidence) of the model date blocks confident enough for
+            metadata date resolution
+        '''
+        return [ (date_text, confidence)
+            for date_text, confidence in output.get('date', []) if confidence >= MODEL_DATE_CONFIDENCE ]
+
+    def postprocess(self, html, output, meta, parsed_dates=None, page=None, **kwargs):
         results = {}
+        if self.raw_candidates:
+            results['candidates'] = { label: list(value) for label, value in output.items()
+                if isinstance(value, list) }
+
+        # metadata values win over the model ones in priority_merge, the
+        # author tagger and dateparser only run when their result can be kept
         if 'author' in output and len(output['author']) > 0:
             author_text, confidence = output['author'][0]
             results['rawAuthor'] = author_text
             results['authorConfidence'] = float(confidence)
-            results['author'] = self.author_extractor(author_text)
-        
+            if self.raw_candidates or 'author' not in meta:
+                results['author'] = self.author_extractor(author_text)
+
         if 'date' in output and len(output['date']) > 0:
-            for date_text, confidence in output['date']:
-                date = None
-                try:
-                    date = dateparser.parse(date_text)
-                except Exception as err:
-                    logging.error("date parsing failed, error : {}".format(err))
-                if date is not None:
-                    results['rawDate'] = date_text
-                    results['dateConfidence'] = confidence
-                    results['date'] = date
+            if self.raw_candidates or 'date' not in meta:
+                for date_text, confidence in output['date']:
+                    date = self.parse_date(date_text, parsed_dates)
+                    if date is not None:
+                        results['rawDate'] = date_text
+                        results['dateConfidence'] = confidence
+                        results['date'] = date
+            else:
+                # the metadata date is kept, the raw text needs no parsing
+                results['rawDate'], results['dateConfidence'] = output['date'][0]
 
         for attribute, value in output.items():
             if attribute in ['author', 'date']:
@@ -121,9 +290,9 @@ class Extractor(BaseEstimator, ClassifierMixin):
         results = priority_merge(results, meta)
 
         if self.has_post:
-            for pipeline in self.postprocess_pipelines:
-                post_ml_results_ = pipeline(html, results)
-                results = priority_merge(post_ml_results_, results)
+            if page is None:
+                page = self.page_of(html, kwargs.get('url'))
+            results = self.callbacks.run(self.postprocess_pipelines, html, page, results)
 
         sanity_check_params = {}
         if 'url' in kwargs:
@@ -0,0 +1,140 @@
+'''
+    Cheap article pre-filter
+
+    Index pages, tag listings, login walls and error pages go through the
+    whole pipeline for nothing. The pre-filter scores a page from signals read
+    with a few regular expressions over the raw html, no parsing :
+
+        og:type             article vs website, profile...
+        JSON-LD @type       NewsArticle, BlogPosting... vs CollectionPage, ItemList...
+        text length         visible text once scripts, styles and tags are removed
+        link density        share of the text inside <a> tags
+        paragraphs          number of <p> with a sentence worth of text
+        error / login       404-like titles, password fields
+
+    Pages scoring below the threshold are rejected by Extractor(prefilter=...)
+    before metadata mining and the model. Tune the threshold on labeled pages
+    with scripts/evaluate_prefilter.py
+'''
+import math
+import re
+
+from .compat import str_cast
+
+RE_FLAGS = re.IGNORECASE | re.DOTALL
+
+INVISIBLE = re.compile(r'<(script|style|noscript|template|svg)\b.*?</\1\s*>|<!--.*?-->', RE_FLAGS)
+ANCHOR = re.compile(r'<a\b[^>]*>(.*?)</a\s*>', RE_FLAGS)
+PARAGRAPH = re.compile(r'<p\b[^>]*>(.*?)(?=<p\b|</p\s*>|<div\b|</div\s*>)', RE_FLAGS)
+TAG = re.compile(r'<[^>]*>')
+SPACES = re.compile(r'\s+')
+TITLE = re.compile(r'<title\b[^>]*>(.*?)</title\s*>', RE_FLAGS)
+OG_TYPE = re.compile(r'<meta\b[^>]*?(?:property|name)\s*=\s*["\']og:type["\'][^>]*>', RE_FLAGS)
+CONTENT_ATTR = re.compile(r'content\s*=\s*["\']([^"\']*)["\']', RE_FLAGS)
+LD_TYPE = re.compile(r'"@type"\s*:\s*(\[[^\]]*\]|"[^"]*")', RE_FLAGS)
+PASSWORD = re.compile(r'<input\b[^>]*type\s*=\s*["\']?password', RE_FLAGS)
+# status codes and "error" only count at the start of the title, headlines
+# quote numbers ("S&P 500 closes at record high") and talk about errors
+ERROR_TITLE = re.compile(r'^\s*(?:(?:http\s*)?(?:error\s*)?(?:404|403|410|500)\b|error\b)'
+    r'|\b(?:page )?not found\b|\baccess denied\b', re.IGNORECASE)
+
+ARTICLE_LD_TYPES = {
+    'article', 'newsarticle', 'blogposting', 'reportagenewsarticle', 'analysisnewsarticle',
+    'opinionnewsarticle', 'reviewnewsarticle', 'backgroundnewsarticle', 'report',
+    'scholarlyarticle', 'techarticle', 'liveblogposting', 'socialmediaposting',
+}
+LISTING_LD_TYPES = {
+    'collectionpage', 'itemlist', 'searchresultspage', 'profilepage',
+}
+
+# minimum length of the text of a <p> counted as a paragraph
+PARAGRAPH_LENGTH = 80
+
+# weights of the page score, the probability of being an article is
+# sigmoid(BIAS + sum(weight * signal))
+WEIGHTS = {
+    'og_article': 2.0,
+    'og_other': -1.0,
+    'ld_article': 2.5,
+    'ld_listing': -1.5,
+    'log_text_length': 1.2,
+    'link_density': -8.0,
+    'paragraphs': 0.6,
+    'error_title': -3.0,
+    'password': -2.0,
+}
+BIAS = -7.0
+
+
+def _text(html):
+    return SPACES.sub(' ', TAG.sub(' ', html)).strip()
+
+
+def page_signals(html):
+    '''
+        Signals of the pre-filter for an html string (or bytes)
+    '''
+    html = str_cast(html)
+    signals = {}
+
+    og_type = ''
+    match = OG_TYPE.search(html)
+    if match is not None:
+        content = CONTENT_ATTR.search(match.group(0))
+        og_type = content.group(1).strip().lower() if content is not None else ''
+    signals['og_article'] = float(og_type == 'article')
+    signals['og_other'] = float(og_type not in ('', 'article'))
+
+    ld_types = set()
+    for match in LD_TYPE.finditer(html):
+        ld_types.update(value.lower() for value in re.findall(r'"([^"]*)"', match.group(1)))
+    signals['ld_article'] = float(len(ld_types & ARTICLE_LD_TYPES) > 0)
+    signals['ld_listing'] = float(len(ld_types & LISTING_LD_TYPES) > 0 and signals['ld_article'] == 0)
+
+    title = TITLE.search(html)
+    signals['error_title'] = float(title is not None and ERROR_TITLE.search(_text(title.group(1))) is not None)
+    signals['password'] = float(PASSWORD.search(html) is not None)
+
+    visible = INVISIBLE.sub(' ', html)
+    text_length = len(_text(visible))
+    link_length = sum(len(_text(anchor)) for anchor in ANCHOR.findall(visible))
+    signals['text_length'] = text_length
+    signals['log_text_length'] = math.log1p(text_length)
+    signals['link_density'] = link_length / text_length if text_length > 0 else 1.0
+    signals['paragraphs'] = float(min(sum(1 for paragraph in PARAGRAPH.findall(visible)
+        if len(_text(paragraph)) >= PARAGRAPH_LENGTH), 10))
+    return signals
+
+
+def article_score(signals):
+    '''
+        Probability that a page is an article from its signals
+    '''
+    logit = BIAS + sum(weight * signals[name] for name, weight in WEIGHTS.items())
+    return 1.0 / (1.0 + math.exp(-logit))
+
+
+class Prefilter():
+    '''
+        threshold: pages with an article score below it are rejected
+    '''
+
+    def __init__(self, threshold=0.1):
+        self.threshold = threshold
+
+    def score(self, html):
+        return article_score(page_signals(html))
+
+    def __call__(self, html):
+        '''
+            True when the page should go through the pipeline, and its score
+        '''
+        score = self.score(html)
+        return score >= self.threshold, score
+
+    @staticmethod
+    def rejected_result(score):
+        '''
+            Result returned by Extractor for a rejected page
+        '''
+        return { 'isArticle': False, 'articleScore': score }
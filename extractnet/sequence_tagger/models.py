@@ -3,9 +3,16 @@ import json
 import re
 import numpy as np
 
+from ..model_bundle import load_crf
+
 NON_WORD_CHAR = re.compile(r'[-|——|,|.|:|@|#|!|$|%|^|&|*|，|、|；|-|+|~|`|⋯⋯|。|/|｜|】|【|」|》|>|<|《|;|；|：|」|"|\'|／|「|}|{|,]')
 
-def word2features(sent, i, embeddings):
+EMBED_KEYS = [ str(idx)+'_embed' for idx in range(16) ]
+
+def word2features(sent, i, embeddings, embedding=None):
+    '''
+        embedding : optional precomputed embedding row of sent[i], see sent2features
+    '''
     word = sent[i]
 
     features = {
@@ -23,13 +30,17 @@ def word2features(sent, i, embeddings):
         'position_idx': i
     }
 
-    if word not in embeddings:
-        embedding = embeddings['UNK']
-    else:
-        embedding = embeddings[word]
+    if embedding is None:
+        if word not in embeddings:
+            embedding = embeddings['UNK']
+        else:
+            embedding = embeddings[word]
 
-    for idx, val in enumerate(embedding):
-        features[str(idx)+'_embed'] = val
+    if len(embedding) == len(EMBED_KEYS):
+        features.update(zip(EMBED_KEYS, embedding))
+    else:
+        for idx, val in enumerate(embedding):
+            features[str(idx)+'_embed'] = val
 
     if i > 0:
         word1 = sent[i-1][0]
@@ -53,6 +64,14 @@ def word2features(sent, i, embeddings):
 
     return features
 
+def sent2features(sent, embeddings):
+    if hasattr(embeddings, 'rows'):
+        # CharEmbedding : a single gather over the embedding matrix
+        rows = embeddings.rows(sent)
+    else:
+        rows = [ embeddings[word] if word in embeddings else embeddings['UNK'] for word in sent ]
+    return [ word2features(sent, i, embeddings, rows[i]) for i in range(len(sent)) ]
+
 class NameExtractor():
 
     def __init__(self, embedding, crf_model):
@@ -60,13 +79,13 @@ class NameExtractor():
             embedding = joblib.load(embedding)
 
         if isinstance(crf_model, str):
-            crf_model = joblib.load(crf_model)
+            crf_model = load_crf(crf_model)
 
         self.embedding = embedding
         self.crf_model = crf_model
     
     def preprocess(self, sent):
-        return [  word2features(sent, i, self.embedding) for i in range(len(sent)) ]
+        return sent2features(sent, self.embedding)
 
     def extract_token(self, pred_label, text):
         names = []
@@ -97,14 +116,8 @@ class NameExtractor():
             feature = [ self.preprocess(s) for s in sent ]
             text = sent
 
-        y_preds = []
-
-        for y_margin in self.crf_model.predict_marginals(feature):
-            y_pred = []
-            for output in y_margin:
-                label_right = max(output, key=output.get)
-                y_pred.append(label_right)
-            y_preds.append(y_pred)
+        # viterbi labels, sentences are decoded in one batch
+        y_preds = self.crf_model.predict(feature)
 
         if isinstance(sent, str):
             return self.extract_token(y_preds[0], sent)
@@ -0,0 +1,427 @@
+'''
+    Local extraction server with dynamic micro-batching
+
+    Requests are queued and collected into micro batches (bounded by
+    `max_batch_size` and `max_wait_ms`) so NewsNet runs one ONNX call for
+    many pages, while the other stages of Extractor (payload filter,
+    prefilter, blockify, metadata mining, postprocess) run on a worker pool.
+
+    usage:
+
+        python -m extractnet.serve --port 8000
+        python -m extractnet.serve --unix-socket /tmp/extractnet.sock
+
+        curl -X POST --data-binary @page.html http://localhost:8000/extract
+        curl http://localhost:8000/metrics
+'''
+import argparse
+import functools
+import json
+import logging
+import os
+import queue
+import socketserver
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, InvalidStateError, ThreadPoolExecutor, TimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import numpy as np
+
+from . import caches
+from .pipeline import Extractor
+from .util import json_default
+
+LOGGER = logging.getLogger(__name__)
+
+
+class ServerMetrics():
+    '''
+        Thread safe counters for queue depth, batch size and request latency
+    '''
+
+    def __init__(self, window=2048):
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.requests = 0
+        self.errors = 0
+        self.batches = 0
+        self.batched_requests = 0
+        self.max_batch_size = 0
+        self.latencies = deque(maxlen=window)
+        self.queue_waits = deque(maxlen=window)
+
+    def observe_batch(self, size):
+        with self._lock:
+            self.batches += 1
+            self.batched_requests += size
+            self.max_batch_size = max(self.max_batch_size, size)
+
+    def observe_request(self, latency, queue_wait, error=False):
+        with self._lock:
+            self.requests += 1
+            if error:
+                self.errors += 1
+            self.latencies.append(latency)
+            self.queue_waits.append(queue_wait)
+
+    @staticmethod
+    def _percentiles(values):
+        if len(values) == 0:
+            return {'p50': None, 'p95': None, 'p99': None}
+        p50, p95, p99 = np.percentile(np.array(values) * 1000.0, [50, 95, 99])
+        return {'p50': float(p50), 'p95': float(p95), 'p99': float(p99)}
+
+    def snapshot(self, queue_depth=0):
+        with self._lock:
+            return {
+                'uptime': time.time() - self.started,
+                'queue_depth': queue_depth,
+                'requests': self.requests,
+                'errors': self.errors,
+                'batches': self.batches,
+                'avg_batch_size': self.batched_requests / self.batches if self.batches else 0.0,
+                'max_batch_size': self.max_batch_size,
+                'latency_ms': self._percentiles(list(self.latencies)),
+                'queue_wait_ms': self._percentiles(list(self.queue_waits)),
+            }
+
+
+class _PendingRequest():
+
+    __slots__ = ('html', 'kwargs', 'future', 'enqueued', 'dequeued')
+
+    def __init__(self, html, kwargs):
+        self.html = html
+        self.kwargs = kwargs
+        self.future = Future()
+        self.enqueued = time.monotonic()
+        self.dequeued = None
+
+
+class MicroBatcher():
+    '''
+        Collect single page requests into dynamic micro batches for `Extractor`
+
+        extractor: Extractor instance, a default one is created if None
+        max_batch_size: maximum number of pages sent to NewsNet in one run
+        max_wait_ms: maximum time the first request of a batch waits for others
+        workers: size of the pool running metadata mining, blockify and postprocess
+    '''
+
+    def __init__(self, extractor=None, max_batch_size=16, max_wait_ms=10, workers=4,
+            metadata_mining=True):
+        if extractor is None:
+            extractor = Extractor()
+        self.extractor = extractor
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait_ms = max(0.0, float(max_wait_ms))
+        self.metadata_mining = metadata_mining
+        self.metrics = ServerMetrics()
+
+        self._queue = queue.Queue()
+        self._pool = ThreadPoolExecutor(max_workers=workers)
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='extractnet-batcher', daemon=True)
+        self._thread.start()
+
+    @property
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def submit(self, html, **kwargs):
+        '''
+            Queue one page, returns a `concurrent.futures.Future` of the extraction result.
+            The stages not run yet are skipped once the future is cancelled
+        '''
+        if self._stopped.is_set():
+            raise RuntimeError('MicroBatcher is closed')
+        request = _PendingRequest(html, kwargs)
+        self._queue.put(request)
+        return request.future
+
+    def extract(self, html, timeout=None, **kwargs):
+        future = self.submit(html, **kwargs)
+        try:
+            return future.result(timeout=timeout)
+        except TimeoutError:
+            # nobody reads the result anymore, drop its queued work
+            future.cancel()
+            raise
+
+    def close(self):
+        self._stopped.set()
+        self._queue.put(None)
+        self._thread.join()
+        self._pool.shutdown(wait=True)
+
+    def _collect(self):
+        first = self._queue.get()
+        if first is None:
+            return []
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait_ms / 1000.0
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if request is None:
+                # keep the stop signal for the next round
+                self._queue.put(None)
+                break
+            batch.append(request)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if len(batch) == 0:
+                break
+            try:
+                self._process(batch)
+            except Exception as err:
+                LOGGER.exception('micro batch failed')
+                for request in batch:
+                    self._finish(request, error=err)
+
+    def _prepare(self, request):
+        if request.future.done():
+            return None
+        return self.extractor.prepare(request.html, request.kwargs.get('url'))
+
+    def _postprocess(self, request, page):
+        if request.future.done():
+            return None
+        return self.extractor.finish(page, self.metadata_mining, **request.kwargs)
+
+    def _finish(self, request, result=None, error=None):
+        if request.future.done():
+            return
+        try:
+            if error is not None:
+                request.future.set_exception(error)
+            else:
+                request.future.set_result(result)
+        except InvalidStateError:
+            # cancelled meanwhile
+            return
+        now = time.monotonic()
+        dequeued = request.dequeued or now
+        self.metrics.observe_request(now - request.enqueued, dequeued - request.enqueued,
+            error=error is not None)
+
+    def _complete(self, request, job):
+        try:
+            result = job.result()
+        except Exception as err:
+            self._finish(request, error=err)
+        else:
+            self._finish(request, result=result)
+
+    def _process(self, batch):
+        # cancelled (timed out) requests are not run
+        batch = [ request for request in batch if not request.future.done() ]
+        if len(batch) == 0:
+            return
+        now = time.monotonic()
+        for request in batch:
+            request.dequeued = now
+        self.metrics.observe_batch(len(batch))
+
+        prepared = [ self._pool.submit(self._prepare, request) for request in batch ]
+        ready, pages = [], []
+        for request, job in zip(batch, prepared):
+            try:
+                page = job.result()
+            except Exception as err:
+                self._finish(request, error=err)
+                continue
+            if request.future.done():
+                continue
+            ready.append(request)
+            pages.append(page)
+
+        if len(ready) == 0:
+            return
+
+        # one model run for the batch, the other stages run on the pool
+        self.extractor.infer(pages)
+
+        # postprocess jobs complete the futures themselves, the next batch is
+        # collected while they run
+        for request, page in zip(ready, pages):
+            if request.future.done():
+                continue
+            job = self._pool.submit(self._postprocess, request, page)
+            job.add_done_callback(functools.partial(self._complete, request))
+
+
+class ExtractionRequestHandler(BaseHTTPRequestHandler):
+    '''
+        POST /extract : body is the raw HTML, or JSON {"html": ..., "url": ...}
+        GET /metrics : queue depth, batch and latency statistics, cache sizes,
+            time spent in callbacks
+        GET /health
+    '''
+    server_version = 'ExtractNet'
+    protocol_version = 'HTTP/1.1'
+
+    def address_string(self):
+        # unix socket clients have no (host, port) address
+        if isinstance(self.client_address, tuple) and len(self.client_address) > 0:
+            return str(self.client_address[0])
+        return 'unix'
+
+    def log_message(self, format, *args):
+        LOGGER.debug('%s - %s', self.address_string(), format % args)
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, default=json_default, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == '/metrics':
+            payload = self.server.batcher.metrics.snapshot(self.server.batcher.queue_depth)
+            payload['caches'] = caches.report()
+            payload['callbacks'] = self.server.batcher.extractor.callbacks.stats.snapshot()
+            self._send_json(200, payload)
+        elif path == '/health':
+            self._send_json(200, {'status': 'ok'})
+        else:
+            self._send_json(404, {'error': 'not found'})
+
+    def _read_request(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length)
+        kwargs = {}
+        query = parse_qs(urlparse(self.path).query)
+        if 'url' in query:
+            kwargs['url'] = query['url'][0]
+
+        content_type = self.headers.get_content_type()
+        charset = self.headers.get_content_charset() or 'utf-8'
+        if content_type == 'application/json':
+            payload = json.loads(body.decode(charset))
+            html = payload['html']
+            if payload.get('url'):
+                kwargs['url'] = payload['url']
+        else:
+            html = body.decode(charset, errors='replace')
+        return html, kwargs
+
+    def do_POST(self):
+        if urlparse(self.path).path != '/extract':
+            self._send_json(404, {'error': 'not found'})
+            return
+        try:
+            html, kwargs = self._read_request()
+        except (ValueError, KeyError) as err:
+            self._send_json(400, {'error': 'invalid request: {}'.format(err)})
+            return
+
+        try:
+            result = self.server.batcher.extract(html, timeout=self.server.request_timeout, **kwargs)
+        except Exception as err:
+            LOGGER.error('extraction failed: %s', err)
+            self._send_json(500, {'error': str(err)})
+            return
+        self._send_json(200, result)
+
+
+class ExtractionHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, batcher, request_timeout=None):
+        ThreadingHTTPServer.__init__(self, address, ExtractionRequestHandler)
+        self.batcher = batcher
+        self.request_timeout = request_timeout
+
+
+class ExtractionUnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path, batcher, request_timeout=None):
+        if os.path.exists(path):
+            os.unlink(path)
+        socketserver.UnixStreamServer.__init__(self, path, ExtractionRequestHandler)
+        self.batcher = batcher
+        self.request_timeout = request_timeout
+
+    def server_close(self):
+        socketserver.UnixStreamServer.server_close(self)
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+
+
+def make_server(batcher, host='127.0.0.1', port=8000, unix_socket=None, request_timeout=None):
+    if unix_socket:
+        return ExtractionUnixServer(unix_socket, batcher, request_timeout=request_timeout)
+    return ExtractionHTTPServer((host, port), batcher, request_timeout=request_timeout)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Serve ExtractNet over HTTP with dynamic micro-batching')
+    parser.add_argument('--host', type=str, default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--unix-socket', type=str, default=None,
+        help='listen on this unix socket path instead of TCP')
+    parser.add_argument('--max-batch-size', type=int, default=16,
+        help='maximum number of pages per NewsNet run')
+    parser.add_argument('--max-wait-ms', type=float, default=10.0,
+        help='maximum time a request waits for the batch to fill up')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+        help='number of threads used for preprocessing and postprocessing')
+    parser.add_argument('--timeout', type=float, default=None,
+        help='per request timeout in seconds')
+    parser.add_argument('--model-dir', type=str, default=None,
+        help='load models from this directory instead of the packaged ones')
+    parser.add_argument('--model-variant', type=str, default='float32',
+        choices=['float32', 'int8', 'optimized'], help='NewsNet model variant')
+    parser.add_argument('--window-size', type=int, default=None,
+        help='split pages with more blocks into overlapping windows of this size')
+    parser.add_argument('--no-metadata', action='store_true',
+        help='skip metadata mining')
+    parser.add_argument('--no-warmup', action='store_true',
+        help='skip loading lazy dependencies before accepting requests')
+    parser.add_argument('--log-level', type=str, default='INFO')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=args.log_level.upper())
+    extractor = Extractor.from_pretrained(args.model_dir, model_variant=args.model_variant,
+        window_size=args.window_size)
+    if not args.no_warmup:
+        extractor.warmup()
+    batcher = MicroBatcher(extractor,
+        max_batch_size=args.max_batch_size,
+        max_wait_ms=args.max_wait_ms,
+        workers=args.workers,
+        metadata_mining=not args.no_metadata)
+    server = make_server(batcher, host=args.host, port=args.port,
+        unix_socket=args.unix_socket, request_timeout=args.timeout)
+
+    LOGGER.info('extractnet serving on %s', args.unix_socket or '{}:{}'.format(args.host, args.port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        batcher.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
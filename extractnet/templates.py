@@ -0,0 +1,251 @@
+'''
+    Per domain layout templates
+
+    Pages of a site share their layout, the id/class path PartialBlock
+    collects into block.css tells which blocks hold the content, byline or
+    date. A TemplateStore records, for every domain, the signature of the
+    blocks news_net picked with confidence. Once min_pages pages agree, new
+    pages of the domain are extracted by matching signatures alone : no
+    features, no onnx run.
+
+    A page is only extracted from the template when every block signature is
+    known and decisive and every ranked label matches a single block,
+    otherwise the model runs. One template extraction in verify_every also
+    runs the model, the domain is learned again if they disagree.
+
+    usage:
+        extractor = Extractor(templates=TemplateStore())
+        extractor.extract(html, url=url)
+'''
+import re
+import threading
+from collections import Counter, OrderedDict
+from urllib.parse import urlsplit
+
+import numpy as np
+from scipy.special import expit
+from sklearn.utils.extmath import softmax
+
+from .compat import str_cast
+from .util import fix_encoding
+
+DIGITS = re.compile(r'[0-9]+')
+
+# labels predicted for every block, the others are ranked and keep top blocks
+BINARY_LABELS = ('content', 'headline')
+
+
+def domain_of(url):
+    hostname = urlsplit(url).hostname or ''
+    if hostname.startswith('www.'):
+        hostname = hostname[4:]
+    return hostname
+
+
+def _css(css, key):
+    # blocks are str after blockify, bytes once featurized
+    value = css.get(key)
+    if value is None:
+        value = css.get(key.encode('utf-8'), b'')
+    return str_cast(value)
+
+
+def block_signature(block):
+    '''
+        Start tag and id/class path of a block, numbers are masked since
+        sites put article or ad ids in them
+    '''
+    features = block.features
+    start_tag = features.get('block_start_tag', features.get(b'block_start_tag', b''))
+    return '{}|{}|{}'.format(str_cast(start_tag),
+        DIGITS.sub('0', _css(block.css, 'id')), DIGITS.sub('0', _css(block.css, 'class')))
+
+
+class DomainTemplate():
+
+    def __init__(self):
+        self.pages = 0
+        # template extractions since the last verification
+        self.hits = 0
+        # label -> signature -> [positive, negative, uncertain] block counts
+        self.votes = { label: {} for label in BINARY_LABELS }
+        # label -> Counter of the signature of the top block, None when
+        # no block was above cls_threshold
+        self.winners = {}
+        # label -> signature -> last model probability of its top block
+        self.confidences = {}
+        self._decisions = None
+
+    def observe(self, signatures, probabilities, winners, confidences):
+        for label, probs in probabilities.items():
+            votes = self.votes[label]
+            for signature, vote in zip(signatures, probs):
+                votes.setdefault(signature, [0, 0, 0])[vote] += 1
+        for label, signature in winners.items():
+            self.winners.setdefault(label, Counter())[signature] += 1
+            if signature is not None:
+                self.confidences.setdefault(label, {})[signature] = confidences[label]
+        self.pages += 1
+        self._decisions = None
+
+    def decisions(self, min_agreement):
+        '''
+            label -> signature -> bool for binary labels, label -> (signature
+            or None, agreement) for ranked labels. Undecided signatures / labels
+            are left out
+        '''
+        if self._decisions is None:
+            decisions = {}
+            for label, votes in self.votes.items():
+                decided = {}
+                for signature, (pos, neg, uncertain) in votes.items():
+                    total = pos + neg + uncertain
+                    if pos >= min_agreement * total:
+                        decided[signature] = True
+                    elif neg >= min_agreement * total:
+                        decided[signature] = False
+                decisions[label] = decided
+            for label, counts in self.winners.items():
+                signature, count = counts.most_common(1)[0]
+                if count >= min_agreement * self.pages:
+                    decisions[label] = (signature, count / self.pages)
+            self._decisions = decisions
+        return self._decisions
+
+
+class TemplateStore():
+    '''
+        min_pages: pages of a domain extracted by the model before its template is used
+        min_agreement: share of observations a signature decision needs
+        verify_every: run the model on one template extraction in verify_every
+        margin: blocks with a binary probability within margin of the model
+            threshold are uncertain, they count against their signature
+        max_domains: least recently used domains are forgotten past this size
+    '''
+
+    def __init__(self, min_pages=20, min_agreement=0.95, verify_every=50,
+            margin=0.1, max_domains=10000):
+        self.min_pages = min_pages
+        self.min_agreement = min_agreement
+        self.verify_every = verify_every
+        self.margin = margin
+        self.max_domains = max_domains
+        self.domains = OrderedDict()
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.domains)
+
+    def signatures(self, blocks):
+        return [ block_signature(block) for block in blocks ]
+
+    def match(self, url, signatures, label_order):
+        '''
+            Assignment of blocks to labels for a page of url from its domain
+            template, None when the template can't decide. The second value
+            is True when this extraction should be verified with the model
+        '''
+        with self.lock:
+            template = self.domains.get(domain_of(url))
+            if template is None or template.pages < self.min_pages:
+                return None, False
+            self.domains.move_to_end(domain_of(url))
+            decisions = template.decisions(self.min_agreement)
+
+            assignment = {}
+            for label in label_order:
+                if label in BINARY_LABELS:
+                    decided = decisions[label]
+                    if not all(signature in decided for signature in signatures):
+                        return None, False
+                    assignment[label] = np.array([ decided[signature] for signature in signatures ], dtype=bool)
+                else:
+                    if label not in decisions:
+                        return None, False
+                    winner, _ = decisions[label]
+                    if winner is None:
+                        assignment[label] = None
+                        continue
+                    matches = [ idx for idx, signature in enumerate(signatures) if signature == winner ]
+                    if len(matches) != 1:
+                        return None, False
+                    assignment[label] = (matches[0], template.confidences[label][winner])
+
+            template.hits += 1
+            verify = template.hits >= self.verify_every
+            if verify:
+                template.hits = 0
+            return assignment, verify
+
+    def decode(self, assignment, blocks, label_order):
+        '''
+            Output in the format of NewsNet.decode_output
+        '''
+        output = {}
+        for label in label_order:
+            value = assignment[label]
+            if label in BINARY_LABELS:
+                ctx = fix_encoding(str_cast(b'\n'.join([ b.text for b in blocks[value] ])))
+                output[label] = ctx if len(ctx) > 0 else None
+            elif value is None:
+                output[label] = []
+            else:
+                # the confidence is the last probability the model gave this
+                # block, not the share of pages it won : a date must not clear
+                # the model date threshold on agreement alone
+                idx, confidence = value
+                output[label] = [ (fix_encoding(str_cast(blocks[idx].text)), confidence) ]
+        return output
+
+    def _assign(self, logits, label_order, binary_threshold, cls_threshold):
+        '''
+            Assignment of the model predictions as decoded by NewsNet, the top
+            block of ranked labels or None, the binary votes : 0 positive,
+            1 negative, 2 uncertain, and the probability of the top blocks
+        '''
+        assignment, votes, confidences = {}, {}, {}
+        for idx, label in enumerate(label_order):
+            if label in BINARY_LABELS:
+                probs = expit(logits[:, idx])
+                assignment[label] = probs > binary_threshold
+                votes[label] = np.where(np.abs(probs - binary_threshold) < self.margin, 2,
+                    np.where(assignment[label], 0, 1))
+            else:
+                scores = softmax([logits[:, idx]])[0]
+                best = int(np.argmax(scores))
+                assignment[label] = best if scores[best] > cls_threshold else None
+                confidences[label] = float(scores[best])
+        return assignment, votes, confidences
+
+    def observe(self, url, signatures, logits, label_order, binary_threshold, cls_threshold,
+            expected=None):
+        '''
+            Record the model predictions for a page of url. expected is the
+            template assignment of a verified page, the domain is forgotten
+            when the model disagrees with it
+        '''
+        assignment, votes, confidences = self._assign(logits, label_order, binary_threshold, cls_threshold)
+        domain = domain_of(url)
+        with self.lock:
+            if expected is not None and not self._agree(expected, assignment):
+                self.domains.pop(domain, None)
+                return False
+            template = self.domains.get(domain)
+            if template is None:
+                template = self.domains[domain] = DomainTemplate()
+            self.domains.move_to_end(domain)
+            winners = { label: None if value is None else signatures[value]
+                for label, value in assignment.items() if label not in BINARY_LABELS }
+            template.observe(signatures, votes, winners, confidences)
+            while len(self.domains) > self.max_domains:
+                self.domains.popitem(last=False)
+            return True
+
+    def _agree(self, expected, assignment):
+        for label, value in expected.items():
+            if label in BINARY_LABELS:
+                if np.mean(value == assignment[label]) < self.min_agreement:
+                    return False
+            elif (value[0] if value is not None else None) != assignment[label]:
+                return False
+        return True
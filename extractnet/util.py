@@ -8,10 +8,9 @@ the article.
 """
 from __future__ import division
 import os
+import datetime
+import numpy as np
 from sklearn.pipeline import FeatureUnion, make_union
-import ftfy
-import dateparser
-import regex # use by dateparser
 
 from .compat import range_, string_
 from .features import get_feature
@@ -175,6 +174,7 @@ def convert_segmentation_to_text(pred_label, text):
     return names
 
 def fix_encoding(text):
+    import ftfy
     if isinstance(text, str):
         text = ftfy.fix_text(ftfy.fix_encoding(text))
         if '\\u' in text:
@@ -219,6 +219,8 @@ def priority_merge(x, main):
 
 def attribute_sanity_check(content, **kwargs):
     if 'date' in content and isinstance(content['date'], str):
+        import dateparser
+        import regex # use by dateparser
         date = content['date']
         try:
             content['date'] = dateparser.parse(date)
@@ -233,4 +235,20 @@ def attribute_sanity_check(content, **kwargs):
         author_str = ','.join(content['author'])
         content['author'] = author_str
 
-    return content
\ No newline at end of file
+    return content
+
+
+def json_default(obj):
+    '''
+        `default` hook for json.dump(s) : serialize datetime and numpy values
+        found in extraction results
+    '''
+    if isinstance(obj, (datetime.datetime, datetime.date)):
+        return obj.isoformat()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, (set, tuple)):
+        return list(obj)
+    raise TypeError('Object of type {} is not JSON serializable'.format(type(obj).__name__))
@@ -0,0 +1,53 @@
+'''
+    Measure cold start : import time, model loading and first extraction,
+    each in a fresh interpreter
+
+    usage:
+        python scripts/benchmark_import.py [--repeat 5]
+'''
+import argparse
+import statistics
+import subprocess
+import sys
+
+STAGES = [
+    ('import extractnet', 'import extractnet'),
+    ('import Extractor', 'from extractnet import Extractor'),
+    ('Extractor()', 'from extractnet import Extractor; Extractor()'),
+    ('first extract', 'from extractnet import Extractor; Extractor().extract(HTML)'),
+]
+
+HTML = '<html><head><title>title</title></head><body><article><h1>headline</h1>' \
+    '<p>By John Doe</p><p>' + 'some content text. ' * 50 + '</p></article></body></html>'
+
+TEMPLATE = '''
+import time
+HTML = {html!r}
+started = time.perf_counter()
+{statement}
+print(time.perf_counter() - started)
+'''
+
+
+def measure(statement, repeat):
+    timings = []
+    for _ in range(repeat):
+        output = subprocess.check_output([sys.executable, '-c',
+            TEMPLATE.format(html=HTML, statement=statement)])
+        timings.append(float(output.decode('utf-8').strip().splitlines()[-1]))
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark extractnet startup time')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print('{:<20}{:>10}{:>10}'.format('stage', 'median', 'min'))
+    for name, statement in STAGES:
+        timings = measure(statement, args.repeat)
+        print('{:<20}{:>9.3f}s{:>9.3f}s'.format(name, statistics.median(timings), min(timings)))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,79 @@
+'''
+    Measure the per page cost of the metadata XPath expressions, evaluated
+    from their strings with tree.xpath as before, and with the XPath objects
+    compiled at import in metaxpaths. Results of both are checked to be equal
+
+    usage:
+        python scripts/benchmark_xpath.py [--repeat 20] [page.html ...]
+'''
+import argparse
+import glob
+import io
+import os
+import sys
+import time
+
+from extractnet.metadata_extraction import metaxpaths
+from extractnet.metadata_extraction.utils import load_html
+
+INLINE = [
+    (metaxpaths.JSON_LD_XPATH, {}),
+    (metaxpaths.H1_XPATH, {}),
+    (metaxpaths.H2_XPATH, {}),
+    (metaxpaths.FOOTER_LINK_XPATH, {}),
+]
+
+COMPILED = metaxpaths.AUTHOR_XPATHS + metaxpaths.CATEGORIES_XPATHS + metaxpaths.TAGS_XPATHS \
+    + metaxpaths.TITLE_XPATHS + [ xpath for xpath, _ in INLINE ]
+STRINGS = [ (xpath.path, {}) for xpath in COMPILED[:-len(INLINE)] ] \
+    + [ (xpath.path, namespaces) for xpath, namespaces in INLINE ]
+
+
+def from_strings(tree):
+    return [ tree.xpath(path, namespaces=namespaces) for path, namespaces in STRINGS ]
+
+
+def from_compiled(tree):
+    return [ xpath(tree) for xpath in COMPILED ]
+
+
+def measure(function, trees, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for tree in trees:
+            function(tree)
+    return (time.perf_counter() - started) / (repeat * len(trees)) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the metadata XPath expressions')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('pages', nargs='*',
+        default=sorted(glob.glob(os.path.join('test', 'datafiles', '*.html'))))
+    args = parser.parse_args()
+
+    trees = []
+    for path in args.pages:
+        with io.open(path, 'r', encoding='utf-8', errors='ignore') as f:
+            tree = load_html(f.read())
+        if tree is not None:
+            trees.append(tree)
+    if len(trees) == 0:
+        print('no pages to parse')
+        return 1
+
+    for tree in trees:
+        if from_strings(tree) != from_compiled(tree):
+            print('compiled expressions disagree with their strings')
+            return 1
+
+    strings_ms = measure(from_strings, trees, args.repeat)
+    compiled_ms = measure(from_compiled, trees, args.repeat)
+    print('{} pages, {} expressions'.format(len(trees), len(COMPILED)))
+    print('{:<10}{:>12}'.format('strings', '{:.3f} ms'.format(strings_ms)))
+    print('{:<10}{:>12}'.format('compiled', '{:.3f} ms'.format(compiled_ms)))
+    print('saved {:.3f} ms / page ({:.0%})'.format(strings_ms - compiled_ms, 1 - compiled_ms / strings_ms))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
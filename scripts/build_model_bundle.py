@@ -0,0 +1,36 @@
+'''
+    Convert the pickled author models into the bundle loaded at startup
+
+    usage:
+        python scripts/build_model_bundle.py [--model-dir extractnet/models]
+            [--crf test/datafiles/crf.crfsuite]
+'''
+import argparse
+import os
+import sys
+
+from extractnet.model_bundle import build_bundle
+from extractnet.util import get_module_res
+
+CRF_SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'test', 'datafiles', 'crf.crfsuite')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build extractnet model bundle from joblib files')
+    parser.add_argument('--model-dir', type=str, default=get_module_res('models'),
+        help='directory containing char_embedding.joblib')
+    parser.add_argument('--crf', type=str, default=CRF_SOURCE,
+        help='crfsuite model file or joblib pickled sklearn_crfsuite.CRF of the author tagger')
+    parser.add_argument('--output-dir', type=str, default=None,
+        help='where to write the bundle (default: model dir)')
+    args = parser.parse_args()
+
+    output_dir = args.output_dir or args.model_dir
+    os.makedirs(output_dir, exist_ok=True)
+    paths = build_bundle(os.path.join(args.model_dir, 'char_embedding.joblib'), args.crf, output_dir)
+    for path in paths:
+        print('{}\t{} bytes'.format(path, os.path.getsize(path)))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,74 @@
+'''
+    Build the NewsNet model variants loaded by NewsNet(model_variant=...)
+    from the float32 model
+
+        int8        dynamic quantization of the MatMul weights, activations are
+                    quantized at runtime. The model is converted to opset 13
+                    first, opset 10 has no DynamicQuantizeLinear
+        optimized   onnxruntime extended graph optimizations (constant folding,
+                    node fusions) applied offline and saved
+
+    usage:
+        python scripts/build_model_variants.py [--model-dir extractnet/models] [--variant int8]
+
+    requires the onnx package on top of onnxruntime
+'''
+import argparse
+import os
+import sys
+import tempfile
+
+# run from a checkout : python scripts/build_model_variants.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from extractnet.nn_models import NewsNet
+from extractnet.util import get_module_res
+
+QUANTIZATION_OPSET = 13
+
+
+def build_int8(source, target):
+    import onnx
+    from onnx import version_converter
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    model = onnx.load(source)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        upgraded = os.path.join(tmp_dir, 'news_net.opset{}.onnx'.format(QUANTIZATION_OPSET))
+        onnx.save(version_converter.convert_version(model, QUANTIZATION_OPSET), upgraded)
+        quantize_dynamic(upgraded, target, weight_type=QuantType.QInt8)
+
+
+def build_optimized(source, target):
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    # ORT_ENABLE_ALL adds layout optimizations specific to the build machine
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED
+    options.optimized_model_filepath = target
+    ort.InferenceSession(source, options, providers=['CPUExecutionProvider'])
+
+
+BUILDERS = {
+    'int8': build_int8,
+    'optimized': build_optimized,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build quantized and optimized NewsNet variants')
+    parser.add_argument('--model-dir', type=str, default=get_module_res('models'),
+        help='directory containing news_net.onnx, variants are written next to it')
+    parser.add_argument('--variant', type=str, action='append', choices=sorted(BUILDERS),
+        help='variant to build (default: all)')
+    args = parser.parse_args()
+
+    source = os.path.join(args.model_dir, NewsNet.model_variants['float32'])
+    for variant in args.variant or sorted(BUILDERS):
+        target = os.path.join(args.model_dir, NewsNet.model_variants[variant])
+        BUILDERS[variant](source, target)
+        print('{}\t{}\t{} bytes'.format(variant, target, os.path.getsize(target)))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
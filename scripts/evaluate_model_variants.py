@@ -0,0 +1,129 @@
+'''
+    Compare NewsNet model variants against the float32 model : content F1 on
+    a labeled corpus and model latency
+
+    The corpus uses the dragnet layout, HTML/<name>.html with the gold content
+    in Corrected/<name>.html.corrected.txt (text before the comments separator),
+    or a JSON lines file of {"html": ..., "content": ...} records. Documents
+    without gold content are skipped, the script fails when the float32 model
+    scores 0 F1 on the corpus : its labels can't tell the variants apart (the
+    pages in test/datafiles are not a labeled news corpus)
+
+    usage:
+        python scripts/evaluate_model_variants.py --data-dir dragnet_data [--repeat 20]
+        python scripts/evaluate_model_variants.py --jsonl labeled_pages.jsonl
+'''
+import argparse
+import glob
+import io
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+# run from a checkout : python scripts/evaluate_model_variants.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from extractnet.blocks import simple_tokenizer
+from extractnet.nn_models import NewsNet
+from extractnet.util import evaluation_metrics
+
+COMMENTS_SEPARATOR = '!@#$%^&*()  COMMENTS'
+
+
+def load_corpus(data_dir):
+    corpus = []
+    for html_path in sorted(glob.glob(os.path.join(data_dir, 'HTML', '*.html'))):
+        name = os.path.basename(html_path)
+        gold_path = os.path.join(data_dir, 'Corrected', name + '.corrected.txt')
+        if not os.path.exists(gold_path):
+            continue
+        with io.open(html_path, 'r', encoding='utf-8', errors='ignore') as f:
+            html = f.read()
+        with io.open(gold_path, 'r', encoding='utf-8', errors='ignore') as f:
+            gold = f.read().split(COMMENTS_SEPARATOR)[0]
+        if gold.strip():
+            corpus.append((name, html, gold))
+    return corpus
+
+
+def load_jsonl_corpus(path):
+    corpus = []
+    with io.open(path, 'r', encoding='utf-8') as f:
+        for idx, line in enumerate(f):
+            if line.strip():
+                record = json.loads(line)
+                if (record.get('content') or '').strip():
+                    corpus.append((record.get('url', str(idx)), record['html'], record['content']))
+    return corpus
+
+
+def content_f1(model, logits, blocks, corpus):
+    scores = []
+    for output, (_, _, gold) in zip(model.decode_output(logits, blocks), corpus):
+        predicted = simple_tokenizer(output['content'] or '')
+        scores.append(evaluation_metrics(predicted, simple_tokenizer(gold))[2])
+    return float(np.mean(scores))
+
+
+def time_inference(model, features, repeat):
+    model.inference(features)
+    started = time.perf_counter()
+    for _ in range(repeat):
+        model.inference(features)
+    return (time.perf_counter() - started) / repeat / len(features)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Evaluate NewsNet model variants')
+    corpus_source = parser.add_mutually_exclusive_group(required=True)
+    corpus_source.add_argument('--data-dir', type=str, default=None,
+        help='labeled corpus in the dragnet layout (HTML/ and Corrected/)')
+    corpus_source.add_argument('--jsonl', type=str, default=None,
+        help='labeled JSON lines corpus')
+    parser.add_argument('--variant', type=str, action='append', choices=sorted(NewsNet.model_variants),
+        help='variant to evaluate (default: all available)')
+    parser.add_argument('--repeat', type=int, default=20,
+        help='number of timed inference runs over the corpus')
+    args = parser.parse_args()
+
+    source = args.jsonl or args.data_dir
+    corpus = load_jsonl_corpus(args.jsonl) if args.jsonl else load_corpus(args.data_dir)
+    if len(corpus) == 0:
+        print('error: no documents with gold content found in {}'.format(source), file=sys.stderr)
+        return 1
+
+    baseline = NewsNet()
+    features, blocks = zip(*[ baseline.preprocess(html) for _, html, _ in corpus ])
+    features, blocks = list(features), list(blocks)
+    baseline_logits = baseline.inference(features)
+    baseline_f1 = content_f1(baseline, baseline_logits, blocks, corpus)
+    if baseline_f1 == 0.0:
+        print('error: float32 scores 0 F1 on the {} documents of {}, their gold content is not '
+            'usable to compare variants'.format(len(corpus), source), file=sys.stderr)
+        return 1
+    baseline_latency = time_inference(baseline, features, args.repeat)
+
+    print('{} documents from {}'.format(len(corpus), source))
+    print('{:<12}{:>8}{:>10}{:>14}{:>14}{:>10}{:>10}'.format(
+        'variant', 'F1', 'delta F1', 'max |dlogit|', 'ms / doc', 'speedup', 'agree'))
+    for variant in args.variant or list(NewsNet.model_variants):
+        try:
+            model = baseline if variant == 'float32' else NewsNet(model_variant=variant)
+        except FileNotFoundError as err:
+            print('{:<12}skipped: {}'.format(variant, err))
+            continue
+        logits = model.inference(features)
+        f1 = content_f1(model, logits, blocks, corpus)
+        latency = baseline_latency if model is baseline else time_inference(model, features, args.repeat)
+        max_diff = max(float(np.abs(a - b).max()) for a, b in zip(logits, baseline_logits))
+        # share of blocks whose content decision is unchanged
+        agree = np.mean(np.concatenate([ (a[:, 0] > 0) == (b[:, 0] > 0) for a, b in zip(logits, baseline_logits) ]))
+        print('{:<12}{:>8.4f}{:>+10.4f}{:>14.4f}{:>14.3f}{:>9.2f}x{:>10.3f}'.format(
+            variant, f1, f1 - baseline_f1, max_diff, latency * 1000, baseline_latency / latency, agree))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,100 @@
+'''
+    Evaluate the article pre-filter on labeled pages
+
+    Pages come from a JSON lines file of {"html": ..., "is_article": true/false}
+    records, or from two directories of .html files, one of articles and one of
+    other pages. For each threshold the report gives the share of pages
+    rejected, how many of them were really not articles and how many articles
+    were lost, along with the time spent in the pre-filter and in a full
+    extraction
+
+    usage:
+        python scripts/evaluate_prefilter.py --jsonl labeled_pages.jsonl
+        python scripts/evaluate_prefilter.py --articles crawl/articles --others crawl/listings
+'''
+import argparse
+import glob
+import io
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from extractnet.prefilter import page_signals, article_score
+
+THRESHOLDS = (0.01, 0.02, 0.05, 0.1, 0.2, 0.3, 0.5)
+
+
+def load_jsonl(path):
+    pages = []
+    with io.open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                pages.append((record['html'], bool(record['is_article'])))
+    return pages
+
+
+def load_directory(path, is_article):
+    pages = []
+    for html_path in sorted(glob.glob(os.path.join(path, '**', '*.htm*'), recursive=True)):
+        with io.open(html_path, 'r', encoding='utf-8', errors='ignore') as f:
+            pages.append((f.read(), is_article))
+    return pages
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Evaluate the article pre-filter')
+    parser.add_argument('--jsonl', type=str, default=None)
+    parser.add_argument('--articles', type=str, default=None, help='directory of article pages')
+    parser.add_argument('--others', type=str, default=None, help='directory of non article pages')
+    parser.add_argument('--threshold', type=float, action='append',
+        help='threshold to report (default: {})'.format(', '.join(map(str, THRESHOLDS))))
+    parser.add_argument('--timing-sample', type=int, default=20,
+        help='number of pages run through the full extractor to compare timings, 0 to skip')
+    args = parser.parse_args()
+
+    pages = []
+    if args.jsonl:
+        pages += load_jsonl(args.jsonl)
+    if args.articles:
+        pages += load_directory(args.articles, True)
+    if args.others:
+        pages += load_directory(args.others, False)
+    if len(pages) == 0:
+        print('no labeled pages, pass --jsonl or --articles / --others')
+        return 1
+
+    started = time.perf_counter()
+    scores = np.array([ article_score(page_signals(html)) for html, _ in pages ])
+    prefilter_ms = (time.perf_counter() - started) / len(pages) * 1000
+    labels = np.array([ is_article for _, is_article in pages ])
+
+    print('{} pages, {} articles, {} others'.format(len(pages), labels.sum(), (~labels).sum()))
+    print('{:>10}{:>10}{:>12}{:>16}{:>16}'.format(
+        'threshold', 'rejected', 'precision', 'others caught', 'articles lost'))
+    for threshold in args.threshold or THRESHOLDS:
+        rejected = scores < threshold
+        # precision : share of rejected pages which are not articles
+        precision = (~labels[rejected]).mean() if rejected.any() else float('nan')
+        caught = rejected[~labels].mean() if (~labels).any() else float('nan')
+        lost = rejected[labels].mean() if labels.any() else float('nan')
+        print('{:>10.2f}{:>10.3f}{:>12.3f}{:>16.3f}{:>16.3f}'.format(
+            threshold, rejected.mean(), precision, caught, lost))
+
+    print('pre-filter: {:.2f} ms / page'.format(prefilter_ms))
+    if args.timing_sample > 0:
+        from extractnet import Extractor
+        extractor = Extractor()
+        sample = [ html for html, _ in pages[:args.timing_sample] ]
+        extractor.extract(sample[0])
+        started = time.perf_counter()
+        for html in sample:
+            extractor.extract(html)
+        print('full extraction: {:.2f} ms / page'.format((time.perf_counter() - started) / len(sample) * 1000))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
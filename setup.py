@@ -52,6 +52,10 @@ ext_modules = [
               sources=["extractnet/lcs.pyx"],
               include_dirs=[get_include()],
               language="c++"),
+    Extension('extractnet._crf',
+              sources=["extractnet/_crf.pyx"],
+              include_dirs=[get_include()],
+              language="c++"),
     Extension('extractnet.blocks',
               sources=["extractnet/blocks.pyx"],
               include_dirs=(lxml.get_include() + find_libxml2_include()),
@@ -121,6 +125,9 @@ setup(
         'extractnet.features': 'extractnet/features',
         'extractnet.sequence_tagger': 'extractnet/sequence_tagger' },
     package_data={'extractnet': ['pickled_models/*/*', 'models/*', '*', 'features/*']},
+    entry_points={
+        'console_scripts': ['extractnet=extractnet.cli:main'],
+    },
     cmdclass={'build_ext': build_ext},
     ext_modules=cythonize(ext_modules),
     setup_requires = [
@@ -141,5 +148,8 @@ setup(
         'dateparser>=1.1.0',
         'joblib>=1.1.0',
         'htmldate==0.7.2'
-    ]
+    ],
+    extras_require={
+        'json': ['orjson>=3.0.0'],
+    }
 )
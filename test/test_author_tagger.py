@@ -1,3 +1,5 @@
+import os
+
 from extractnet.name_crf import AuthorExtraction
 
 extract = AuthorExtraction()
@@ -29,3 +31,47 @@ def test_author_extraction_other_case():
     for text, labels in examples:
         preds = extract(text)
         assert preds == labels
+
+CRF_MODEL = os.path.join('test', 'datafiles', 'crf.crfsuite')
+
+def test_bundle_matches_legacy_models():
+    from extractnet.util import get_module_res
+    legacy = AuthorExtraction(get_module_res('models/char_embedding.joblib'), CRF_MODEL)
+    for text in ['By BASSEM MROUE, SARAH EL DEEB and ZEINA KARAM', '撰文／莊正賢', 'Galen Emanuele | Shift Yes']:
+        assert extract(text) == legacy(text)
+
+def test_char_embedding_is_memory_mapped():
+    import joblib
+    import numpy as np
+    from extractnet.util import get_module_res
+    embedding = extract.author_embedding
+    assert isinstance(embedding.matrix, np.memmap)
+    assert not embedding.matrix.flags.writeable
+    legacy = joblib.load(get_module_res('models/char_embedding.joblib'))
+    text = 'By 陳孟朔 ☃'
+    expected = [ legacy[c] if c in legacy else legacy['UNK'] for c in text ]
+    np.testing.assert_allclose(embedding.rows(text), expected, rtol=1e-6, atol=1e-7)
+
+def test_viterbi_crf_matches_crfsuite(tmpdir):
+    import random
+    from extractnet.model_bundle import CRFTagger, ViterbiCRF
+    from extractnet.sequence_tagger.models import sent2features
+    crfsuite = CRFTagger(CRF_MODEL)
+    decoder = extract.author_tagger
+    assert isinstance(decoder, ViterbiCRF)
+
+    random.seed(0)
+    alphabet = list('ByAndCEKMRSZaeiklnorstu  ,.|()/-') + list('撰文／莊正賢記者報導【】（）台北')
+    texts = ['', 'a', 'By BASSEM MROUE, SARAH EL DEEB and ZEINA KARAM', '聯合報 / 記者潘乃欣／台北即時報導']
+    texts += [ ''.join(random.choice(alphabet) for _ in range(random.randint(1, 40))) for _ in range(300) ]
+    X = [ sent2features(text, extract.author_embedding) for text in texts ]
+    expected = crfsuite.predict(X)
+    assert decoder.predict(X) == expected
+    assert [ decoder.predict_single(xseq) for xseq in X[:20] ] == expected[:20]
+
+    path = str(tmpdir.join('crf.npz'))
+    ViterbiCRF.from_crfsuite(CRF_MODEL).save(path)
+    assert ViterbiCRF.load(path).predict(X[:50]) == expected[:50]
+
+    texts = ['By BASSEM MROUE, SARAH EL DEEB and ZEINA KARAM', '撰文／莊正賢']
+    assert extract(texts) == [ extract(text) for text in texts ]
@@ -0,0 +1,70 @@
+import pytest
+
+from extractnet import caches
+from extractnet.caches import SizedCache, memoize
+
+
+def test_sized_cache_evicts_by_bytes():
+    cache = SizedCache('test.bytes', max_bytes=1000, sizeof=lambda key, value: len(value))
+    cache.put('a', 'x' * 400)
+    cache.put('b', 'x' * 400)
+    assert cache.get('a') is not None
+    cache.put('c', 'x' * 400)
+    # b is the least recently used
+    assert 'b' not in cache
+    assert 'a' in cache and 'c' in cache
+    assert cache.stats()['bytes'] == 800
+
+    # larger than the whole cache, not kept
+    cache.put('d', 'x' * 2000)
+    assert 'd' not in cache
+    assert len(cache) == 2
+
+
+def test_sized_cache_stats_and_registry():
+    cache = SizedCache('test.stats', max_entries=2)
+    cache.put(1, 'one')
+    assert cache.get(1) == 'one'
+    assert cache.get(2) is None
+    stats = caches.stats()['test.stats']
+    assert stats['hits'] == 1 and stats['misses'] == 1
+    assert stats['hit_rate'] == 0.5
+
+    other = SizedCache('test.stats')
+    assert other.name == 'test.stats-2'
+    assert caches.get('test.stats-2') is other
+
+    caches.configure('test.stats', max_entries=0)
+    assert len(cache) == 0
+    with pytest.raises(KeyError):
+        caches.configure('test.missing', max_bytes=1)
+
+    report = caches.report()
+    assert 'test.stats' in report['caches']
+    assert report['bytes'] >= 0
+
+
+def test_memoize():
+    calls = []
+
+    @memoize('test.memoize', max_bytes=1 << 16)
+    def double(value):
+        calls.append(value)
+        return value * 2
+
+    assert double(2) == 4
+    assert double(2) == 4
+    assert calls == [2]
+    assert double.cache.stats()['hits'] == 1
+
+    caches.clear('test.memoize')
+    assert double(2) == 4
+    assert calls == [2, 2]
+
+
+def test_metadata_caches_registered():
+    from extractnet.metadata_extraction.utils import trim
+    assert trim(' a  b ') == 'a b'
+    assert 'metadata.trim' in caches.names()
+    assert 'metadata.line_processing' not in caches.names()
+    assert trim.cache.stats()['bytes'] <= 1 << 20
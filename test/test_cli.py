@@ -0,0 +1,39 @@
+import io
+import json
+import os
+import shutil
+
+from extractnet.cli import iter_inputs, main
+
+FIXTURES = os.path.join('test', 'datafiles')
+
+
+def test_iter_inputs(tmpdir):
+    nested = tmpdir.mkdir('nested')
+    shutil.copy(os.path.join(FIXTURES, 'models_testing.html'), str(nested.join('a.html')))
+    shutil.copy(os.path.join(FIXTURES, 'models_testing.html'), str(tmpdir.join('b.htm')))
+    tmpdir.join('notes.txt').write('not html')
+
+    inputs = list(iter_inputs([str(tmpdir), str(tmpdir.join('*.htm'))]))
+    assert inputs == sorted(inputs)
+    assert len(inputs) == 2
+    assert all(not path.endswith('.txt') for path in inputs)
+
+
+def test_extract_resume(tmpdir):
+    html_file = os.path.join(FIXTURES, 'models_testing.html')
+    output = str(tmpdir.join('results.jsonl'))
+    checkpoint = str(tmpdir.join('checkpoint'))
+
+    args = ['extract', html_file, '-o', output, '--checkpoint', checkpoint, '--no-metadata', '-q']
+    assert main(args) == 0
+    with io.open(output) as f:
+        records = [json.loads(line) for line in f]
+    assert len(records) == 1
+    assert records[0]['source'] == html_file
+    assert 'content' in records[0]
+
+    # already in checkpoint : nothing to do
+    assert main(args) == 0
+    with io.open(output) as f:
+        assert len(f.readlines()) == 1
@@ -1,5 +1,6 @@
 import io
 import os
+from datetime import datetime
 
 import numpy as np
 import pytest
@@ -31,3 +32,95 @@ def test_extractor_w_meta(tag_html):
     results = extractor(tag_html, metadata_mining=True)
     assert 'content' in results
     assert 'og_properties' in results
+
+def test_extractor_skips_overridden_outputs(html, monkeypatch):
+    calls = []
+    def tagger(text):
+        calls.append(text)
+        return ['Model Author']
+    def parse_date(date_text, parsed_dates=None):
+        calls.append(date_text)
+        return datetime(2021, 3, 4)
+    monkeypatch.setattr(Extractor, 'parse_date', staticmethod(parse_date))
+
+    output = {'content': 'text', 'headline': None, 'breadcrumbs': [],
+        'author': [('By Model Author', 0.9)], 'date': [('March 4, 2021', 0.8)]}
+    meta = {'author': 'Meta Author', 'date': '2021-03-04'}
+    results = Extractor(author_extractor=tagger).postprocess(html, output, meta)
+    assert results['author'] == 'Meta Author'
+    assert results['rawAuthor'] == 'By Model Author'
+    assert results['date'].day == 4
+    assert results['rawDate'] == 'March 4, 2021'
+    assert results['dateConfidence'] == 0.8
+    assert calls == []
+
+    results = Extractor(author_extractor=tagger, raw_candidates=True).postprocess(html, output, meta)
+    assert results['author'] == 'Meta Author'
+    assert results['rawDate'] == 'March 4, 2021'
+    assert results['candidates']['author'] == [('By Model Author', 0.9)]
+    assert calls == ['By Model Author', 'March 4, 2021']
+
+    results = Extractor(author_extractor=tagger).postprocess(html, output, {})
+    assert results['author'] == 'Model Author'
+    assert results['date'].day == 4
+
+
+def test_extractor_callbacks(html):
+    import time
+    from extractnet.callbacks import callback
+
+    def meta_plain(raw_html):
+        return {'first_value': 0, 'plain_html': isinstance(raw_html, str)}
+
+    @callback(document=True)
+    def meta_document(document):
+        return {'first_value': 1, 'lang': document.tree.get('lang')}
+
+    @callback(document=True, concurrent=True)
+    def count_blocks(document, results):
+        time.sleep(0.2)
+        return {'n_blocks': len(document.blocks), 'order': 'first'}
+
+    @callback(concurrent=True)
+    def slow(raw_html, results):
+        time.sleep(0.2)
+        return {'order': 'second', 'saw_blocks': 'n_blocks' in results}
+
+    @callback(concurrent=True, timeout=0.05)
+    def late(raw_html, results):
+        time.sleep(1.0)
+        return {'late': True}
+
+    @callback(concurrent=True)
+    def broken(raw_html, results):
+        raise ValueError('broken callback')
+
+    extractor = Extractor(meta_postprocess=[meta_plain, meta_document],
+        postprocess=[count_blocks, broken, slow, late])
+    results = extractor(html)
+    assert results['first_value'] == 0
+    assert results['plain_html'] is True
+    assert 'lang' in results
+    assert results['n_blocks'] > 0
+    # earlier callbacks win, concurrent ones don't see each other
+    assert results['order'] == 'first'
+    assert results['saw_blocks'] is False
+    assert 'late' not in results
+
+    stats = extractor.callbacks.stats.snapshot()
+    assert stats['late']['timeouts'] == 1
+    # still sleeping on its worker
+    assert stats['late']['abandoned'] == 1
+    assert stats['broken']['errors'] == 1
+    assert stats['count_blocks']['calls'] == 1
+    assert stats['slow']['total_ms'] >= 200
+
+    # the two 0.2s callbacks run at the same time
+    started = time.perf_counter()
+    extractor.callbacks.run([count_blocks, slow], html, extractor.page_of(html), {})
+    assert time.perf_counter() - started < 0.35
+
+    deadline = time.perf_counter() + 2.0
+    while extractor.callbacks.stats.snapshot()['late']['abandoned'] and time.perf_counter() < deadline:
+        time.sleep(0.05)
+    assert extractor.callbacks.stats.snapshot()['late']['abandoned'] == 0
@@ -0,0 +1,69 @@
+import io
+import os
+
+import numpy as np
+import pytest
+
+from extractnet.incremental import BlockCache, align, reusable_blocks
+from extractnet.nn_models import NewsNet
+
+FIXTURES = os.path.join('test', 'datafiles')
+
+
+@pytest.fixture(scope='module')
+def model():
+    return NewsNet()
+
+
+@pytest.fixture(scope='module')
+def html():
+    with io.open(os.path.join(FIXTURES, 'models_testing.html'), 'r') as f:
+        return f.read()
+
+
+def test_align():
+    old = ['a', 'b', 'c', 'd', 'e', 'f']
+    new = ['a', 'b', 'x', 'd', 'f', 'g']
+    assert align(old, new).tolist() == [0, 1, -1, 3, 5, -1]
+    assert align(old, old).tolist() == list(range(6))
+    assert align([], new).tolist() == [-1] * 6
+
+
+def test_reusable_blocks():
+    mapping = np.array([0, 1, 2, -1, 4, 5, 6, 7, 8, 9])
+    reusable = reusable_blocks(mapping, 10, context=2)
+    assert reusable.tolist() == [True, False, False, False, False, False, True, True, True, True]
+    # the old page was longer : blocks near the end lost neighbours
+    assert not reusable_blocks(np.arange(5), 6, context=2)[-1]
+
+
+def test_unchanged_page_reuses_logits(model, html, monkeypatch):
+    cache = BlockCache()
+    expected = model.predict(html, cache=cache, urls='http://example.com/a')
+    assert len(cache) == 1
+
+    def fail(features):
+        raise AssertionError('unchanged page should not run the model')
+    monkeypatch.setattr(model, 'inference', fail)
+    assert model.predict(html, cache=cache, urls='http://example.com/a') == expected
+
+
+def test_changed_page_features(model, html):
+    cache = BlockCache()
+    model.predict(html, cache=cache, urls='http://example.com/a')
+    updated = html.replace('</body>', '<div class="update"><p>Update: a paragraph added later.</p></div></body>')
+    output = model.predict(updated, cache=cache, urls='http://example.com/a')
+
+    features, _ = model.preprocess(updated)
+    assert np.array_equal(cache.get('http://example.com/a').features, features)
+    assert output == model.predict(updated)
+
+
+def test_block_cache_lru():
+    cache = BlockCache(max_pages=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.get('a')
+    cache.put('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
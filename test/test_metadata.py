@@ -46,3 +46,174 @@ def test_date_validate_from_url():
         fixed_date = validate_date(url, default_date)
         assert fixed_date.date() == target_date.date()
 
+
+
+def test_compiled_xpaths():
+    from extractnet.metadata_extraction.metadata import extract_author, extract_title
+    from extractnet.metadata_extraction.utils import load_html
+
+    tree = load_html('<html><head><title>Page title</title></head><body>'
+        '<h1 class="entry-title">Headline</h1><h1>Other</h1>'
+        '<p>〔記者王小明／台北報導〕 新聞內容</p></body></html>')
+    assert extract_title(tree) == 'Headline'
+    assert extract_author(tree) == '〔記者王小明／台北報導〕'
+
+
+def test_head_index():
+    from extractnet.metadata_extraction.head import HeadIndex
+    from extractnet.metadata_extraction.utils import load_html
+
+    with open(os.path.join(FIXTURES, 'models_testing.html'), 'r') as f:
+        tree = load_html(f.read())
+    head = HeadIndex(tree)
+    assert head.metas == tree.xpath('.//head//meta[@content]')
+    assert head.child_metas == tree.xpath('.//head/meta[@content]')
+    assert head.opengraph == tree.xpath('.//head/meta[starts-with(@property, "og:")]')
+    assert head.title == tree.find('.//head/title')
+    for rel, links in head.links.items():
+        assert links == [ link for link in tree.iterfind('.//head//link') if link.get('rel') == rel ]
+    assert len(head.opengraph) > 0
+
+
+def test_text_author_priority():
+    from extractnet.metadata_extraction.metadata import extract_text_author
+    from extractnet.metadata_extraction.utils import load_html
+
+    # pattern order wins over document order
+    tree = load_html('<html><body><p>【週末專欄】</p><p>記者李四／台北報導〕</p></body></html>')
+    assert extract_text_author(tree) == '記者李四／台北報導〕'
+    # the element matching first has no text of its own, the pattern is skipped
+    tree = load_html('<html><body><div><b>x</b>記者李四／台北報導〕</div><p>【週末專欄】</p></body></html>')
+    assert extract_text_author(tree) == '【週末專欄】'
+    assert extract_text_author(load_html('<html><body><p>no byline</p></body></html>')) is None
+
+
+def test_json_ld_parse_error():
+    from extractnet.metadata_extraction.json_ld import extract_json_author
+    from extractnet.metadata_extraction.constant import JSON_AUTHOR_3
+
+    assert extract_json_author('"author": "Jane Doe", "author": "John Smith", "author": "x"',
+        JSON_AUTHOR_3) == 'Jane Doe; John Smith'
+    # a trailing comma breaks json.loads, the regex fallback still reads the page
+    results = extract_metadata('<html><head><script type="application/ld+json">'
+        '{"@context": "https://schema.org", "@type": "NewsArticle", "author": "Jane Doe",'
+        ' "articleSection": "Science",}</script></head><body><p>text</p></body></html>')
+    assert results['author'] == 'Jane Doe'
+    assert results['categories'] == ['Science']
+
+
+def test_resolve_date(monkeypatch):
+    from datetime import datetime
+    import htmldate
+    from extractnet.metadata_extraction.dates import resolve_date
+    from extractnet.metadata_extraction.utils import load_html
+
+    page = '<html><head>{}</head><body><p>March 4, 2021</p></body></html>'
+    meta = '<meta property="article:published_time" content="2021-03-04T05:06:07Z">'
+    url = 'https://example.com/2021/03/04/story'
+    assert resolve_date(load_html(page.format(meta)), url) == ('2021-03-04', 'meta')
+    assert resolve_date(load_html(page.format('')), url) == ('2021-03-04', 'url')
+    candidates = [(datetime(2021, 3, 4, 10), 0.95)]
+    assert resolve_date(load_html(page.format('')), date_candidates=candidates) == ('2021-03-04', 'model')
+
+    # text candidates are only parsed when the meta elements and url have no date
+    parsed = []
+    def parse_date(text):
+        parsed.append(text)
+        return datetime(2021, 3, 4)
+    candidates = [('March 4, 2021', 0.95)]
+    assert resolve_date(load_html(page.format(meta)), url, date_candidates=candidates,
+        parse_date=parse_date) == ('2021-03-04', 'meta')
+    assert resolve_date(load_html(page.format('')), url, date_candidates=candidates,
+        parse_date=parse_date) == ('2021-03-04', 'url')
+    assert parsed == []
+    assert resolve_date(load_html(page.format('')), date_candidates=candidates,
+        parse_date=parse_date) == ('2021-03-04', 'model')
+    assert parsed == ['March 4, 2021']
+
+    calls = []
+    def find_date(tree, **kwargs):
+        calls.append(kwargs['extensive_search'])
+        return None
+    monkeypatch.setattr(htmldate, 'find_date', find_date)
+    # the url disagrees with the meta element
+    assert resolve_date(load_html(page.format(meta)), 'https://example.com/2020/01/story') == (None, 'htmldate')
+    assert calls == [False, True]
+    # not confident enough
+    resolve_date(load_html(page.format('')), date_candidates=[(datetime(2021, 3, 4), 0.5)], fastmode=True)
+    assert calls == [False, True, False]
+
+
+def test_normalize_text():
+    import random
+    import re
+    from extractnet.metadata_extraction.normalize import normalize_text, NOPRINT_TRANS_TABLE
+
+    def line_processing(line):
+        # previous implementation
+        line = line.replace('&#13;', '\r').replace('&#10;', '\n').replace('&nbsp;', ' ')
+        line = re.sub(r'(?<![p{P}>])\n', ' ', line)
+        line = ''.join(char for char in line if char.isprintable() or char.isspace())
+        line = re.sub(r'\s+', ' ', re.sub(r'(?<![p{P}>])\n', ' ', line)).strip(' \t\n\r\v')
+        if all(map(str.isspace, line)):
+            line = None
+        return line
+
+    alphabet = ['a', 'p', 'P', '>', '}', ' ', '\n', '\r', '\t', '\x0b', '\x0c', '\x00', '\x1f', '\x85',
+        '\u00a0', '\u200b', '\u2009', '\u3000', '\ufeff', '&nbsp;', '&#13;', '&#10;', '&', '\u8a18', '\u00e9']
+    random.seed(0)
+    for _ in range(5000):
+        text = ''.join(random.choice(alphabet) for _ in range(random.randint(0, 20)))
+        assert normalize_text(text) == line_processing(text), repr(text)
+    assert 'a\x00b'.translate(NOPRINT_TRANS_TABLE) == 'ab'
+    assert 'a\nb'.translate(NOPRINT_TRANS_TABLE) == 'a\nb'
+
+    from extractnet.metadata_extraction import utils
+    assert utils.line_processing(' a&nbsp;\n b\x00 ') == 'a b'
+    assert utils.line_processing(' \n ') is None
+    assert utils.return_printables_and_spaces('\x00') == ''
+    assert utils.return_printables_and_spaces('\n') == '\n'
+
+
+def test_site_memo(monkeypatch):
+    from extractnet.metadata_extraction import metadata
+    from extractnet.metadata_extraction.sites import SiteMemo
+    from extractnet.metadata_extraction.url_utils import extract_domain
+
+    assert extract_domain('https://www.news.example.co.uk/a/b?c=1') == 'example.co.uk'
+    assert extract_domain('https://news.example.co.uk/other') == 'example.co.uk'
+    assert extract_domain('example.co.uk/a') is None
+
+    page = ('<html><head><link rel="canonical" href="https://news.example.com/{}"></head>'
+        '<body><p>text</p><footer><a href="https://creativecommons.org/licenses/by-sa/4.0/">'
+        'license</a></footer></body></html>')
+    searches = []
+    extract_license = metadata.extract_license
+    def counted(tree):
+        searches.append(tree)
+        return extract_license(tree)
+    monkeypatch.setattr(metadata, 'extract_license', counted)
+
+    sites = SiteMemo(ttl=3600, min_pages=2)
+    for idx in range(4):
+        results = extract_metadata(page.format(idx), sites=sites, fastmode=True)
+        assert results['license'] == 'CC BY-SA 4.0'
+    assert len(searches) == 2
+    assert sites.known('news.example.com', 'license') == (True, 'CC BY-SA 4.0')
+    assert sites.known('other.example.com', 'license') == (False, None)
+
+    # expired hosts are learned again
+    import time
+    from extractnet.metadata_extraction import sites as sites_module
+    now = time.monotonic()
+    monkeypatch.setattr(sites_module.time, 'monotonic', lambda: now + 3601)
+    assert sites.known('news.example.com', 'license') == (False, None)
+    extract_metadata(page.format(5), sites=sites, fastmode=True)
+    assert len(searches) == 3
+
+    # a page without license is not learned
+    bare = '<html><head><link rel="canonical" href="https://bare.example.com/{}"></head><body><p>text</p></body></html>'
+    for idx in range(3):
+        assert extract_metadata(bare.format(idx), sites=sites, fastmode=True)['license'] is None
+    assert len(searches) == 6
+    assert sites.known('bare.example.com', 'license') == (False, None)
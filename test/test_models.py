@@ -2,6 +2,7 @@ import io
 import json
 import os
 
+import numpy as np
 import pytest
 
 from extractnet import extract_news
@@ -22,4 +23,69 @@ def test_models(html):
     results = extract_news(html)
 
     assert 'content' in results
-    assert 'headline' in results
\ No newline at end of file
+    assert 'headline' in results
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='requires fork')
+def test_preloaded_models_after_fork(html):
+    import extractnet
+    extractor = extractnet.preload(warmup=False, freeze=False)
+    extractor.content_extractor.warmup()
+    expected = extract_news(html)['content']
+
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            network = extractor.content_extractor
+            same = network.session_pid == os.getpid() and extract_news(html)['content'] == expected
+            os.write(write_fd, b'1' if same else b'0')
+        finally:
+            os._exit(0)
+    os.close(write_fd)
+    os.waitpid(pid, 0)
+    assert os.read(read_fd, 1) == b'1'
+    os.close(read_fd)
+
+
+@pytest.mark.parametrize('variant', ['int8', 'optimized'])
+def test_model_variants(html, variant):
+    from extractnet.nn_models import NewsNet
+    baseline = NewsNet()
+    model = NewsNet(model_variant=variant)
+    feat, _ = baseline.preprocess(html)
+    expected, = baseline.inference([feat])
+    logits, = model.inference([feat])
+    assert logits.shape == expected.shape
+    # content decisions of the compressed models match the float32 model
+    assert np.mean((logits[:, 0] > 0) == (expected[:, 0] > 0)) > 0.95
+
+
+def test_unknown_model_variant():
+    from extractnet.nn_models import NewsNet
+    with pytest.raises(ValueError):
+        NewsNet(model_variant='float16')
+
+
+def test_window_starts():
+    from extractnet.nn_models import NewsNet
+    model = NewsNet(window_size=64, window_overlap=16)
+    assert model.window_starts(64) == [0]
+    starts = model.window_starts(300)
+    assert starts[0] == 0 and starts[-1] == 300 - 64
+    assert all(0 < b - a <= 48 for a, b in zip(starts[:-1], starts[1:]))
+    # windowing is opt-in
+    assert NewsNet().window_starts(100000) == [0]
+
+
+def test_windowed_inference(html):
+    from extractnet.nn_models import NewsNet
+    full = NewsNet()
+    windowed = NewsNet(window_size=64, window_overlap=16)
+    feat, _ = full.preprocess(html)
+    assert len(feat) > 64
+    expected, = full.inference([feat])
+    logits, short = windowed.inference([feat, feat[:40]])
+    assert logits.shape == expected.shape
+    assert np.mean((logits[:, 0] > 0) == (expected[:, 0] > 0)) > 0.95
+    # pages shorter than a window are not affected
+    np.testing.assert_array_equal(short, full.inference([feat[:40]])[0])
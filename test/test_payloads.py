@@ -0,0 +1,52 @@
+import io
+import os
+
+from extractnet.payloads import PayloadFilter
+
+FIXTURES = os.path.join('test', 'datafiles')
+
+STATE = '{"items": [%s]}' % ', '.join(['{"id": 1234567890}'] * 4000)
+
+
+def test_strip_payloads():
+    payload_filter = PayloadFilter(min_size=0, max_payload=1000, max_data_uri=100)
+    html = ('<html><head><script>window.__STATE__ = ' + STATE + '</script>'
+        '<script type="application/ld+json">' + STATE + '</script>'
+        '<script id="__NEXT_DATA__" type="application/json">' + STATE + '</script>'
+        '<style>' + 'p { color: red; }' * 100 + '</style><script>small()</script></head>'
+        '<body><svg><path d="' + 'M 0 0 ' * 500 + '"/></svg>'
+        '<img src="data:image/png;base64,' + 'A' * 500 + '"><p>text</p></body></html>')
+    stripped = payload_filter(html)
+    assert '<script></script>' in stripped and '<style></style>' in stripped
+    assert '<svg></svg>' in stripped
+    assert '<img src="data:,">' in stripped
+    assert stripped.count(STATE) == 2
+    assert '<script>small()</script>' in stripped and '<p>text</p>' in stripped
+    assert payload_filter(html.encode('utf-8')) == stripped.encode('utf-8')
+
+
+def test_nested_svg_and_small_pages():
+    payload_filter = PayloadFilter(min_size=0, max_payload=10)
+    nested = '<svg><svg><text>label</text></svg><text>' + 'x' * 100 + '</text></svg>'
+    assert payload_filter(nested) == nested
+    assert PayloadFilter()('<script>' + STATE + '</script>') == '<script>' + STATE + '</script>'
+    assert PayloadFilter(min_size=0, max_size=10)('<p>' + 'x' * 100) == '<p>xxxxxxx'
+
+
+def test_truncate_at_boundaries():
+    # utf-8 character, tag and JSON-LD script cut by max_size
+    assert PayloadFilter(min_size=0, max_size=8)(('<p>' + '\u00e9' * 10).encode('utf-8')) == '<p>\u00e9\u00e9'.encode('utf-8')
+    assert PayloadFilter(min_size=0, max_size=9)(('<p>' + '\u8a18' * 10).encode('utf-8')) == '<p>\u8a18\u8a18'.encode('utf-8')
+    assert PayloadFilter(min_size=0, max_size=20)(b'<p>abc</p><a href="/x">link</a>') == b'<p>abc</p>'
+    ld_json = '<p>a</p><script type="application/ld+json">{"headline": "a"}</script>'
+    for html in (ld_json, ld_json.encode('utf-8')):
+        assert PayloadFilter(min_size=0, max_size=60)(html) == html[:8]
+    assert PayloadFilter(min_size=0, max_size=9)('<p>\u00e9\u00e9\u00e9</p>') == '<p>\u00e9\u00e9\u00e9'
+
+
+def test_extraction_unchanged():
+    from extractnet import Extractor
+    with io.open(os.path.join(FIXTURES, 'models_testing.html'), 'r') as f:
+        html = f.read()
+    padded = html.replace('<body', '<script>var state = ' + STATE * 5 + '</script><body', 1)
+    assert Extractor(payload_filter=False).extract(padded) == Extractor().extract(padded)
@@ -0,0 +1,73 @@
+import io
+import os
+
+import pytest
+
+from extractnet.prefilter import Prefilter, page_signals
+from extractnet.pipeline import Extractor, WARMUP_HTML
+
+FIXTURES = os.path.join('test', 'datafiles')
+
+INDEX_HTML = '<html><head><title>World news</title></head><body><ul>' + ''.join(
+    '<li><a href="/story-{0}">Headline number {0} about the world</a> <span>2h</span></li>'.format(idx)
+    for idx in range(60)) + '</ul></body></html>'
+ERROR_HTML = '''<html><head><title>404 Not Found</title></head><body><h1>Not Found</h1>
+<p>The requested URL was not found on this server.</p></body></html>'''
+LOGIN_HTML = '''<html><head><title>Sign in</title></head><body><form><input name="user">
+<input type="password" name="pass"><button>Log in</button></form><p>Subscribe to read.</p></body></html>'''
+
+
+@pytest.fixture(scope='module')
+def article_html():
+    with io.open(os.path.join(FIXTURES, 'models_testing.html'), 'r') as f:
+        return f.read()
+
+
+def test_page_signals():
+    signals = page_signals(WARMUP_HTML)
+    assert signals['ld_article'] == 1.0
+    assert signals['paragraphs'] == 2.0
+    assert page_signals(INDEX_HTML)['link_density'] > 0.8
+    assert page_signals(ERROR_HTML)['error_title'] == 1.0
+    assert page_signals(LOGIN_HTML)['password'] == 1.0
+
+
+@pytest.mark.parametrize('title, error', [
+    ('404 Not Found', True),
+    ('Error 404 - Example News', True),
+    ('Page not found | Example News', True),
+    ('Error', True),
+    ('403 Forbidden', True),
+    ('S&P 500 closes at record high', False),
+    ('Fortune 500 companies cut 410 jobs', False),
+    ('Referee error costs United the title', False),
+])
+def test_error_title(title, error):
+    html = '<html><head><title>{}</title></head><body></body></html>'.format(title)
+    assert page_signals(html)['error_title'] == float(error)
+
+
+def test_prefilter(article_html):
+    prefilter = Prefilter()
+    assert prefilter(article_html)[0]
+    assert prefilter(WARMUP_HTML)[0]
+    for html in (INDEX_HTML, ERROR_HTML, LOGIN_HTML, ''):
+        accepted, score = prefilter(html)
+        assert not accepted and score < prefilter.threshold
+
+
+def test_extractor_prefilter(article_html, monkeypatch):
+    extractor = Extractor(prefilter=Prefilter())
+    assert extractor.extract(INDEX_HTML)['isArticle'] is False
+
+    extracted = []
+    original = extractor.content_extractor.prepare
+    def prepare(html, *args, **kwargs):
+        extracted.append(html)
+        return original(html, *args, **kwargs)
+    monkeypatch.setattr(extractor.content_extractor, 'prepare', prepare)
+
+    results = extractor.extract([ERROR_HTML, article_html, LOGIN_HTML])
+    assert len(extracted) == 1
+    assert results[0]['isArticle'] is False and results[2]['isArticle'] is False
+    assert 'content' in results[1] and 'isArticle' not in results[1]
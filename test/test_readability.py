@@ -25,3 +25,20 @@ def test_default_features():
     EMPTY_HTML = "<article><p>content</p><p>blocked</p><p>404</p></article>"
     blks = TagCountReadabilityBlockifier.blockify(EMPTY_HTML)
     print(blks)
+
+
+def test_readability_table_matches_block_features():
+    with io.open(os.path.join(FIXTURES, 'models_testing.html')) as fin:
+        html = fin.read()
+    blks = TagCountReadabilityBlockifier.blockify(html)
+    assert _readability._document_table(blks[1:]) is None
+    # first and last blocks in place, middle ones swapped
+    assert _readability._document_table([blks[0], blks[2], blks[1]] + blks[3:]) is None
+    # the table written by blockify
+    from_table = _readability.make_readability_features(blks)
+    assert _readability._document_table(blks) is not None
+    # without it the kernel inputs are rebuilt from the per block features
+    for blk in blks:
+        del blk.features['readability_table']
+    assert _readability._document_table(blks) is None
+    assert np.array_equal(from_table, _readability.make_readability_features(blks))
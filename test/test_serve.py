@@ -0,0 +1,116 @@
+import io
+import json
+import os
+import threading
+import urllib.request
+
+import pytest
+
+from extractnet import Extractor
+from extractnet.serve import MicroBatcher, make_server
+
+FIXTURES = os.path.join('test', 'datafiles')
+
+
+@pytest.fixture(scope="module")
+def html():
+    with io.open(os.path.join(FIXTURES, "models_testing.html"), mode="rt") as f:
+        html_ = f.read()
+    return html_
+
+
+@pytest.fixture(scope="module")
+def batcher():
+    batcher_ = MicroBatcher(Extractor(), max_batch_size=4, max_wait_ms=50, workers=2)
+    yield batcher_
+    batcher_.close()
+
+
+def test_micro_batch(html, batcher):
+    futures = [ batcher.submit(html) for _ in range(4) ]
+    results = [ future.result(timeout=120) for future in futures ]
+    for result in results:
+        assert 'content' in result
+    assert results[0]['content'] == results[-1]['content']
+
+    metrics = batcher.metrics.snapshot(batcher.queue_depth)
+    assert metrics['requests'] >= 4
+    assert metrics['max_batch_size'] > 1
+    assert metrics['latency_ms']['p50'] is not None
+
+
+def test_http_server(html, batcher):
+    server = make_server(batcher, host='127.0.0.1', port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        host, port = server.server_address
+        request = urllib.request.Request('http://{}:{}/extract'.format(host, port),
+            data=html.encode('utf-8'), headers={'Content-Type': 'text/html'})
+        with urllib.request.urlopen(request, timeout=120) as response:
+            result = json.loads(response.read().decode('utf-8'))
+        assert 'content' in result
+
+        with urllib.request.urlopen('http://{}:{}/metrics'.format(host, port), timeout=10) as response:
+            metrics = json.loads(response.read().decode('utf-8'))
+        assert 'queue_depth' in metrics
+        assert 'caches' in metrics
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_micro_batch_runs_every_stage(html):
+    from extractnet.incremental import BlockCache
+    from extractnet.prefilter import Prefilter
+    extractor = Extractor(prefilter=Prefilter(), block_cache=BlockCache())
+    not_found = '<html><head><title>404 Not Found</title></head><body><h1>Not Found</h1></body></html>'
+    batcher_ = MicroBatcher(extractor, max_batch_size=4, max_wait_ms=50, workers=2)
+    try:
+        futures = [ batcher_.submit(html, url='https://example.com/a'), batcher_.submit(not_found) ]
+        result, rejected = [ future.result(timeout=120) for future in futures ]
+    finally:
+        batcher_.close()
+    assert rejected['isArticle'] is False
+    assert len(extractor.block_cache) == 1
+    assert result == Extractor().extract(html, url='https://example.com/a')
+
+
+def test_micro_batch_skips_cancelled_requests(html):
+    extractor = Extractor()
+    prepared = []
+    prepare = extractor.prepare
+    extractor.prepare = lambda document, url=None: prepared.append(url) or prepare(document, url)
+    batcher_ = MicroBatcher(extractor, max_batch_size=4, max_wait_ms=500, workers=2)
+    try:
+        cancelled = batcher_.submit(html, url='https://example.com/cancelled')
+        assert cancelled.cancel()
+        result = batcher_.submit(html, url='https://example.com/a').result(timeout=120)
+    finally:
+        batcher_.close()
+    assert 'content' in result
+    assert prepared == ['https://example.com/a']
+
+
+def test_micro_batch_does_not_wait_for_postprocess(html):
+    extractor = Extractor()
+    release = threading.Event()
+    finish = extractor.finish
+
+    def blocking_finish(page, metadata_mining=True, **kwargs):
+        if kwargs.get('url') == 'https://example.com/slow':
+            release.wait(60)
+        return finish(page, metadata_mining, **kwargs)
+
+    extractor.finish = blocking_finish
+    batcher_ = MicroBatcher(extractor, max_batch_size=1, max_wait_ms=0, workers=2)
+    try:
+        slow = batcher_.submit(html, url='https://example.com/slow')
+        # the second batch runs while the first one is still postprocessed
+        fast = batcher_.submit(html, url='https://example.com/fast').result(timeout=120)
+        assert not slow.done()
+        release.set()
+        assert slow.result(timeout=120)['content'] == fast['content']
+    finally:
+        release.set()
+        batcher_.close()
@@ -0,0 +1,109 @@
+import numpy as np
+import pytest
+
+from extractnet.nn_models import NewsNet
+from extractnet.templates import TemplateStore, block_signature, domain_of
+
+PAGE = '''<html><body><div class="menu"><a href="/">Home</a> <a href="/world">World</a></div>
+<div class="crumbs">World</div><h1 class="headline">Headline {0}</h1>
+<div class="byline">By Reporter {0}</div><div class="date">March {0}, 2021</div>
+<div class="story-body"><p>First paragraph of story {0}, long enough to be content.</p>
+<p>Second paragraph of story {0}.</p></div><div id="footer-{0}">Copyright</div></body></html>'''
+
+
+@pytest.fixture(scope='module')
+def model():
+    return NewsNet()
+
+
+def layout_logits(model, blocks):
+    # a model which labels blocks by their layout only
+    logits = np.full((len(blocks), len(model.label_order)), -10.0, dtype=np.float32)
+    for idx, block in enumerate(blocks):
+        signature = block_signature(block)
+        if signature.startswith('p|'):
+            logits[idx, model.label_order.index('content')] = 10
+        if 'headline' in signature:
+            logits[idx, model.label_order.index('headline')] = 10
+        if 'byline' in signature:
+            logits[idx, model.label_order.index('author')] = 10
+        if 'date' in signature:
+            logits[idx, model.label_order.index('date')] = 10
+        if 'crumbs' in signature:
+            logits[idx, model.label_order.index('breadcrumbs')] = 10
+    return logits
+
+
+def test_signature_and_domain(model):
+    blocks = model.blockify(PAGE.format(12))
+    assert block_signature(blocks[-1]) == block_signature(model.blockify(PAGE.format(345))[-1])
+    assert domain_of('https://www.example.com/a/b?c=1') == 'example.com'
+
+
+def test_template_shortcut(model, monkeypatch):
+    store = TemplateStore(min_pages=3, verify_every=4)
+    calls = []
+
+    def inference(features):
+        calls.append(len(features))
+        return [ layout_logits(model, blocks) for blocks in current ]
+    monkeypatch.setattr(model, 'inference', inference)
+
+    outputs = []
+    for page in range(8):
+        html = PAGE.format(page)
+        current = [ model.blockify(html) ]
+        outputs.append(model.predict(html, templates=store, urls='https://example.com/{}'.format(page)))
+
+    # 3 pages to learn, then 1 model run to verify every 4 template extractions
+    assert len(calls) == 4
+    assert outputs[-1]['content'] == 'First paragraph of story 7, long enough to be content.\nSecond paragraph of story 7.'
+    assert outputs[-1]['headline'] == 'Headline 7'
+    assert outputs[-1]['author'] == [('By Reporter 7', 1.0)]
+    assert outputs[-1]['date'] == [('March 7, 2021', 1.0)]
+    assert outputs[-1]['breadcrumbs'] == [('World', 1.0)]
+
+
+def test_template_forgotten_on_disagreement(model):
+    store = TemplateStore(min_pages=2, verify_every=1)
+    blocks = model.blockify(PAGE.format(1))
+    signatures = store.signatures(blocks)
+    logits = layout_logits(model, blocks)
+    for _ in range(2):
+        store.observe('https://example.com/a', signatures, logits, model.label_order, 0.5, 0.1)
+
+    assignment, verify = store.match('https://example.com/b', signatures, model.label_order)
+    assert verify and assignment['headline'].sum() == 1
+    logits[:, model.label_order.index('headline')] = -10
+    assert not store.observe('https://example.com/b', signatures, logits, model.label_order, 0.5, 0.1,
+        expected=assignment)
+    assert len(store) == 0
+
+
+def test_template_date_confidence_is_the_model_probability(model, monkeypatch):
+    from extractnet.metadata_extraction.dates import MODEL_DATE_CONFIDENCE
+    store = TemplateStore(min_pages=3, verify_every=100)
+    date = model.label_order.index('date')
+    calls = []
+
+    def inference(features):
+        calls.append(len(features))
+        logits = layout_logits(model, current)
+        # the date block always wins, with a probability of about 0.73
+        logits[:, date] = [ 1.0 if value > 0 else (0.0 if 'crumbs' in block_signature(block) else -10.0)
+            for value, block in zip(logits[:, date], current) ]
+        return [ logits ]
+    monkeypatch.setattr(model, 'inference', inference)
+
+    outputs = []
+    for page in range(4):
+        html = PAGE.format(page + 1)
+        current = model.blockify(html)
+        outputs.append(model.predict(html, templates=store, urls='https://example.com/{}'.format(page)))
+    # the last page is extracted from the template
+    assert len(calls) == 3
+    (text, confidence), = outputs[-1]['date']
+    assert text == 'March 4, 2021'
+    # all pages agree, the confidence is still the one of the model
+    assert confidence == pytest.approx(outputs[-2]['date'][0][1])
+    assert confidence < MODEL_DATE_CONFIDENCE
@@ -1,5 +1,7 @@
 import numpy as np
+import pytest
 
+from extractnet.blocks import TagCountReadabilityBlockifier
 from extractnet.features import _weninger
 
 
@@ -19,3 +21,52 @@ def test_weninger_sx_sdx():
          [9.52551006, 0.79272618]])
     assert np.allclose(actual, expected)
     assert actual.shape == (10, 2)
+
+
+def test_weninger_sx_sdx_matches_scipy_smoothing():
+    ndimage = pytest.importorskip('scipy.ndimage')
+    rng = np.random.RandomState(42)
+    for nx in list(range(2, 13)) + [100]:
+        x = rng.uniform(0, 50, nx)
+        dx = np.zeros(nx)
+        for k in range(nx - 1):
+            dx[k] = abs(x[k + 1:k + 4].mean() - x[k])
+        dx[-1] = abs(0.5 * (x[-1] + x[-2]) - x[-1])
+        actual = _weninger.sx_sdx(x)
+        assert np.allclose(actual[:, 0], ndimage.gaussian_filter(x, sigma=1.0))
+        assert np.allclose(actual[:, 1], ndimage.gaussian_filter(dx, sigma=1.0))
+
+
+def test_weninger_single_block():
+    actual = _weninger.sx_sdx(np.array([3.0]))
+    assert np.allclose(actual, [[3.0, 0.0]])
+    assert _weninger.sx_sdx(np.zeros(0)).shape == (0, 2)
+
+
+def test_make_weninger_features():
+    html = '<html><body><p>first block</p><div><p>second <b>block</b></p></div><p>third</p></body></html>'
+    blocks = TagCountReadabilityBlockifier.blockify(html)
+    features = _weninger.make_weninger_features(blocks)
+    assert features.dtype == np.float32
+    assert features.shape == (len(blocks), 2)
+    ctrs = [ len(block.text.encode('utf-8')) / max(block.features['tagcount'], 1) for block in blocks ]
+    assert np.allclose(features, _weninger.sx_sdx(np.array(ctrs, dtype=np.float64)))
+
+
+def test_weninger_block_table_matches_block_features():
+    html = '<html><body><p>first block</p><div><p>second <b>block</b></p></div><p>third</p><p>fourth</p></body></html>'
+    blocks = TagCountReadabilityBlockifier.blockify(html)
+    table, start = _weninger._document_table(blocks[1:3])
+    assert table is not None and start == 1
+    assert _weninger._document_table(blocks[::2])[0] is None
+    # first and last blocks in place, middle ones swapped
+    assert _weninger._document_table([blocks[0], blocks[2], blocks[1], blocks[3]])[0] is None
+    assert np.array_equal(table.tag_count, [ block.features['tagcount'] for block in blocks ])
+    from_table = _weninger.make_weninger_features(blocks)
+    sliced = _weninger.make_weninger_features(blocks[1:3])
+    # without it the ratios are read from each block
+    for block in blocks:
+        del block.features['block_table']
+    assert _weninger._document_table(blocks)[0] is None
+    assert np.array_equal(from_table, _weninger.make_weninger_features(blocks))
+    assert np.array_equal(sliced, _weninger.make_weninger_features(blocks[1:3]))